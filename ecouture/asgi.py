@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Le flux SSE des notifications (notifications/stream.py) est une vue async :
+il doit être servi par ce point d'entrée (gunicorn avec des workers uvicorn,
+voir Procfile) pour ne pas bloquer un worker par connexion.
 """
 
 import os
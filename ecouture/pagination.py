@@ -0,0 +1,227 @@
+"""
+Pagination du projet.
+
+`LimitPageNumberPagination` : pagination par numéro de page (par défaut),
+taille choisie par `limit` dans la limite de `max_page_size` ; `?count=false`
+saute le COUNT(*) et détecte la page suivante en lisant une ligne de plus.
+
+`KeysetPagination` : pagination par curseur (keyset), sans OFFSET ni COUNT.
+Le curseur est la position (valeurs des champs de tri) de la dernière ligne
+de la page, encodée en base64 ; la page suivante est filtrée par
+`(f1, f2, ...) > (v1, v2, ...)`. Le dernier champ de tri doit être unique
+(en pratique `id`) pour que l'ordre soit total.
+"""
+import base64
+import json
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+PAGE_SIZE_QUERY_PARAM = "limit"
+MAX_PAGE_SIZE = 100
+
+
+def _limit(request, default):
+    """Taille de page demandée via `limit`, bornée à MAX_PAGE_SIZE."""
+    try:
+        limit = int(request.query_params[PAGE_SIZE_QUERY_PARAM])
+    except (KeyError, ValueError):
+        return default
+    return min(limit, MAX_PAGE_SIZE) if limit > 0 else default
+
+
+class LimitPageNumberPagination(PageNumberPagination):
+    page_size_query_param = PAGE_SIZE_QUERY_PARAM
+    max_page_size = MAX_PAGE_SIZE
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.without_count = request.query_params.get(
+            self.count_query_param, "").lower() in ("false", "0")
+        if not self.without_count:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        try:
+            self.page_number = int(request.query_params.get(self.page_query_param, 1))
+            if self.page_number < 1:
+                raise ValueError
+        except ValueError:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=request.query_params.get(self.page_query_param),
+                message="Numéro de page invalide."))
+
+        offset = (self.page_number - 1) * page_size
+        # une ligne de plus pour savoir s'il existe une page suivante
+        rows = list(queryset[offset:offset + page_size + 1])
+        self.has_next = len(rows) > page_size
+        if not rows and self.page_number > 1:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=self.page_number, message="Page vide."))
+        return rows[:page_size]
+
+    def get_next_link(self):
+        if not self.without_count:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if not self.without_count:
+            return super().get_previous_link()
+        if self.page_number <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+    def get_paginated_response(self, data):
+        if not self.without_count:
+            return super().get_paginated_response(data)
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        # absent avec ?count=false
+        response_schema["required"] = ["results"]
+        return response_schema
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [{
+            "name": self.count_query_param,
+            "required": False,
+            "in": "query",
+            "description": "'false' : sans total (count), page suivante détectée sans COUNT(*)",
+            "schema": {"type": "boolean"},
+        }]
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = "cursor"
+    mode_query_param = "pagination"
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = "Curseur invalide."
+
+    def __init__(self, ordering):
+        self.ordering = tuple(ordering)
+
+    @classmethod
+    def is_requested(cls, request):
+        params = request.query_params
+        return params.get(cls.mode_query_param) == "cursor" or cls.cursor_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = _limit(request, self.page_size)
+        queryset = queryset.order_by(*self.ordering)
+
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = queryset.filter(self._after(position))
+
+        # une ligne de plus pour savoir s'il existe une page suivante
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_position = self._position(rows[-1]) if self.has_next else None
+        return rows
+
+    def _after(self, position):
+        """Lignes strictement après `position` dans l'ordre de tri."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def _position(self, instance):
+        values = []
+        for field in self.ordering:
+            value = getattr(instance, field.lstrip("-"))
+            # isoformat complet : DjangoJSONEncoder tronque les microsecondes
+            values.append(value.isoformat() if hasattr(value, "isoformat") else value)
+        return values
+
+    def encode_cursor(self, position):
+        data = json.dumps(position, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = base64.urlsafe_b64decode(encoded + "=" * (-len(encoded) % 4))
+            position = json.loads(data)
+        except (BinasciiError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        # le curseur vient du client : chaque valeur est convertie par son champ
+        values = []
+        for field, value in zip(self.ordering, position):
+            try:
+                value = model._meta.get_field(field.lstrip("-")).to_python(value)
+            except (DjangoValidationError, ValueError, TypeError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            values.append(value)
+        return values
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.mode_query_param)
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class KeysetPaginationMixin:
+    """
+    Pour les ViewSets : bascule l'action courante en pagination par curseur
+    si le client la demande (`?pagination=cursor` ou `?cursor=...`), ou
+    toujours avec `default=True`.
+    """
+
+    def use_keyset_pagination(self, request, ordering, default=False):
+        if default or KeysetPagination.is_requested(request):
+            self._paginator = KeysetPagination(ordering)
+            return True
+        return False
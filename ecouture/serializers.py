@@ -14,6 +14,14 @@ class NotFound404ResponseSerializer(serializers.Serializer):
     detail = serializers.CharField()
 
 
+class QuotaExceeded403Serializer(serializers.Serializer):
+    detail = serializers.CharField()
+    code = serializers.CharField()
+    resource = serializers.CharField(help_text="Ressource dont le quota est atteint.")
+    limit = serializers.IntegerField()
+    usage = serializers.IntegerField()
+
+
 class ValidationError400Serializer(serializers.Serializer):
     field_name = serializers.ListField(
         child=serializers.CharField(),
@@ -168,10 +168,80 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.IsAuthenticated"],
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_PAGINATION_CLASS": "ecouture.pagination.LimitPageNumberPagination",
     "PAGE_SIZE": 20 if DEBUG else 20,
 }
 
+# Cache des réponses par atelier (workshop/cache.py) ; les clés sont
+# versionnées par atelier, le TTL borne seulement les périodes relatives
+# à la date du jour (stats sans created_after/created_before).
+# Les versions d'invalidation (réponses en cache, index d'autocomplétion) ne
+# sont vues des autres process (workers web, run_outbox_worker) que si le
+# cache est partagé : Redis si REDIS_URL est défini, sinon la table
+# `ecouture_cache` (créée par `manage.py createcachetable`, process `release`
+# du Procfile). LocMemCache, propre à chaque process, reste celui du
+# développement et des tests.
+REDIS_URL = os.environ.get("REDIS_URL")
+if DEBUG:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "ecouture",
+        }
+    }
+elif REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "ecouture_cache",
+        }
+    }
+WORKSHOP_CACHE_TIMEOUT = 60 * 5
+
+# indicatif appliqué aux numéros saisis sans indicatif (users.utils.normalize_phone)
+PHONE_DEFAULT_COUNTRY_CODE = "225"
+
+# Outbox des effets de bord (notifications/outbox.py), traitée par
+# `manage.py run_outbox_worker` (process `worker` du Procfile) : sans lui, en
+# production, notifications et emails (dont la réinitialisation du mot de
+# passe) restent dans la file. En développement les handlers sont exécutés
+# immédiatement (pas de worker à lancer).
+OUTBOX_EAGER = DEBUG
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_RETRY_BASE_SECONDS = 5       # délai après le 1er échec, doublé ensuite
+OUTBOX_RETRY_MAX_SECONDS = 60 * 60
+OUTBOX_LEASE_SECONDS = 60 * 5       # un message réclamé redevient libre après ce délai
+
+# Envoi des notifications externes (`manage.py dispatch_external_notifications`,
+# process `mailer` du Procfile)
+EXTERNAL_NOTIFICATIONS_PER_MINUTE = 60
+EXTERNAL_NOTIFICATION_MAX_ATTEMPTS = 5
+
+# Flux SSE des notifications internes (notifications/stream.py) ; avec
+# PostgreSQL, LISTEN/NOTIFY relie le worker de l'outbox aux process web
+NOTIFICATION_BROKER = (
+    "notifications.broker.PostgresBroker"
+    if DATABASES["default"]["ENGINE"] == "django.db.backends.postgresql"
+    else "notifications.broker.InMemoryBroker"
+)
+NOTIFICATION_STREAM_HEARTBEAT_SECONDS = 15
+NOTIFICATION_STREAM_MAX_CONNECTIONS = 500  # par process
+
+# Rétention des notifications internes (`manage.py prune_internal_notifications`,
+# à planifier une fois par jour : cron, Heroku Scheduler...)
+NOTIFICATION_RETENTION_READ_DAYS = 30
+NOTIFICATION_RETENTION_UNREAD_DAYS = 90
+NOTIFICATION_ARCHIVE_RETENTION_DAYS = 365
+# notifications non lues de même catégorie et même objet regroupées (0 : jamais)
+NOTIFICATION_COALESCE_SECONDS = 60 * 10
+
 if DEBUG:  # développement local
     CORS_ALLOWED_ORIGINS = [
         "http://localhost:6006",
@@ -6,6 +6,7 @@ from users.views import UserViewSet
 from workshop.views import WorkshopViewSet
 from haberdashery.views import HaberdasheryViewSet
 from notifications.views import NotificationViewSet
+from notifications.stream import internal_notification_stream
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
 
 
@@ -17,6 +18,9 @@ router.register(r'notification', NotificationViewSet, basename='notifications')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # flux SSE (async), déclaré avant les routes du ViewSet
+    path('api/notification/internal/stream/', internal_notification_stream,
+         name='notifications-internal-stream'),
     path('api/', include(router.urls)),
     path("api/auth/token/", TokenObtainPairView.as_view(),
          name="token_obtain_pair"),
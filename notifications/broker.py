@@ -0,0 +1,158 @@
+"""
+Pub/sub des nouvelles notifications internes, pour le flux SSE
+(notifications/stream.py).
+
+Un message publié ne transporte que l'utilisateur concerné : il réveille ses
+flux ouverts, qui relisent ensuite la base (id > dernier id envoyé). Une
+publication perdue ne fait donc que retarder l'envoi jusqu'au prochain
+heartbeat.
+
+Le backend est choisi par NOTIFICATION_BROKER (chemin vers une sous-classe
+de `Broker`) :
+- `InMemoryBroker` ne relie que les flux du process courant (développement,
+  OUTBOX_EAGER) ;
+- `PostgresBroker` passe par LISTEN/NOTIFY : les notifications créées par
+  `run_outbox_worker` réveillent les flux des process web.
+"""
+import asyncio
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Abonnement d'un flux aux notifications d'un utilisateur."""
+
+    def __init__(self, broker, user_id):
+        self.broker = broker
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def notify(self):
+        # appelé depuis n'importe quel thread (commit d'une requête, worker)
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:  # boucle fermée : le flux est terminé
+            pass
+
+    async def wait(self, timeout: float) -> bool:
+        """Vrai si une publication est arrivée avant `timeout` secondes."""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.event.clear()
+        return True
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    def subscribe(self, user_id) -> Subscription:
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription: Subscription):
+        raise NotImplementedError
+
+    def publish(self, user_ids):
+        raise NotImplementedError
+
+
+class InMemoryBroker(Broker):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, user_id) -> Subscription:
+        subscription = Subscription(self, user_id)
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_ids):
+        with self._lock:
+            subscriptions = [
+                subscription
+                for user_id in set(user_ids)
+                for subscription in self._subscriptions.get(user_id, ())
+            ]
+        for subscription in subscriptions:
+            subscription.notify()
+
+
+class PostgresBroker(InMemoryBroker):
+    """
+    `publish` envoie un NOTIFY portant les ids des utilisateurs ; dans chaque
+    process qui a des flux ouverts, un thread à l'écoute sur sa propre
+    connexion (psycopg2) réveille les abonnements locaux.
+    """
+    CHANNEL = "ecouture_notifications"
+    IDS_PER_NOTIFY = 500  # charge utile d'un NOTIFY : 8000 octets au plus
+    RECONNECT_SECONDS = 5
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def subscribe(self, user_id) -> Subscription:
+        self._ensure_listener()
+        return super().subscribe(user_id)
+
+    def publish(self, user_ids):
+        user_ids = sorted(set(user_ids))
+        with connection.cursor() as cursor:
+            for start in range(0, len(user_ids), self.IDS_PER_NOTIFY):
+                payload = ",".join(map(str, user_ids[start:start + self.IDS_PER_NOTIFY]))
+                cursor.execute("SELECT pg_notify(%s, %s)", [self.CHANNEL, payload])
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(
+                    target=self._listen, name="notification-broker", daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        while True:
+            db = connections.create_connection("default")
+            try:
+                with db.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.CHANNEL}")
+                raw = db.connection
+                while True:
+                    if select.select([raw], [], [], 60)[0]:
+                        raw.poll()
+                        while raw.notifies:
+                            payload = raw.notifies.pop(0).payload
+                            InMemoryBroker.publish(
+                                self, [int(user_id) for user_id in payload.split(",") if user_id])
+            except Exception:
+                logger.exception("Écoute des notifications interrompue, reconnexion.")
+                time.sleep(self.RECONNECT_SECONDS)
+            finally:
+                db.close()
+
+
+@lru_cache(maxsize=None)
+def get_broker() -> Broker:
+    path = getattr(settings, "NOTIFICATION_BROKER", "notifications.broker.InMemoryBroker")
+    return import_string(path)()
@@ -0,0 +1,79 @@
+"""
+Opérations groupées sur les notifications internes d'un utilisateur
+(`internal/mark-read/`, `internal/archive/`).
+
+Chaque opération est une requête d'écriture sur l'ensemble sélectionné ;
+le compteur des non lues (notifications/counters.py) est ajusté d'autant,
+les signaux n'étant pas envoyés par `QuerySet.update()`.
+"""
+from collections import Counter
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from notifications import counters
+from notifications.models import InternalNotification, InternalNotificationArchive
+
+DELETE_BATCH_SIZE = 500
+
+ARCHIVE_FIELDS = (
+    "id", "user_id", "type", "read_at", "category", "object_content",
+    "object_pk", "title", "message", "is_read", "occurrences", "lastOccurrenceAt",
+    "createdAt",
+)
+
+
+def select(user, ids=None, before=None, everything=False):
+    """Notifications de `user` désignées par ids, date (createdAt < before) ou toutes."""
+    notifications = InternalNotification.objects.filter(user=user)
+    if ids is not None:
+        return notifications.filter(pk__in=ids)
+    if before is not None:
+        return notifications.filter(createdAt__lt=before)
+    return notifications if everything else notifications.none()
+
+
+@transaction.atomic
+def mark_read(user, notifications) -> int:
+    """Marque comme lues les non lues de `notifications` ; retourne leur nombre."""
+    updated = notifications.filter(is_read=False).update(
+        is_read=True, read_at=timezone.now())
+    counters.add(user.pk, -updated)
+    return updated
+
+
+@transaction.atomic
+def archive(user, notifications) -> int:
+    """
+    Déplace `notifications` dans InternalNotificationArchive (lues au passage) ;
+    retourne le nombre de notifications archivées.
+    """
+    mark_read(user, notifications)
+    return len(archive_rows(notifications))
+
+
+@transaction.atomic
+def archive_rows(notifications) -> list:
+    """
+    Copie `notifications` dans InternalNotificationArchive puis les supprime,
+    en ajustant les compteurs des non lues ; retourne les lignes archivées.
+    """
+    rows = list(notifications.select_for_update().values(*ARCHIVE_FIELDS))
+    if not rows:
+        return rows
+    InternalNotificationArchive.objects.bulk_create(
+        [InternalNotificationArchive(**row) for row in rows], batch_size=500)
+    unread = Counter(row["user_id"] for row in rows if not row["is_read"])
+    counters.add_many({user_id: -count for user_id, count in unread.items()})
+    # DELETE explicite, sans signal post_delete (compteurs déjà ajustés ;
+    # aucune clé étrangère ne pointe vers InternalNotification)
+    quote = connection.ops.quote_name
+    table = quote(InternalNotification._meta.db_table)
+    pk = quote(InternalNotification._meta.pk.column)
+    ids = [row["id"] for row in rows]
+    with connection.cursor() as cursor:
+        for start in range(0, len(ids), DELETE_BATCH_SIZE):
+            batch = ids[start:start + DELETE_BATCH_SIZE]
+            cursor.execute(
+                f"DELETE FROM {table} WHERE {pk} IN ({', '.join(['%s'] * len(batch))})", batch)
+    return rows
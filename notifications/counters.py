@@ -0,0 +1,76 @@
+"""
+Compteurs de notifications internes non lues par utilisateur
+(UnreadNotificationCounter), servis par `internal/unread-count/`.
+
+Les signaux (notifications/signals.py) et les écritures groupées
+(`fan_out`, marquage en lot) appliquent des incréments F() ;
+`reconcile()` recalcule les compteurs depuis la table et retourne les écarts.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from notifications.models import InternalNotification, UnreadNotificationCounter
+
+
+def count_unread(user_id) -> int:
+    return InternalNotification.objects.filter(user_id=user_id, is_read=False).count()
+
+
+def get_unread(user_id) -> int:
+    """Nombre de non lues : une lecture par clé primaire, calculé la première fois."""
+    count = UnreadNotificationCounter.objects.filter(pk=user_id).values_list(
+        "count", flat=True).first()
+    if count is None:
+        counter, _ = UnreadNotificationCounter.objects.get_or_create(
+            user_id=user_id, defaults={"count": count_unread(user_id)})
+        count = counter.count
+    return count
+
+
+def add(user_id, delta: int):
+    add_many({user_id: delta})
+
+
+def add_many(deltas):
+    """`deltas` : {user_id: variation}, une requête par valeur de variation."""
+    by_delta = defaultdict(list)
+    for user_id, delta in Counter(deltas).items():
+        if user_id and delta:
+            by_delta[delta].append(user_id)
+    for delta, user_ids in by_delta.items():
+        updated = UnreadNotificationCounter.objects.filter(pk__in=user_ids).update(
+            count=F("count") + delta)
+        if updated < len(user_ids):
+            # utilisateurs sans compteur : le calcul inclut déjà ce changement
+            existing = set(UnreadNotificationCounter.objects.filter(
+                pk__in=user_ids).values_list("pk", flat=True))
+            for user_id in set(user_ids) - existing:
+                get_unread(user_id)
+
+
+@transaction.atomic
+def reconcile(users=None, fix=True):
+    """
+    Compare les compteurs stockés aux valeurs réelles.
+    Retourne la liste des écarts {user, stored, actual} ; les corrige si `fix`.
+    """
+    unread = InternalNotification.objects.filter(is_read=False)
+    counters = UnreadNotificationCounter.objects.select_for_update()
+    if users is not None:
+        unread = unread.filter(user_id__in=users)
+        counters = counters.filter(pk__in=users)
+
+    actual = dict(unread.values_list("user_id").annotate(total=Count("id")).order_by())
+    stored = dict(counters.values_list("pk", "count"))
+    drifts = [
+        dict(user=user_id, stored=stored.get(user_id), actual=actual.get(user_id, 0))
+        for user_id in sorted(set(actual) | set(stored))
+        if stored.get(user_id) != actual.get(user_id, 0)
+    ]
+    if fix:
+        for drift in drifts:
+            UnreadNotificationCounter.objects.update_or_create(
+                user_id=drift["user"], defaults={"count": drift["actual"]})
+    return drifts
@@ -0,0 +1,181 @@
+"""
+Envoi des notifications externes par email (`manage.py dispatch_external_notifications`).
+
+Les notifications dues (non envoyées, `scheduled_for` vide ou atteint) sont
+prises par lots ; chaque lot passe par une seule connexion SMTP ouverte une
+fois, puis les notifications envoyées sont marquées en une requête. Un échec
+n'arrête pas le lot : la notification est replanifiée avec un délai
+exponentiel (notifications.outbox.retry_delay) et abandonnée après
+EXTERNAL_NOTIFICATION_MAX_ATTEMPTS tentatives.
+
+Un lot réclamé est réservé (`next_attempt_at`) pendant OUTBOX_LEASE_SECONDS :
+si le process meurt, ses notifications redeviennent dues à l'expiration.
+Si la connexion SMTP elle-même échoue (serveur injoignable, authentification
+refusée), le lot entier est replanifié et le passage s'arrête jusqu'au
+suivant. Sous SQLite, ne lancer qu'un seul dispatcher.
+"""
+import logging
+import smtplib
+import time
+from collections import deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection as db_connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from notifications.models import ExternalNotification
+from notifications.outbox import retry_delay
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def due_notifications(now=None):
+    now = now or timezone.now()
+    return ExternalNotification.objects.filter(
+        Q(scheduled_for__isnull=True) | Q(scheduled_for__lte=timezone.localdate(now)),
+        Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now),
+        is_sent=False,
+        type='email',
+        attempts__lt=_setting("EXTERNAL_NOTIFICATION_MAX_ATTEMPTS", 5),
+    )
+
+
+def claim(batch_size: int):
+    """Réserve et retourne jusqu'à `batch_size` notifications dues."""
+    now = timezone.now()
+    lease = timedelta(seconds=_setting("OUTBOX_LEASE_SECONDS", 300))
+    due = due_notifications(now).order_by("id")
+    with transaction.atomic():
+        if db_connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list("id", flat=True)[:batch_size])
+        ExternalNotification.objects.filter(id__in=ids).update(next_attempt_at=now + lease)
+    return list(ExternalNotification.objects.filter(id__in=ids).select_related(
+        "customer__workshop").order_by("id"))
+
+
+def build_message(notification: ExternalNotification, connection=None):
+    customer = notification.customer
+    if not customer.email:
+        return None
+    return EmailMessage(
+        subject=notification.title,
+        body=notification.message,
+        to=[customer.email],
+        connection=connection,
+    )
+
+
+class Throttle:
+    """Limite le nombre d'envois sur une fenêtre glissante d'une minute."""
+
+    def __init__(self, per_minute: int, clock=time.monotonic, sleep=time.sleep):
+        self.per_minute = per_minute
+        self.clock = clock
+        self.sleep = sleep
+        self.sent = deque()
+
+    def _expire(self):
+        limit = self.clock() - 60
+        while self.sent and self.sent[0] <= limit:
+            self.sent.popleft()
+
+    def available(self) -> int:
+        if not self.per_minute:
+            return float("inf")
+        self._expire()
+        return self.per_minute - len(self.sent)
+
+    def wait(self):
+        """Attend qu'au moins un envoi soit de nouveau permis."""
+        while self.available() <= 0:
+            self.sleep(max(self.sent[0] + 60 - self.clock(), 0.1))
+
+    def record(self, count: int = 1):
+        now = self.clock()
+        self.sent.extend([now] * count)
+
+
+class ConnectionFailed(Exception):
+    """La connexion SMTP n'a pas pu être ouverte ; le lot a été replanifié."""
+
+
+def send_batch(notifications) -> tuple:
+    """
+    Envoie `notifications` sur une connexion SMTP unique et enregistre le
+    résultat ; retourne (envoyées, échouées).
+
+    Lève ConnectionFailed, après avoir replanifié les notifications non
+    envoyées, si la connexion au serveur échoue.
+    """
+    sent, failed = [], []
+    connection_error = None
+    try:
+        with get_connection() as connection:
+            # un message à la fois sur la connexion ouverte : un refus du
+            # serveur n'est imputé qu'à sa notification
+            for notification in notifications:
+                message = build_message(notification, connection)
+                try:
+                    if message is None:
+                        raise ValueError("Le client n'a pas d'adresse email.")
+                    connection.send_messages([message])
+                except Exception as exc:
+                    logger.warning("Notification externe #%s non envoyée : %s",
+                                   notification.pk, exc)
+                    failed.append((notification, exc))
+                else:
+                    sent.append(notification.pk)
+    except (OSError, smtplib.SMTPException) as exc:
+        logger.warning("Connexion SMTP impossible : %s", exc)
+        connection_error = exc
+        done = set(sent) | {notification.pk for notification, _ in failed}
+        failed.extend(
+            (notification, exc) for notification in notifications if notification.pk not in done)
+
+    now = timezone.now()
+    if sent:
+        ExternalNotification.objects.filter(pk__in=sent).update(
+            is_sent=True, sent_at=now, next_attempt_at=None, last_error='',
+            attempts=F("attempts") + 1)
+    for notification, exc in failed:
+        notification.attempts += 1
+        notification.last_error = str(exc)[:4000]
+        notification.next_attempt_at = now + retry_delay(notification.attempts)
+    if failed:
+        ExternalNotification.objects.bulk_update(
+            [notification for notification, _ in failed],
+            ["attempts", "last_error", "next_attempt_at"])
+    if connection_error is not None:
+        raise ConnectionFailed(len(sent), len(failed)) from connection_error
+    return len(sent), len(failed)
+
+
+def dispatch(batch_size: int = 50, throttle: Throttle = None) -> tuple:
+    """
+    Envoie les notifications dues par lots jusqu'à épuisement de la file ;
+    retourne (envoyées, échouées).
+    """
+    throttle = throttle or Throttle(_setting("EXTERNAL_NOTIFICATIONS_PER_MINUTE", 60))
+    total_sent = total_failed = 0
+    while True:
+        throttle.wait()
+        batch = claim(min(batch_size, throttle.available()))
+        if not batch:
+            break
+        try:
+            sent, failed = send_batch(batch)
+        except ConnectionFailed as exc:
+            # serveur indisponible : inutile de réclamer les lots suivants
+            sent, failed = exc.args
+            return total_sent + sent, total_failed + failed
+        throttle.record(sent + failed)
+        total_sent, total_failed = total_sent + sent, total_failed + failed
+    return total_sent, total_failed
@@ -0,0 +1,16 @@
+from django_filters import rest_framework as filters
+from notifications.models import ExternalNotification
+
+
+class ExternalNotificationFilterSet(filters.FilterSet):
+    type = filters.ChoiceFilter(choices=ExternalNotification._meta.get_field("type").choices)
+    is_sent = filters.BooleanFilter()
+
+    # Filtres sur la date d'envoi prévue : `scheduled_for` est un DateField,
+    # les deux bornes sont des jours inclus
+    scheduled_after = filters.DateFilter(field_name="scheduled_for", lookup_expr="gte")
+    scheduled_before = filters.DateFilter(field_name="scheduled_for", lookup_expr="lte")
+
+    class Meta:
+        model = ExternalNotification
+        fields = ["type", "is_sent", "scheduled_after", "scheduled_before"]
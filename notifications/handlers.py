@@ -0,0 +1,292 @@
+"""
+Handlers de l'outbox pour les notifications (notifications/outbox.py).
+
+Les signaux (notifications/signals.py) n'écrivent qu'un message d'outbox
+avec les valeurs utiles de l'objet au moment de la sauvegarde ; les
+notifications internes et externes sont produites ici, hors de la requête.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from notifications import counters, outbox
+from notifications.broker import get_broker
+from notifications.models import InternalNotification, ExternalNotification
+from workshop.models import OrderWorkshop, Workshop, Worker
+
+Category = InternalNotification.CategoryInternalNotification
+Type = InternalNotification.TypeInternalNotification
+ObjectContent = InternalNotification.ObjectContentInternalNotification
+
+
+def notify(user_ids, **fields):
+    """
+    Notifications non enregistrées, une par destinataire (sans doublon).
+    `fields` : category, type, title, message, object_content, object_pk.
+    """
+    return [
+        InternalNotification(user_id=user_id, **fields)
+        for user_id in dict.fromkeys(user_ids)
+    ]
+
+
+def fan_out(*notifications):
+    """
+    Enregistre les listes construites par `notify` : un INSERT pour les
+    nouvelles, un UPDATE par contenu pour celles regroupées avec une
+    notification existante (voir `coalesce`).
+    """
+    rows = [row for batch in notifications for row in batch]
+    if rows:
+        rows = coalesce(rows)
+        InternalNotification.objects.bulk_create(rows)
+        # bulk_create n'envoie pas post_save : compteurs et flux SSE ici
+        counters.add_many(Counter(row.user_id for row in rows if not row.is_read))
+        user_ids = {row.user_id for row in rows}
+        transaction.on_commit(lambda: get_broker().publish(user_ids))
+    return rows
+
+
+COALESCE_KEY = ("user_id", "category", "object_content", "object_pk")
+
+
+def _coalesce_key(values):
+    user_id, category, object_content, object_pk = values
+    return user_id, category, object_content, str(object_pk)
+
+
+def coalesce(rows):
+    """
+    Regroupe chaque notification avec une non lue de même utilisateur,
+    catégorie et objet survenue depuis moins de NOTIFICATION_COALESCE_SECONDS :
+    la notification existante prend le nouveau contenu, `lastOccurrenceAt` et
+    `occurrences` sont mis à jour. `createdAt` ne change pas : une ligne déjà
+    paginée (curseur -createdAt, id) ne se déplace pas dans la liste.
+    Retourne les notifications restant à créer.
+    """
+    window = getattr(settings, "NOTIFICATION_COALESCE_SECONDS", 600)
+    candidates = [row for row in rows if row.category and row.object_pk]
+    if not window or not candidates:
+        return rows
+
+    now = timezone.now()
+    since = now - timedelta(seconds=window)
+    existing = {}
+    for values in InternalNotification.objects.filter(
+        Q(createdAt__gte=since) | Q(lastOccurrenceAt__gte=since),
+        user_id__in={row.user_id for row in candidates},
+        is_read=False,
+        category__in={row.category for row in candidates},
+        object_pk__in={str(row.object_pk) for row in candidates},
+    ).order_by("createdAt", "id").values("id", *COALESCE_KEY):
+        # la plus récente l'emporte
+        existing[_coalesce_key(values[field] for field in COALESCE_KEY)] = values["id"]
+
+    updates = defaultdict(list)
+    remaining = []
+    updated_users = set()
+    for row in rows:
+        pk = existing.get(_coalesce_key(getattr(row, field) for field in COALESCE_KEY))
+        if pk is None:
+            remaining.append(row)
+        else:
+            updates[(row.type, row.title, row.message)].append(pk)
+            updated_users.add(row.user_id)
+    for (type, title, message), ids in updates.items():
+        InternalNotification.objects.filter(pk__in=ids).update(
+            type=type, title=title, message=message, lastOccurrenceAt=now,
+            occurrences=F("occurrences") + 1)
+    if updated_users:
+        # les flux SSE ouverts renvoient les notifications mises à jour
+        transaction.on_commit(lambda: get_broker().publish(updated_users))
+    return remaining
+
+
+def workshop_recipients(workshop_id, worker_id=None):
+    """
+    Destinataires d'un événement d'atelier, en une requête :
+    (utilisateur du tailleur `worker_id`, tailleur + propriétaires).
+    """
+    rows = Worker.objects.filter(
+        Q(pk=worker_id) | Q(is_owner=True), workshop_id=workshop_id
+    ).values_list("pk", "user_id")
+    worker_users = [user_id for pk, user_id in rows if pk == worker_id]
+    return worker_users, worker_users + [user_id for pk, user_id in rows if pk != worker_id]
+
+
+@outbox.handler("notifications.workshop_created")
+def workshop_created(payload):
+    _, owners = workshop_recipients(payload["workshop"])
+    fan_out(notify(
+        owners,
+        category=Category.WORKSHOP_CREATION,
+        type=Type.INFO,
+        title='Atelier créé',
+        message=f"Votre atelier '{payload['name']}' a été créé avec succès.",
+        object_content=ObjectContent.WORKSHOP,
+        object_pk=payload["workshop"]
+    ))
+
+
+@outbox.handler("notifications.order_created")
+def order_created(payload):
+    worker_users, _ = workshop_recipients(payload["workshop"], payload["worker"])
+    fan_out(notify(
+        worker_users,
+        category=Category.ORDER_CREATION,
+        type=Type.INFO,
+        title='Nouvelle commande',
+        message=f"Une nouvelle commande '{payload['number']}' a été créée pour vous.",
+        object_content=ObjectContent.ORDER,
+        object_pk=payload["order"]
+    ))
+    ExternalNotification.objects.create(
+        customer_id=payload["customer"],
+        workshop_id=payload["workshop"],
+        type='email',
+        title='Commande créée',
+        message=f"Votre commande '{payload['number']}' a été créée avec succès. Veuillez vérifier les détails de votre commande."
+    )
+
+
+@outbox.handler("notifications.order_updated")
+def order_updated(payload):
+    number = payload["number"]
+    updates = []
+    if payload["status"] == OrderWorkshop.OrderStatus.COMPLETED:
+        updates.append((Type.SUCCESS, 'Commande terminée',
+                        f"La commande '{number}' a été marquée comme terminée."))
+    if payload["status"] == OrderWorkshop.OrderStatus.IN_PROGRESS:
+        updates.append((Type.INFO, 'Commande en cours',
+                        f"La commande '{number}' est en cours de traitement."))
+    if payload["payment_status"] == OrderWorkshop.PaymentStatus.PAID:
+        updates.append((Type.SUCCESS, 'Commande payée',
+                        f"La commande '{number}' a été marquée comme payée."))
+
+    # tailleur + propriétaires : une requête pour toutes les notifications
+    worker_users, users = workshop_recipients(payload["workshop"], payload["worker"])
+    notifications = []
+    if payload["is_deleted"]:
+        notifications.append(notify(
+            worker_users,
+            category=Category.ORDER_DELETION,
+            type=Type.ERROR,
+            title='Commande annulée',
+            message=f"La commande '{number}' a été annulée."
+        ))
+    for type, title, message in updates:
+        notifications.append(notify(
+            users, category=Category.ORDER_UPDATE, type=type, title=title, message=message,
+            object_content=ObjectContent.ORDER, object_pk=payload["order"]))
+    fan_out(*notifications)
+
+
+@outbox.handler("notifications.order_group_created")
+def order_group_created(payload):
+    fan_out(notify(
+        Worker.objects.filter(orders__groups=payload["group"]).values_list("user_id", flat=True),
+        category=Category.ORDER_GROUP_CREATION,
+        type=Type.INFO,
+        title='Groupe de commandes créé',
+        message=f"Un nouveau groupe de commandes '{payload['number']}' a été créé pour vous.",
+        object_content=ObjectContent.ORDER_GROUP,
+        object_pk=payload["group"]
+    ))
+
+
+@outbox.handler("notifications.customer_created")
+def customer_created(payload):
+    fan_out(notify(
+        Worker.objects.filter(workshop_id=payload["workshop"]).values_list("user_id", flat=True),
+        category=Category.CUSTOMER_CREATION,
+        type=Type.INFO,
+        title='Nouveau client',
+        message=f"Un nouveau client '{payload['first_name']} {payload['last_name']}' a été ajouté à votre atelier (surnom: '{payload['nickname']}').",
+        object_content=ObjectContent.CUSTOMER,
+        object_pk=payload["customer"]
+    ))
+
+
+@outbox.handler("notifications.fitting_created")
+def fitting_created(payload):
+    _, users = workshop_recipients(payload["workshop"], payload["worker"])
+    fan_out(notify(
+        users,
+        category=Category.FITTING_CREATION,
+        type=Type.INFO,
+        title='Nouvel essayage',
+        message=f"Un nouvel essayage a été planifié pour la commande '{payload['number']}'.",
+        object_content=ObjectContent.FITTING,
+        object_pk=payload["fitting"]
+    ))
+    ExternalNotification.objects.create(
+        customer_id=payload["customer"],
+        workshop_id=payload["workshop"],
+        type='email',
+        title='Essayage planifié',
+        message=f"Un essayage a été planifié pour votre commande '{payload['number']}'. Veuillez vérifier les détails de l'essayage."
+    )
+
+
+@outbox.handler("notifications.send_mail")
+def send_mail_message(payload):
+    send_mail(payload["subject"], payload["message"], None, payload["recipients"],
+              fail_silently=False)
+
+
+# Autorisations des tailleurs (Setting.worker_authorization_is_*) :
+# champ -> (titre accordé, message accordé, titre retiré, message retiré)
+AUTHORISATION_MESSAGES = {
+    "worker_authorization_is_customer": (
+        'Autorisation de client',
+        "Vous avez été autorisé à voir, ajouter , modifier la liste des clients de l'atelier '{workshop}'.",
+        'Retrait de l\'autorisation de client',
+        "Vous n'êtes plus autorisé à voir, ajouter ou modifier la liste des clients de l'atelier '{workshop}'.",
+    ),
+    "worker_authorization_is_order": (
+        'Autorisation de commande',
+        "Vous avez été autorisé ajouter, modifier les commandes de l'atelier '{workshop}'.",
+        'Retrait de l\'autorisation de commande',
+        "Vous n'êtes plus autorisé à ajouter ou modifier les commandes de l'atelier '{workshop}'.",
+    ),
+    "worker_authorization_is_fitting": (
+        'Autorisation d\'essayage',
+        "Vous avez été autorisé à ajouter, modifier les essayages de l'atelier '{workshop}'.",
+        'Retrait de l\'autorisation d\'essayage',
+        "Vous n'êtes plus autorisé à ajouter ou modifier les essayages de l'atelier '{workshop}'.",
+    ),
+    "worker_authorization_is_worker": (
+        'Autorisation de travailleur',
+        "Vous avez été autorisé à ajouter, modifier les travailleurs de l'atelier '{workshop}'.",
+        'Retrait de l\'autorisation de travailleur',
+        "Vous n'êtes plus autorisé à ajouter ou modifier les travailleurs de l'atelier '{workshop}'.",
+    ),
+    "worker_authorization_is_setting": (
+        'Autorisation de paramètres',
+        "Vous avez été autorisé à modifier les paramètres de l'atelier '{workshop}'.",
+        'Retrait de l\'autorisation de paramètres',
+        "Vous n'êtes plus autorisé à modifier les paramètres de l'atelier '{workshop}'.",
+    ),
+}
+
+
+@outbox.handler("notifications.authorisation_changed")
+def authorisation_changed(payload):
+    workshop = Workshop.objects.only("name").get(pk=payload["workshop"])
+    users = Worker.objects.filter(
+        workshop_id=workshop.pk, pk__in=payload["workers"]).values_list("user_id", flat=True)
+
+    accept_title, accept_message, reject_title, reject_message = \
+        AUTHORISATION_MESSAGES[payload["field"]]
+    if payload["granted"]:
+        fields = dict(category=Category.AUTHORISATION_ACCEPT, type=Type.SUCCESS,
+                      title=accept_title, message=accept_message.format(workshop=workshop.name))
+    else:
+        fields = dict(category=Category.AUTHORISATION_REJECT, type=Type.ERROR,
+                      title=reject_title, message=reject_message.format(workshop=workshop.name))
+    fan_out(notify(users, **fields))
@@ -0,0 +1,45 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from notifications import dispatch
+
+
+class Command(BaseCommand):
+    help = (
+        "Envoie par email les notifications externes dues, par lots sur une "
+        "connexion SMTP réutilisée, avec une limite d'envois par minute."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=50,
+            help="Nombre de notifications envoyées par connexion SMTP.",
+        )
+        parser.add_argument(
+            "--per-minute", type=int,
+            default=getattr(settings, "EXTERNAL_NOTIFICATIONS_PER_MINUTE", 60),
+            help="Nombre maximal d'envois par minute (0 : illimité).",
+        )
+        parser.add_argument(
+            "--interval", type=float, default=30,
+            help="Attente (secondes) entre deux passages quand la file est vide.",
+        )
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Envoie les notifications dues puis s'arrête.",
+        )
+
+    def handle(self, *args, batch_size=50, per_minute=60, interval=30, once=False, **options):
+        throttle = dispatch.Throttle(per_minute)
+        try:
+            while True:
+                sent, failed = dispatch.dispatch(batch_size, throttle)
+                if sent or failed or once:
+                    self.stdout.write(f"{sent} notification(s) envoyée(s), {failed} échec(s).")
+                if once:
+                    return
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            self.stdout.write("Envoi des notifications arrêté.")
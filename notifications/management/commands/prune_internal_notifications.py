@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+
+from notifications import retention
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive les notifications internes expirées (lues et non lues) par "
+        "lots, puis purge les archives expirées."
+    )
+
+    def add_arguments(self, parser):
+        defaults = retention.policy()
+        parser.add_argument(
+            "--read-days", type=int, default=defaults["read_days"],
+            help="Âge (jours) au-delà duquel une notification lue est archivée.",
+        )
+        parser.add_argument(
+            "--unread-days", type=int, default=defaults["unread_days"],
+            help="Âge (jours) au-delà duquel une notification non lue est archivée.",
+        )
+        parser.add_argument(
+            "--archive-days", type=int, default=defaults["archive_days"],
+            help="Âge (jours) au-delà duquel une archive est supprimée.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Nombre de lignes par transaction.",
+        )
+        parser.add_argument(
+            "--sleep", type=float, default=0,
+            help="Pause (secondes) entre deux lots.",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Compte les lignes concernées sans rien modifier.",
+        )
+
+    def handle(self, *args, read_days, unread_days, archive_days, batch_size=1000,
+               sleep=0, dry_run=False, **options):
+        if dry_run:
+            counts = {name: queryset.count()
+                      for name, queryset in retention.expired(read_days, unread_days).items()}
+            counts["archive"] = retention.expired_archive(archive_days).count()
+            self.stdout.write(
+                "À archiver : {read} lue(s), {unread} non lue(s) ; "
+                "archives à supprimer : {archive}.".format(**counts))
+            return
+
+        report = retention.prune(read_days, unread_days, archive_days, batch_size, sleep)
+        self.stdout.write(self.style.SUCCESS(
+            "Archivées : {read} lue(s), {unread} non lue(s) ; "
+            "archives supprimées : {archive_deleted} ; durée : {seconds:.1f}s.".format(**report)))
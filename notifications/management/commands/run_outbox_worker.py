@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications import outbox
+
+
+class Command(BaseCommand):
+    help = (
+        "Traite l'outbox des effets de bord (notifications/outbox.py) : réclame "
+        "les messages dus par lots, exécute leurs handlers et replanifie les échecs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=50,
+            help="Nombre de messages réclamés par lot.",
+        )
+        parser.add_argument(
+            "--interval", type=float, default=5,
+            help="Attente maximale (secondes) quand la file est vide.",
+        )
+        parser.add_argument(
+            "--stats-every", type=float, default=60,
+            help="Affiche la profondeur et le retard de la file toutes les N secondes (0 : jamais).",
+        )
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Traite les messages dus puis s'arrête.",
+        )
+        parser.add_argument(
+            "--stats", action="store_true",
+            help="Affiche l'état de la file sans rien traiter.",
+        )
+
+    def handle(self, *args, batch_size=50, interval=5, stats_every=60,
+               once=False, stats=False, **options):
+        if stats:
+            self._report()
+            return
+
+        if once:
+            done = failed = 0
+            while True:
+                batch_done, batch_failed = outbox.run_batch(batch_size)
+                done, failed = done + batch_done, failed + batch_failed
+                if batch_done + batch_failed < batch_size:
+                    break
+            self.stdout.write(f"{done} message(s) traité(s), {failed} échec(s).")
+            self._report()
+            return
+
+        waiter = outbox.Waiter()
+        last_report = 0
+        self.stdout.write("Worker de l'outbox démarré (Ctrl+C pour arrêter).")
+        try:
+            while True:
+                done, failed = outbox.run_batch(batch_size)
+                if done or failed:
+                    self.stdout.write(f"{done} message(s) traité(s), {failed} échec(s).")
+                if stats_every and time.monotonic() - last_report >= stats_every:
+                    self._report()
+                    last_report = time.monotonic()
+                if done + failed < batch_size:
+                    waiter.wait(interval)
+        except KeyboardInterrupt:
+            self.stdout.write("Worker de l'outbox arrêté.")
+
+    def _report(self):
+        state = outbox.stats()
+        self.stdout.write(
+            f"file : {state['depth']} message(s) en attente dont {state['due']} dû(s), "
+            f"retard {state['lag_seconds']:.0f}s, {state['dead']} abandonné(s)."
+        )
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='internalnotification',
+            index=models.Index(fields=['user', 'is_read', '-createdAt', 'id'], name='notificatio_user_id_8070f9_idx'),
+        ),
+    ]
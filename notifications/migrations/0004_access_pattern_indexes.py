@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_keyset_pagination_indexes'),
+        ('workshop', '0009_access_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='internalnotification',
+            name='notificatio_user_id_abd520_idx',
+        ),
+        migrations.AddIndex(
+            model_name='externalnotification',
+            index=models.Index(condition=models.Q(('is_sent', False)), fields=['scheduled_for'], name='extnotif_pending_sched_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_outbox_message'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='externalnotification',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='externalnotification',
+            name='last_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='externalnotification',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='externalnotification',
+            name='sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0006_external_notification_dispatch'),
+        ('users', '0002_phone_normalized'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadNotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='unread_notifications', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('count', models.IntegerField(default=0)),
+                ('updatedAt', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0007_unread_notification_counter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InternalNotificationArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('type', models.CharField(choices=[('info', 'Information'), ('warning', 'Avertissement'), ('error', 'Erreur'), ('success', 'Succès')], max_length=50)),
+                ('read_at', models.DateTimeField(blank=True, null=True)),
+                ('category', models.CharField(blank=True, choices=[('WORKER_CREATION', 'Worker Creation'), ('WORKER_UPDATE', 'Worker Update'), ('CUSTOMER_CREATION', 'Customer Creation'), ('CUSTOMER_UPDATE', 'Customer Update'), ('CUSTOMER_DELETION', 'Customer Deletion'), ('ORDER_CREATION', 'Order Creation'), ('ORDER_UPDATE', 'Order Update'), ('ORDER_DELETION', 'Order Deletion'), ('ORDER_GROUP_CREATION', 'Order Group Creation'), ('ORDER_GROUP_UPDATE', 'Order Group Update'), ('ORDER_GROUP_DELETION', 'Order Group Deletion'), ('FITTING_CREATION', 'Fitting Creation'), ('FITTING_UPDATE', 'Fitting Update'), ('FITTING_DELETION', 'Fitting Deletion'), ('WORKSHOP_CREATION', 'Workshop Creation'), ('WORKSHOP_UPDATE', 'Workshop Update'), ('AUTHORISATION_ACCEPT', 'Authorisation Accept'), ('AUTHORISATION_REJECT', 'Authorisation Reject'), ('SETTING_CREATION', 'Setting Creation'), ('SETTING_UPDATE', 'Setting Update')], max_length=50, null=True)),
+                ('object_content', models.CharField(blank=True, choices=[('Setting', 'Setting'), ('Worker', 'Worker'), ('Customer', 'Customer'), ('Order', 'Order'), ('OrderGroup', 'OrderGroup'), ('Fitting', 'Fitting'), ('Workshop', 'Workshop')], max_length=50, null=True)),
+                ('object_pk', models.CharField(blank=True, max_length=225, null=True)),
+                ('title', models.CharField(max_length=255)),
+                ('message', models.TextField()),
+                ('is_read', models.BooleanField(default=False)),
+                ('createdAt', models.DateTimeField()),
+                ('archivedAt', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Internal Notification Archive',
+                'verbose_name_plural': 'Internal Notification Archives',
+                'indexes': [models.Index(fields=['user', '-archivedAt'], name='notificatio_user_id_5bb705_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-17 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0008_internal_notification_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='internalnotification',
+            name='occurrences',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='internalnotificationarchive',
+            name='occurrences',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
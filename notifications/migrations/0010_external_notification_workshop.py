@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-17 20:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_workshop(apps, schema_editor):
+    CustomerWorkshop = apps.get_model("workshop", "CustomerWorkshop")
+    ExternalNotification = apps.get_model("notifications", "ExternalNotification")
+
+    ExternalNotification.objects.update(workshop_id=Subquery(
+        CustomerWorkshop.objects.filter(pk=OuterRef("customer_id")).values("workshop_id")[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0009_notification_occurrences'),
+        ('workshop', '0009_access_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='externalnotification',
+            name='workshop',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='external_notifications', to='workshop.workshop'),
+        ),
+        migrations.RunPython(backfill_workshop, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='externalnotification',
+            name='workshop',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='external_notifications', to='workshop.workshop'),
+        ),
+        migrations.AddIndex(
+            model_name='externalnotification',
+            index=models.Index(fields=['workshop', '-id'], name='notificatio_worksho_e316b1_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-17 20:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0010_external_notification_workshop'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='internalnotification',
+            name='lastOccurrenceAt',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='internalnotificationarchive',
+            name='lastOccurrenceAt',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -4,17 +4,22 @@ from rest_framework.pagination import PageNumberPagination
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.request import Request
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import NotFound, ValidationError
 from workshop.models import Workshop
 
-from drf_spectacular.utils import extend_schema
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 
+from notifications.filters import ExternalNotificationFilterSet
 from notifications.models import InternalNotification, ExternalNotification
 from notifications.serializers import (
     InternalNotificatinoReadSerializer,
     InternalNotificationWriteSerializer,
-    ExternalNotificationReadSerializer
+    ExternalNotificationReadSerializer,
+    UnreadCountSerializer,
+    InternalNotificationBulkSerializer,
+    BulkCountSerializer
 )
+from notifications import bulk, counters
 
 from ecouture.serializers import (
     NotFound404ResponseSerializer, ValidationError400Serializer
@@ -33,7 +38,20 @@ class InternaNotificationMixin:
         responses={
             200: InternalNotificatinoReadSerializer(many=True),
             404: NotFound404ResponseSerializer
-        }
+        },
+        parameters=[
+            OpenApiParameter(
+                name="pagination",
+                type=str,
+                enum=["cursor"],
+                description="'cursor' : pagination par curseur, sans total (count)"
+            ),
+            OpenApiParameter(
+                name="cursor",
+                type=str,
+                description="Curseur opaque renvoyé dans 'next' (pagination par curseur)"
+            ),
+        ]
     )
     @action(
         detail=False,
@@ -49,11 +67,87 @@ class InternaNotificationMixin:
         user = request.user
         if request.method == 'GET':
             notifications = user.notifications.filter(is_read=False)
+            self.use_keyset_pagination(request, ('-createdAt', 'id'))
             page = self.paginate_queryset(notifications)
             serializer = InternalNotificatinoReadSerializer(page, many=True)
             return self.get_paginated_response(serializer.data)
         raise ValidationError("Method not allowed. Use GET.")
 
+    @extend_schema(
+        methods=['get'],
+        summary="Nombre de notifications internes non lues",
+        description="Nombre de notifications internes non lues (badge), lu depuis un compteur maintenu",
+        responses={200: UnreadCountSerializer}
+    )
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='internal/unread-count',
+        url_name='internal-unread-count',
+        permission_classes=[IsAuthenticated]
+    )
+    def internal_unread_count(self, request: Request, *args, **kwargs):
+        """
+        Unread internal notifications count for the authenticated user.
+        """
+        serializer = UnreadCountSerializer({"unread": counters.get_unread(request.user.pk)})
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    def _bulk_selection(self, request: Request):
+        serializer = InternalNotificationBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        return bulk.select(
+            request.user, ids=data.get('ids'), before=data.get('before'), everything=data['all'])
+
+    @extend_schema(
+        methods=['post'],
+        summary="Marquer des notifications internes comme lues",
+        description="Marque comme lues, en une requête, les notifications désignées par 'ids', 'before' ou 'all'",
+        request=InternalNotificationBulkSerializer,
+        responses={
+            200: BulkCountSerializer,
+            400: ValidationError400Serializer
+        }
+    )
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='internal/mark-read',
+        url_name='internal-mark-read',
+        permission_classes=[IsAuthenticated]
+    )
+    def internal_mark_read(self, request: Request, *args, **kwargs):
+        """
+        Mark several internal notifications of the authenticated user as read.
+        """
+        count = bulk.mark_read(request.user, self._bulk_selection(request))
+        return Response(BulkCountSerializer({"count": count}).data, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        methods=['post'],
+        summary="Archiver des notifications internes",
+        description="Archive les notifications désignées par 'ids', 'before' ou 'all' (elles ne sont plus listées)",
+        request=InternalNotificationBulkSerializer,
+        responses={
+            200: BulkCountSerializer,
+            400: ValidationError400Serializer
+        }
+    )
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='internal/archive',
+        url_name='internal-archive',
+        permission_classes=[IsAuthenticated]
+    )
+    def internal_archive(self, request: Request, *args, **kwargs):
+        """
+        Archive several internal notifications of the authenticated user.
+        """
+        count = bulk.archive(request.user, self._bulk_selection(request))
+        return Response(BulkCountSerializer({"count": count}).data, status=status.HTTP_200_OK)
+
     @extend_schema(
         methods=['patch'],
         summary="Modifier une notification interne",
@@ -67,7 +161,7 @@ class InternaNotificationMixin:
     @action(
         detail=False,
         methods=['patch'],
-        url_path='internal/(?P<notification_id>[^/.]+)',
+        url_path=r'internal/(?P<notification_id>\d+)',
         url_name='internal-update',
         permission_classes=[IsAuthenticated]
     )
@@ -91,11 +185,39 @@ class ExternalNotificationMixin:
     @extend_schema(
         methods=['get'],
         summary="Voir les notifications externes",
-        description="Voir les notifications externes",
+        description="Voir les notifications externes de l'atelier, plus récentes d'abord (pagination par curseur)",
         responses={
             200: ExternalNotificationReadSerializer(many=True),
             404: NotFound404ResponseSerializer
-        }
+        },
+        parameters=[
+            OpenApiParameter(
+                name="type",
+                type=str,
+                enum=["email", "sms", "push"],
+                description="Canal de la notification"
+            ),
+            OpenApiParameter(
+                name="is_sent",
+                type=bool,
+                description="Notifications envoyées / à envoyer"
+            ),
+            OpenApiParameter(
+                name="scheduled_after",
+                type=str,
+                description="Notifications prévues à partir de cette date (AAAA-MM-JJ)"
+            ),
+            OpenApiParameter(
+                name="scheduled_before",
+                type=str,
+                description="Notifications prévues jusqu'à cette date (AAAA-MM-JJ)"
+            ),
+            OpenApiParameter(
+                name="cursor",
+                type=str,
+                description="Curseur opaque renvoyé dans 'next'"
+            ),
+        ]
     )
     @action(
         detail=False,
@@ -107,9 +229,12 @@ class ExternalNotificationMixin:
         """
         Retrieve external notifications for the authenticated user.
         """
-        workshop = Workshop.objects.get(pk=workshop_pk)
-        notifications = ExternalNotification.objects.filter(
-            customer__workshop=workshop)
-        serializer = ExternalNotificationReadSerializer(
-            notifications, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        if not Workshop.objects.filter(pk=workshop_pk).exists():
+            raise NotFound("Workshop not found.")
+        notifications = ExternalNotification.objects.filter(workshop_id=workshop_pk)
+        filtered_qs = ExternalNotificationFilterSet(request.GET, queryset=notifications).qs
+
+        self.use_keyset_pagination(request, ('-id',), default=True)
+        page = self.paginate_queryset(filtered_qs)
+        serializer = ExternalNotificationReadSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
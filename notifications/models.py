@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -59,6 +60,10 @@ class InternalNotification(models.Model):
     title = models.CharField(max_length=255)
     message = models.TextField()
     is_read = models.BooleanField(default=False)
+    # notifications identiques regroupées dans cette ligne (handlers.coalesce) ;
+    # createdAt ne bouge pas (clé du curseur), la dernière occurrence est à part
+    occurrences = models.PositiveIntegerField(default=1)
+    lastOccurrenceAt = models.DateTimeField(null=True, blank=True)
     createdAt = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -67,12 +72,69 @@ class InternalNotification(models.Model):
     class Meta:
         ordering = ['-createdAt']
         indexes = [
-            models.Index(fields=['user', 'is_read']),
+            # non lues d'un utilisateur, et pagination par curseur
+            # (couvre aussi les filtres sur (user, is_read) seuls)
+            models.Index(fields=['user', 'is_read', '-createdAt', 'id']),
         ]
         verbose_name = 'Internal Notification'
         verbose_name_plural = 'Internal Notifications'
 
 
+class InternalNotificationArchive(models.Model):
+    """
+    Notifications internes archivées (notifications/bulk.py), sorties de la
+    table des notifications actives ; l'id d'origine est conservé.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='archived_notifications')
+    type = models.CharField(
+        max_length=50, choices=InternalNotification.TypeInternalNotification.choices)
+    read_at = models.DateTimeField(null=True, blank=True)
+    category = models.CharField(
+        max_length=50, choices=InternalNotification.CategoryInternalNotification.choices,
+        null=True, blank=True)
+    object_content = models.CharField(
+        max_length=50, choices=InternalNotification.ObjectContentInternalNotification.choices,
+        null=True, blank=True)
+    object_pk = models.CharField(max_length=225, null=True, blank=True)
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    is_read = models.BooleanField(default=False)
+    occurrences = models.PositiveIntegerField(default=1)
+    lastOccurrenceAt = models.DateTimeField(null=True, blank=True)
+    createdAt = models.DateTimeField()
+    archivedAt = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-archivedAt']),
+        ]
+        verbose_name = 'Internal Notification Archive'
+        verbose_name_plural = 'Internal Notification Archives'
+
+
+class UnreadNotificationCounter(models.Model):
+    """
+    Nombre de notifications internes non lues d'un utilisateur (badge).
+    Maintenu par incréments F() (notifications/counters.py) ;
+    `reconcile_unread_notifications` le recalcule.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='unread_notifications'
+    )
+    count = models.IntegerField(default=0)
+    updatedAt = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Non lues de {self.user_id} : {self.count}"
+
+
 class ExternalNotification(models.Model):
     """
     Modèle de notification externe pour les utilisateurs.
@@ -81,6 +143,10 @@ class ExternalNotification(models.Model):
     """
     customer = models.ForeignKey(
         "workshop.CustomerWorkshop", on_delete=models.CASCADE, related_name='external_notifications')
+    # atelier du client, dénormalisé pour lister sans jointure
+    workshop = models.ForeignKey(
+        "workshop.Workshop", on_delete=models.CASCADE, related_name='external_notifications',
+        editable=False, db_index=False)
     type = models.CharField(max_length=50, choices=[
         ('email', 'Email'),
         ('sms', 'SMS'),
@@ -90,3 +156,67 @@ class ExternalNotification(models.Model):
     title = models.CharField(max_length=255)
     message = models.TextField()
     is_sent = models.BooleanField(default=False)
+    # envoi (notifications/dispatch.py)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [
+            # file des notifications à envoyer : index partiel sur les seules
+            # non envoyées (Django écrit is_sent=False en `NOT is_sent`, qu'un
+            # index (is_sent, scheduled_for) ne sert pas sous SQLite)
+            models.Index(
+                fields=['scheduled_for'],
+                condition=models.Q(is_sent=False),
+                name='extnotif_pending_sched_idx',
+            ),
+            # liste par atelier, plus récentes d'abord (pagination par curseur)
+            models.Index(fields=['workshop', '-id']),
+        ]
+
+    def save(self, *args, **kwargs):
+        # les handlers fournissent déjà l'atelier : pas de lecture du client
+        update_fields = kwargs.get("update_fields")
+        if self.workshop_id is None or (update_fields is not None and "customer" in update_fields):
+            self.workshop_id = self.customer.workshop_id
+        if update_fields is not None and "customer" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "workshop"}
+        super().save(*args, **kwargs)
+
+
+class OutboxMessage(models.Model):
+    """
+    Effet de bord à exécuter après validation de la transaction qui l'a
+    produit (voir notifications/outbox.py). Supprimé une fois traité.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'En attente'
+        DEAD = 'DEAD', 'Abandonné'
+
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    # bail du worker qui a réclamé le message
+    locked_until = models.DateTimeField(null=True, blank=True)
+    claimed_by = models.CharField(max_length=32, blank=True, default='')
+    last_error = models.TextField(blank=True, default='')
+    createdAt = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # messages dus, dans l'ordre de traitement
+            models.Index(
+                fields=['available_at', 'id'],
+                condition=models.Q(status='PENDING'),
+                name='outbox_pending_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} #{self.pk} ({self.status})"
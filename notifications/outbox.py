@@ -0,0 +1,204 @@
+"""
+Outbox transactionnelle pour les effets de bord (notifications, messages
+externes, tenue des groupes d'utilisateurs).
+
+`enqueue()` écrit un OutboxMessage dans la transaction de la modification
+métier : le message n'existe que si la modification est validée. Le worker
+(`manage.py run_outbox_worker`) réclame les messages par lots, exécute le
+handler enregistré pour leur `topic`, supprime les messages traités et
+replanifie les échecs avec un délai exponentiel.
+
+Réclamation d'un lot :
+- moteurs avec SKIP LOCKED (PostgreSQL, MySQL) : SELECT ... FOR UPDATE SKIP LOCKED ;
+- SQLite : UPDATE conditionnel (la ligne n'est prise que si elle est encore
+  libre), la base sérialisant les écritures.
+Un message réclamé est réservé jusqu'à `locked_until` : si le worker meurt,
+il redevient disponible à l'expiration du bail.
+
+OUTBOX_EAGER (développement, tests) : le handler est exécuté immédiatement
+dans la transaction courante ; le message n'est écrit que s'il échoue, pour
+être repris par le worker.
+"""
+import logging
+import select
+import time
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from notifications.models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "ecouture_outbox"
+
+HANDLERS = {}
+
+
+def handler(topic: str):
+    """Enregistre la fonction `func(payload)` qui traite les messages `topic`."""
+    def register(func):
+        HANDLERS[topic] = func
+        return func
+    return register
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue(topic: str, payload: dict, delay: timedelta = None):
+    """
+    Ajoute un message à l'outbox dans la transaction courante.
+    `payload` doit être sérialisable en JSON.
+    """
+    if topic not in HANDLERS:
+        raise KeyError(f"Aucun handler pour le topic '{topic}'.")
+
+    if _setting("OUTBOX_EAGER", False) and delay is None:
+        try:
+            with transaction.atomic():
+                HANDLERS[topic](payload)
+            return None
+        except Exception as exc:  # repris par le worker
+            logger.exception("Outbox (eager) : échec de %s", topic)
+            return OutboxMessage.objects.create(
+                topic=topic, payload=payload, attempts=1,
+                available_at=timezone.now() + retry_delay(1), last_error=_format_error(exc))
+
+    message = OutboxMessage.objects.create(
+        topic=topic, payload=payload,
+        available_at=timezone.now() + (delay or timedelta()))
+    transaction.on_commit(wake)
+    return message
+
+
+def wake():
+    """Réveille les workers en attente (PostgreSQL : NOTIFY ; ailleurs ils interrogent)."""
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(f"NOTIFY {NOTIFY_CHANNEL}")
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Délai avant la tentative suivante : exponentiel, plafonné."""
+    base = _setting("OUTBOX_RETRY_BASE_SECONDS", 5)
+    cap = _setting("OUTBOX_RETRY_MAX_SECONDS", 3600)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), cap))
+
+
+def _format_error(exc) -> str:
+    return "".join(traceback.format_exception(exc))[-4000:]
+
+
+def _due(now):
+    return Q(status=OutboxMessage.Status.PENDING, available_at__lte=now) & (
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now))
+
+
+def claim(batch_size: int = 50, lease: timedelta = None):
+    """Réserve jusqu'à `batch_size` messages dus pour ce worker et les retourne."""
+    now = timezone.now()
+    lease = lease or timedelta(seconds=_setting("OUTBOX_LEASE_SECONDS", 300))
+    token = uuid.uuid4().hex
+    due = OutboxMessage.objects.filter(_due(now)).order_by("available_at", "id")
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(due.select_for_update(skip_locked=True).values_list("id", flat=True)[:batch_size])
+            OutboxMessage.objects.filter(id__in=ids).update(
+                locked_until=now + lease, claimed_by=token)
+    else:
+        # l'UPDATE revérifie la disponibilité : deux workers ne prennent pas la même ligne
+        ids = list(due.values_list("id", flat=True)[:batch_size])
+        OutboxMessage.objects.filter(_due(now), id__in=ids).update(
+            locked_until=now + lease, claimed_by=token)
+
+    return list(OutboxMessage.objects.filter(id__in=ids, claimed_by=token).order_by(
+        "available_at", "id"))
+
+
+def process(message: OutboxMessage) -> bool:
+    """Exécute le handler du message ; True si traité, False si replanifié ou abandonné."""
+    func = HANDLERS.get(message.topic)
+    try:
+        if func is None:
+            raise KeyError(f"Aucun handler pour le topic '{message.topic}'.")
+        with transaction.atomic():
+            func(message.payload)
+    except Exception as exc:
+        _fail(message, exc)
+        return False
+    message.delete()
+    return True
+
+
+def _fail(message: OutboxMessage, exc):
+    message.attempts += 1
+    message.last_error = _format_error(exc)
+    message.locked_until = None
+    message.claimed_by = ""
+    if message.attempts >= _setting("OUTBOX_MAX_ATTEMPTS", 8):
+        message.status = OutboxMessage.Status.DEAD
+        logger.error("Outbox : %s #%s abandonné après %s tentatives",
+                     message.topic, message.pk, message.attempts)
+    else:
+        message.available_at = timezone.now() + retry_delay(message.attempts)
+    message.save(update_fields=[
+        "attempts", "last_error", "locked_until", "claimed_by", "status", "available_at"])
+
+
+def run_batch(batch_size: int = 50) -> tuple:
+    """Réclame et traite un lot ; retourne (traités, échoués)."""
+    done = failed = 0
+    for message in claim(batch_size):
+        if process(message):
+            done += 1
+        else:
+            failed += 1
+    return done, failed
+
+
+def stats() -> dict:
+    """Profondeur de la file, retard du plus ancien message dû, messages abandonnés."""
+    now = timezone.now()
+    pending = OutboxMessage.objects.filter(status=OutboxMessage.Status.PENDING).aggregate(
+        depth=Count("id"),
+        due=Count("id", filter=Q(available_at__lte=now)),
+        oldest=Min("available_at", filter=Q(available_at__lte=now)),
+    )
+    oldest = pending.pop("oldest")
+    pending["lag_seconds"] = max((now - oldest).total_seconds(), 0) if oldest else 0
+    pending["dead"] = OutboxMessage.objects.filter(status=OutboxMessage.Status.DEAD).count()
+    return pending
+
+
+class Waiter:
+    """
+    Attente entre deux lots : LISTEN/NOTIFY sous PostgreSQL (réveil dès le
+    commit d'un message), simple pause ailleurs.
+    """
+
+    def __init__(self):
+        self.listening = False
+        if connection.vendor == "postgresql":
+            connection.ensure_connection()
+            raw = connection.connection
+            if hasattr(raw, "poll"):  # psycopg2
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                self.listening = True
+
+    def wait(self, timeout: float):
+        if not self.listening:
+            time.sleep(timeout)
+            return
+        raw = connection.connection
+        if raw.notifies or select.select([raw], [], [], timeout)[0]:
+            raw.poll()
+            raw.notifies.clear()
@@ -0,0 +1,78 @@
+"""
+Rétention des notifications internes (`manage.py prune_internal_notifications`).
+
+Les notifications plus anciennes que NOTIFICATION_RETENTION_READ_DAYS (lues)
+ou NOTIFICATION_RETENTION_UNREAD_DAYS (non lues) sont déplacées dans
+InternalNotificationArchive ; l'archive est purgée après
+NOTIFICATION_ARCHIVE_RETENTION_DAYS.
+
+Le travail est découpé en lots de `batch_size` lignes, chacun dans sa propre
+transaction courte : les verrous ne portent que sur un lot. Les lots sont
+pris par id croissant ; les ids suivant l'ordre de création, les lignes
+anciennes sont trouvées en tête du parcours de la clé primaire.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from notifications.bulk import archive_rows
+from notifications.models import InternalNotification, InternalNotificationArchive
+
+
+def policy() -> dict:
+    """Âges limites (jours) de la politique de rétention."""
+    return {
+        "read_days": getattr(settings, "NOTIFICATION_RETENTION_READ_DAYS", 30),
+        "unread_days": getattr(settings, "NOTIFICATION_RETENTION_UNREAD_DAYS", 90),
+        "archive_days": getattr(settings, "NOTIFICATION_ARCHIVE_RETENTION_DAYS", 365),
+    }
+
+
+def expired(read_days, unread_days, now=None):
+    now = now or timezone.now()
+    return {
+        "read": InternalNotification.objects.filter(
+            is_read=True, createdAt__lt=now - timedelta(days=read_days)),
+        "unread": InternalNotification.objects.filter(
+            is_read=False, createdAt__lt=now - timedelta(days=unread_days)),
+    }
+
+
+def expired_archive(archive_days, now=None):
+    now = now or timezone.now()
+    return InternalNotificationArchive.objects.filter(
+        archivedAt__lt=now - timedelta(days=archive_days))
+
+
+def _chunks(queryset, batch_size, pause, work):
+    """Applique `work(lot)` lot par lot ; retourne le nombre de lignes traitées."""
+    total = 0
+    while True:
+        with transaction.atomic():
+            ids = list(queryset.order_by("id").values_list("id", flat=True)[:batch_size])
+            if not ids:
+                return total
+            total += work(queryset.model.objects.filter(pk__in=ids))
+        if pause:
+            time.sleep(pause)
+
+
+def prune(read_days, unread_days, archive_days, batch_size=1000, pause=0):
+    """
+    Archive les notifications expirées et purge l'archive ; retourne
+    {read, unread, archive_deleted, seconds}.
+    """
+    started = time.monotonic()
+    now = timezone.now()
+    report = {}
+    for name, queryset in expired(read_days, unread_days, now).items():
+        report[name] = _chunks(
+            queryset, batch_size, pause, lambda batch: len(archive_rows(batch)))
+    report["archive_deleted"] = _chunks(
+        expired_archive(archive_days, now), batch_size, pause,
+        lambda batch: batch.delete()[0])
+    report["seconds"] = time.monotonic() - started
+    return report
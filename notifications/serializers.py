@@ -8,7 +8,8 @@ class InternalNotificatinoReadSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = InternalNotification
-        fields = ['id', 'type', 'read_at', 'category', 'title', 'message', 'is_read', 'createdAt']
+        fields = ['id', 'type', 'read_at', 'category', 'title', 'message', 'is_read', 'occurrences',
+                  'lastOccurrenceAt', 'createdAt']
         read_only_fields = ['id', 'createdAt']
         
 
@@ -40,4 +41,38 @@ class ExternalNotificationReadSerializer(serializers.ModelSerializer):
     class Meta:
         model = ExternalNotification
         fields = ['id', 'type', 'scheduled_for', 'title', 'message', 'is_sent']
-        read_only_fields = ['id']
\ No newline at end of file
+        read_only_fields = ['id']
+
+
+class UnreadCountSerializer(serializers.Serializer):
+    """
+    Nombre de notifications internes non lues de l'utilisateur.
+    """
+    unread = serializers.IntegerField()
+
+
+class InternalNotificationBulkSerializer(serializers.Serializer):
+    """
+    Sélection de notifications internes pour une opération groupée :
+    une liste d'ids, `before` (créées avant cette date) ou `all`.
+    """
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False, max_length=1000)
+    before = serializers.DateTimeField(required=False)
+    all = serializers.BooleanField(required=False, default=False)
+
+    def validate(self, attrs):
+        selectors = [key for key in ('ids', 'before') if key in attrs]
+        if attrs['all']:
+            selectors.append('all')
+        if len(selectors) != 1:
+            raise serializers.ValidationError(
+                "Exactly one of 'ids', 'before' or 'all' is required.")
+        return attrs
+
+
+class BulkCountSerializer(serializers.Serializer):
+    """
+    Nombre de notifications concernées par une opération groupée.
+    """
+    count = serializers.IntegerField()
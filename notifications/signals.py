@@ -1,133 +1,128 @@
-from django.db.models.signals import post_save, m2m_changed
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, pre_save, post_delete, m2m_changed
+from django.db import transaction
 from django.dispatch import receiver
 from workshop.models import (
     OrderWorkshop, OrderWorkshopGroup, CustomerWorkshop,
-    Setting, Workshop, Worker, Fitting
+    Setting, Workshop, Fitting
 )
-from notifications.models import InternalNotification, ExternalNotification
-
-
-def create_internal_notification(user, category, type, title, message, object_content=None, object_pk=None):
-    InternalNotification.objects.create(
-        user=user,
-        category=category,
-        type=type,
-        title=title,
-        message=message,
-        object_content=object_content,
-        object_pk=object_pk
-    )
+from workshop import snapshots
+from notifications import counters, outbox
+from notifications.broker import get_broker
+from notifications.handlers import AUTHORISATION_MESSAGES
+from notifications.models import InternalNotification, UnreadNotificationCounter
+
+# Les notifications sont produites par les handlers de l'outbox
+# (notifications/handlers.py) : les signaux n'écrivent qu'un message.
+
+
+@receiver(post_save, sender=InternalNotification, dispatch_uid="internal_notification_publish")
+def publish_internal_notification(sender, instance: InternalNotification, created, raw=False, **kwargs):
+    # flux SSE (notifications/stream.py) ; les envois groupés publient dans fan_out
+    if created and not raw:
+        transaction.on_commit(lambda: get_broker().publish([instance.user_id]))
+
+
+# Compteur des non lues (notifications/counters.py)
+
+@receiver(post_save, sender=get_user_model(), dispatch_uid="user_unread_counter_create")
+def create_unread_counter(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UnreadNotificationCounter.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=InternalNotification, dispatch_uid="internal_notification_unread_snapshot")
+def snapshot_internal_notification_unread(sender, instance: InternalNotification, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        instance._unread_was_counted = False
+        return
+    was_read = InternalNotification.objects.filter(pk=instance.pk).values_list(
+        "is_read", flat=True).first()
+    instance._unread_was_counted = was_read is False
+
+
+@receiver(post_save, sender=InternalNotification, dispatch_uid="internal_notification_unread_update")
+def update_internal_notification_unread(sender, instance: InternalNotification, raw=False, **kwargs):
+    if raw:
+        return
+    # création, lecture ou retour à non lue
+    delta = int(not instance.is_read) - int(getattr(instance, "_unread_was_counted", False))
+    counters.add(instance.user_id, delta)
+
+
+@receiver(post_delete, sender=InternalNotification, dispatch_uid="internal_notification_unread_delete")
+def delete_internal_notification_unread(sender, instance: InternalNotification, origin=None, **kwargs):
+    # suppression de l'utilisateur : son compteur est supprimé avec lui
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if not instance.is_read and origin_model is not get_user_model():
+        counters.add(instance.user_id, -1)
 
 
 @receiver(post_save, sender=Workshop, dispatch_uid="workshop_create_new")
-def create_workshop(sender, instance: Workshop, created, **kwargs):
-    if created:
-        for owner in instance.get_owners():
-            create_internal_notification(
-                user=owner.user,
-                category=InternalNotification.CategoryInternalNotification.WORKSHOP_CREATION,
-                type=InternalNotification.TypeInternalNotification.INFO,
-                title='Atelier créé',
-                message=f"Votre atelier '{instance.name}' a été créé avec succès.",
-                object_content=InternalNotification.ObjectContentInternalNotification.WORKSHOP,
-                object_pk=instance.pk
-            )
+def create_workshop(sender, instance: Workshop, created, raw=False, **kwargs):
+    if created and not raw:
+        outbox.enqueue("notifications.workshop_created", {
+            "workshop": instance.pk, "name": instance.name,
+        })
+
+
+ORDER_NOTIFIED_FIELDS = ("status", "payment_status", "is_deleted")
+
+
+snapshots.register(OrderWorkshop, *ORDER_NOTIFIED_FIELDS)
 
 
 @receiver(post_save, sender=OrderWorkshop, dispatch_uid="order_workshop_create_notification")
-def create_order_workshop(sender, instance: OrderWorkshop, created, **kwargs):
-    owners = instance.worker.workshop.get_owners()
+def create_order_workshop(sender, instance: OrderWorkshop, created, raw=False, **kwargs):
+    if raw:
+        return
+    payload = {
+        "order": instance.pk,
+        "number": instance.number,
+        "workshop": instance.workshop_id,
+        "worker": instance.worker_id,
+        "customer": instance.customer_id,
+    }
     if created:
-        create_internal_notification(
-            user=instance.worker.user,
-            category=InternalNotification.CategoryInternalNotification.ORDER_CREATION,
-            type=InternalNotification.TypeInternalNotification.INFO,
-            title='Nouvelle commande',
-            message=f"Une nouvelle commande '{instance.number}' a été créée pour vous.",
-            object_content=InternalNotification.ObjectContentInternalNotification.ORDER,
-            object_pk=instance.pk
-        )
-        ExternalNotification.objects.create(
-            customer=instance.customer,
-            type='email',
-            title='Commande créée',
-            message=f"Votre commande '{instance.number}' a été créée avec succès. Veuillez vérifier les détails de votre commande."
-        )
-    else:
-        if instance.is_deleted:
-            create_internal_notification(
-                user=instance.worker.user,
-                category=InternalNotification.CategoryInternalNotification.ORDER_DELETION,
-                type=InternalNotification.TypeInternalNotification.ERROR,
-                title='Commande annulée',
-                message=f"La commande '{instance.number}' a été annulée."
-            )
-        if instance.status == OrderWorkshop.OrderStatus.COMPLETED:
-            for user in [instance.worker.user] + [o.user for o in owners]:
-                create_internal_notification(
-                    user=user,
-                    category=InternalNotification.CategoryInternalNotification.ORDER_UPDATE,
-                    type=InternalNotification.TypeInternalNotification.SUCCESS,
-                    title='Commande terminée',
-                    message=f"La commande '{instance.number}' a été marquée comme terminée.",
-                    object_content=InternalNotification.ObjectContentInternalNotification.ORDER,
-                    object_pk=instance.pk
-                )
-        if instance.status == OrderWorkshop.OrderStatus.IN_PROGRESS:
-            for user in [instance.worker.user] + [o.user for o in owners]:
-                create_internal_notification(
-                    user=user,
-                    category=InternalNotification.CategoryInternalNotification.ORDER_UPDATE,
-                    type=InternalNotification.TypeInternalNotification.INFO,
-                    title='Commande en cours',
-                    message=f"La commande '{instance.number}' est en cours de traitement.",
-                    object_content=InternalNotification.ObjectContentInternalNotification.ORDER,
-                    object_pk=instance.pk
-                )
-        if instance.payment_status == OrderWorkshop.PaymentStatus.PAID:
-            for user in [instance.worker.user] + [o.user for o in owners]:
-                create_internal_notification(
-                    user=user,
-                    category=InternalNotification.CategoryInternalNotification.ORDER_UPDATE,
-                    type=InternalNotification.TypeInternalNotification.SUCCESS,
-                    title='Commande payée',
-                    message=f"La commande '{instance.number}' a été marquée comme payée.",
-                    object_content=InternalNotification.ObjectContentInternalNotification.ORDER,
-                    object_pk=instance.pk
-                )
+        outbox.enqueue("notifications.order_created", payload)
+        return
+
+    # seules les transitions sont notifiées : une valeur inchangée vaut None
+    previous = snapshots.previous(instance) or {}
+    changes = {
+        field: getattr(instance, field) if getattr(instance, field) != previous.get(field) else None
+        for field in ORDER_NOTIFIED_FIELDS
+    }
+    if (changes["is_deleted"]
+            or changes["status"] in (OrderWorkshop.OrderStatus.COMPLETED, OrderWorkshop.OrderStatus.IN_PROGRESS)
+            or changes["payment_status"] == OrderWorkshop.PaymentStatus.PAID):
+        outbox.enqueue("notifications.order_updated", {
+            **payload,
+            **changes,
+            "is_deleted": bool(changes["is_deleted"]),
+        })
 
 
 @receiver(post_save, sender=OrderWorkshopGroup, dispatch_uid="order_workshop_group_create_notification")
-def create_order_workshop_group(sender, instance: OrderWorkshopGroup, created, **kwargs):
-    if created:
-        workers = Worker.objects.filter(pk__in=instance.orders.values_list('worker', flat=True).distinct())
-        for worker in workers:
-            create_internal_notification(
-                user=worker.user,
-                category=InternalNotification.CategoryInternalNotification.ORDER_GROUP_CREATION,
-                type=InternalNotification.TypeInternalNotification.INFO,
-                title='Groupe de commandes créé',
-                message=f"Un nouveau groupe de commandes '{instance.number}' a été créé pour vous.",
-                object_content=InternalNotification.ObjectContentInternalNotification.ORDER_GROUP,
-                object_pk=instance.pk
-            )
+def create_order_workshop_group(sender, instance: OrderWorkshopGroup, created, raw=False, **kwargs):
+    if created and not raw:
+        outbox.enqueue("notifications.order_group_created", {
+            "group": instance.pk, "number": instance.number,
+        })
 
 
 @receiver(post_save, sender=CustomerWorkshop, dispatch_uid="customer_workshop_create_notification")
-def create_customer_workshop(sender, instance: CustomerWorkshop, created, **kwargs):
-    if created:
-        workers = instance.workshop.workers.all()
-        for worker in workers:
-            create_internal_notification(
-                user=worker.user,
-                category=InternalNotification.CategoryInternalNotification.CUSTOMER_CREATION,
-                type=InternalNotification.TypeInternalNotification.INFO,
-                title='Nouveau client',
-                message=f"Un nouveau client '{instance.first_name} {instance.last_name}' a été ajouté à votre atelier (surnom: '{instance.nickname}').",
-                object_content=InternalNotification.ObjectContentInternalNotification.CUSTOMER,
-                object_pk=instance.pk
-            )
-            
+def create_customer_workshop(sender, instance: CustomerWorkshop, created, raw=False, **kwargs):
+    if created and not raw:
+        outbox.enqueue("notifications.customer_created", {
+            "customer": instance.pk,
+            "workshop": instance.workshop_id,
+            "first_name": instance.first_name,
+            "last_name": instance.last_name,
+            "nickname": instance.nickname,
+        })
+
         # ExternalNotification.objects.create(
         #     customer=instance,
         #     type='email',
@@ -137,143 +132,38 @@ def create_customer_workshop(sender, instance: CustomerWorkshop, created, **kwar
 
 
 @receiver(post_save, sender=Fitting, dispatch_uid="fitting_create_notification")
-def create_fitting(sender, instance: Fitting, created, **kwargs):
-    worker = instance.order.worker
-    owners = worker.workshop.get_owners()
-    if created:
-        for user in [worker.user, *[o.user for o in owners]]:
-            create_internal_notification(
-                user=user,
-                category=InternalNotification.CategoryInternalNotification.FITTING_CREATION,
-                type=InternalNotification.TypeInternalNotification.INFO,
-                title='Nouvel essayage',
-                message=f"Un nouvel essayage a été planifié pour la commande '{instance.order.number}'.",
-                object_content=InternalNotification.ObjectContentInternalNotification.FITTING,
-                object_pk=instance.pk
-            )
-        ExternalNotification.objects.create(
-            customer=instance.order.customer,
-            type='email',
-            title='Essayage planifié',
-            message=f"Un essayage a été planifié pour votre commande '{instance.order.number}'. Veuillez vérifier les détails de l'essayage."
-        )
-
-
-# Les signaux m2m_changed sont corrigés avec pk_set utilisé correctement et typos corrigées
-
-
-@receiver(m2m_changed, sender=Setting.worker_authorization_is_customer, dispatch_uid="setting_create_notification_m2m")
-def create_setting_notification_m2m_worker_authorization_is_customer(sender, instance: Setting, action, pk_set, **kwargs):
-    Workers = instance.workshop.workers.filter(pk__in='pk_set')
-    if action == "post_add":
-        for worker in Workers:
-            InternalNotification.objects.create(
-                user=worker.user,
-                category=InternalNotification.CategoryInternalNotification.AUTHORISATION_ACCEPT,
-                type=InternalNotification.TypeInternalNotification.SUCCESS,
-                title='Autorisation de client',
-                message=f"Vous avez été autorisé à voir, ajouter , modifier la liste des clients de l'atelier '{instance.workshop.name}'.",
-
-            )
-    if action == "post_remove":
-        for worker in Workers:
-            InternalNotification.objects.create(
-                user=worker.user,
-                category=InternalNotification.CategoryInternalNotification.AUTHORISATION_REJECT,
-                type=InternalNotification.TypeInternalNotification.ERROR,
-                title='Retrait de l\'autorisation de client',
-                message=f"Vous n'êtes plus autorisé à voir, ajouter ou modifier la liste des clients de l'atelier '{instance.workshop.name}'."
-            )
-
-
-@receiver(m2m_changed, sender=Setting.worker_authorization_is_order, dispatch_uid="setting_create_notification_m2m_order")
-def create_setting_notification_m2m_worker_authorization_is_order(sender, instance: Setting, action, pk_set, **kwargs):
-    Workers = instance.workshop.workers.filter(pk__in='pk_set')
-    if action == "post_add":
-        for worker in Workers:
-            InternalNotification.objects.create(
-                user=worker.user,
-                category=InternalNotification.CategoryInternalNotification.AUTHORISATION_ACCEPT,
-                type=InternalNotification.TypeInternalNotification.ERROR,
-                title='Autorisation de commande',
-                message=f"Vous avez été autorisé ajouter, modifier les commandes de l'atelier '{instance.workshop.name}'."
-            )
-
-    if action == "post_remove":
-        for worker in Workers:
-            InternalNotification.objects.create(
-                user=worker.user,
-                category=InternalNotification.CategoryInternalNotification.AUTHORISATION_REJECT,
-                type=InternalNotification.TypeInternalNotification.ERROR,
-                title='Retrait de l\'autorisation de commande',
-                message=f"Vous n'êtes plus autorisé à ajouter ou modifier les commandes de l'atelier '{instance.workshop.name}'."
-            )
-
-
-@receiver(m2m_changed, sender=Setting.worker_authorization_is_fitting, dispatch_uid="setting_create_notification_m2m_fitting")
-def create_setting_notification_m2m_worker_authorization_is_fitting(sender, instance: Setting, action, pk_set, **kwargs):
-    Workers = instance.workshop.workers.filter(pk__in='pk_set')
-    if action == "post_add":
-        for worker in Workers:
-            InternalNotification.objects.create(
-                user=worker.user,
-                tcategory=InternalNotification.CategoryInternalNotification.AUTHORISATION_ACCEPT,
-                type=InternalNotification.TypeInternalNotification.SUCCESS,
-                title='Autorisation d\'essayage',
-                message=f"Vous avez été autorisé à ajouter, modifier les essayages de l'atelier '{instance.workshop.name}'."
-            )
-    if action == "post_remove":
-        for worker in Workers:
-            InternalNotification.objects.create(
-                user=worker.user,
-                category=InternalNotification.CategoryInternalNotification.AUTHORISATION_REJECT,
-                type=InternalNotification.TypeInternalNotification.ERROR,
-                title='Retrait de l\'autorisation d\'essayage',
-                message=f"Vous n'êtes plus autorisé à ajouter ou modifier les essayages de l'atelier '{instance.workshop.name}'."
-            )
-
-
-@receiver(m2m_changed, sender=Setting.worker_authorization_is_worker, dispatch_uid="setting_create_notification_m2m_worker")
-def create_setting_notification_m2m_worker_authorization_is_worker(sender, instance: Setting, action, pk_set, **kwargs):
-    Workers = instance.workshop.workers.filter(pk__in='pk_set')
-    if action == "post_add":
-        for worker in Workers:
-            InternalNotification.objects.create(
-                user=worker.user,
-                category=InternalNotification.CategoryInternalNotification.AUTHORISATION_ACCEPT,
-                type=InternalNotification.TypeInternalNotification.SUCCESS,
-                title='Autorisation de travailleur',
-                message=f"Vous avez été autorisé à ajouter, modifier les travailleurs de l'atelier '{instance.workshop.name}'."
-            )
-    if action == "post_remove":
-        for worker in Workers:
-            InternalNotification.objects.create(
-                user=worker.user,
-                category=InternalNotification.CategoryInternalNotification.AUTHORISATION_REJECT,
-                type=InternalNotification.TypeInternalNotification.ERROR,
-                title='Retrait de l\'autorisation de travailleur',
-                message=f"Vous n'êtes plus autorisé à ajouter ou modifier les travailleurs de l'atelier '{instance.workshop.name}'."
-            )
-
-
-@receiver(m2m_changed, sender=Setting.worker_authorization_is_setting, dispatch_uid="setting_create_notification_m2m_setting")
-def create_setting_notification_m2m_worker_authorization_is_setting(sender, instance: Setting, action, pk_set, **kwargs):
-    Workers = instance.workshop.workers.filter(pk__in='pk_set')
-    if action == "post_add":
-        for worker in Workers:
-            InternalNotification.objects.create(
-                user=worker.user,
-                category=InternalNotification.CategoryInternalNotification.AUTHORISATION_ACCEPT,
-                type=InternalNotification.TypeInternalNotification.SUCCESS,
-                title='Autorisation de paramètres',
-                message=f"Vous avez été autorisé à modifier les paramètres de l'atelier '{instance.workshop.name}'."
-            )
-    if action == "post_remove":
-        for worker in Workers:
-            InternalNotification.objects.create(
-                user=worker.user,
-                category=InternalNotification.CategoryInternalNotification.AUTHORISATION_REJECT,
-                type=InternalNotification.TypeInternalNotification.ERROR,
-                title='Retrait de l\'autorisation de paramètres',
-                message=f"Vous n'êtes plus autorisé à modifier les paramètres de l'atelier '{instance.workshop.name}'."
-            )
+def create_fitting(sender, instance: Fitting, created, raw=False, **kwargs):
+    if created and not raw:
+        order = instance.order
+        outbox.enqueue("notifications.fitting_created", {
+            "fitting": instance.pk,
+            "workshop": instance.workshop_id,
+            "worker": order.worker_id,
+            "customer": order.customer_id,
+            "number": order.number,
+        })
+
+
+AUTHORISATION_FIELDS = {
+    getattr(Setting, field).through: field for field in AUTHORISATION_MESSAGES
+}
+
+
+def create_setting_authorisation_notification(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove") or not pk_set:
+        return
+    # instance : le Setting, ou le tailleur si l'ajout se fait depuis Worker
+    outbox.enqueue("notifications.authorisation_changed", {
+        "field": AUTHORISATION_FIELDS[sender],
+        "granted": action == "post_add",
+        "workshop": instance.workshop_id,
+        "workers": [instance.pk] if reverse else sorted(pk_set),
+    })
+
+
+for through, field in AUTHORISATION_FIELDS.items():
+    m2m_changed.connect(
+        create_setting_authorisation_notification,
+        sender=through,
+        dispatch_uid=f"setting_{field}_notification_m2m",
+    )
@@ -0,0 +1,178 @@
+"""
+Flux Server-Sent Events des notifications internes de l'utilisateur connecté
+(`GET /api/notification/internal/stream/`), à servir par l'application ASGI
+(ecouture/asgi.py).
+
+- Authentification JWT : en-tête Authorization, ou `?token=` (EventSource ne
+  permet pas d'envoyer d'en-tête).
+- Chaque événement porte l'id de la notification ; à la reconnexion, le
+  navigateur renvoie `Last-Event-ID` et le flux reprend après cet id. Sans
+  cet en-tête, seules les notifications postérieures à la connexion sont
+  envoyées (la liste existante vient de `GET /api/notification/internal/`).
+- Une notification déjà envoyée puis regroupée (handlers.coalesce) est
+  renvoyée, sans `id:` pour ne pas reculer `Last-Event-ID`, quand son
+  `lastOccurrenceAt` avance pendant la connexion. Les regroupements survenus
+  pendant une déconnexion ne sont pas rejoués (la liste les montre).
+- Un commentaire de heartbeat est envoyé toutes les
+  NOTIFICATION_STREAM_HEARTBEAT_SECONDS ; la base est aussi relue à ce
+  moment, ce qui couvre les publications d'autres process.
+- Au plus NOTIFICATION_STREAM_MAX_CONNECTIONS flux par process (503 au-delà) ;
+  la place est réservée avant de retourner la réponse et libérée à la fin du
+  flux ou à la fermeture de la réponse.
+"""
+import json
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Max
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from notifications.broker import get_broker
+from notifications.models import InternalNotification
+from notifications.serializers import InternalNotificatinoReadSerializer
+
+BATCH_SIZE = 100
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class ConnectionSlots:
+    """Compteur des flux ouverts dans le process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.active = 0
+
+    def acquire(self):
+        """
+        Réserve une place et retourne la fonction (idempotente) qui la
+        libère, ou None si le process a atteint sa limite.
+        """
+        with self._lock:
+            if self.active >= _setting("NOTIFICATION_STREAM_MAX_CONNECTIONS", 500):
+                return None
+            self.active += 1
+        released = threading.Event()
+
+        def release():
+            with self._lock:
+                if not released.is_set():
+                    released.set()
+                    self.active -= 1
+        return release
+
+
+slots = ConnectionSlots()
+
+
+def authenticate(request):
+    """Utilisateur du JWT de la requête, ou None."""
+    auth = JWTAuthentication()
+    try:
+        token = request.GET.get("token")
+        if token:
+            return auth.get_user(auth.get_validated_token(token))
+        result = auth.authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+def _last_event_id(request):
+    value = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    return int(value) if value and value.isdigit() else None
+
+
+def _latest_id(user_id):
+    return InternalNotification.objects.filter(user_id=user_id).aggregate(
+        latest=Max("id"))["latest"] or 0
+
+
+def _notifications_after(user_id, last_id):
+    notifications = InternalNotification.objects.filter(
+        user_id=user_id, id__gt=last_id).order_by("id")[:BATCH_SIZE]
+    return InternalNotificatinoReadSerializer(notifications, many=True).data
+
+
+def _updated_since(user_id, last_id, since):
+    """Notifications déjà envoyées (id <= last_id) regroupées après `since`."""
+    notifications = list(InternalNotification.objects.filter(
+        user_id=user_id, id__lte=last_id, lastOccurrenceAt__gt=since,
+    ).order_by("lastOccurrenceAt", "id")[:BATCH_SIZE])
+    if notifications:
+        since = notifications[-1].lastOccurrenceAt
+    return InternalNotificatinoReadSerializer(notifications, many=True).data, since
+
+
+def format_event(notification, with_id=True) -> str:
+    data = json.dumps(notification, default=str, ensure_ascii=False)
+    event_id = f"id: {notification['id']}\n" if with_id else ""
+    return f"{event_id}event: notification\ndata: {data}\n\n"
+
+
+class EventStreamResponse(StreamingHttpResponse):
+    """Réponse SSE qui libère sa place de flux à la fermeture."""
+
+    def __init__(self, streaming_content, release, **kwargs):
+        super().__init__(streaming_content, **kwargs)
+        self._release = release
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._release()
+
+
+async def event_stream(user_id, last_id, release):
+    heartbeat = _setting("NOTIFICATION_STREAM_HEARTBEAT_SECONDS", 15)
+    subscription = None
+    try:
+        subscription = get_broker().subscribe(user_id)
+        since = timezone.now()
+        yield "retry: 5000\n\n"
+        if last_id is None:
+            last_id = await sync_to_async(_latest_id)(user_id)
+        while True:
+            notifications = await sync_to_async(_notifications_after)(user_id, last_id)
+            for notification in notifications:
+                yield format_event(notification)
+                last_id = notification["id"]
+            updated, since = await sync_to_async(_updated_since)(user_id, last_id, since)
+            for notification in updated:
+                yield format_event(notification, with_id=False)
+            if BATCH_SIZE in (len(notifications), len(updated)):
+                continue
+            if not await subscription.wait(heartbeat):
+                yield ": heartbeat\n\n"
+    finally:
+        if subscription is not None:
+            subscription.close()
+        release()
+
+
+async def internal_notification_stream(request):
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    user = await sync_to_async(authenticate)(request)
+    if user is None:
+        return JsonResponse(
+            {"detail": "Authentication credentials were not provided."}, status=401)
+    release = slots.acquire()
+    if release is None:
+        response = JsonResponse({"detail": "Too many open streams, retry later."}, status=503)
+        response["Retry-After"] = "30"
+        return response
+
+    response = EventStreamResponse(
+        event_stream(user.pk, _last_event_id(request), release), release,
+        content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # pas de tampon côté proxy (nginx)
+    return response
@@ -2,11 +2,38 @@ from django.test import TestCase
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import RefreshToken
-from notifications.models import InternalNotification, ExternalNotification
+import asyncio
+from io import StringIO
+from django.core import mail
+from django.core.management import call_command
+from notifications.dispatch import Throttle
+from notifications.broker import get_broker
+from notifications.stream import slots
+from asgiref.sync import sync_to_async
+from django.test import override_settings
+from notifications import outbox
+from notifications.handlers import fan_out, notify
+from notifications.models import (
+    InternalNotification, InternalNotificationArchive, ExternalNotification, OutboxMessage,
+    UnreadNotificationCounter
+)
 from workshop.models import CustomerWorkshop, Workshop, Worker, OrderWorkshopGroup, OrderWorkshop, Fitting
 from django.utils import timezone
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from users.models import User
 from workshop.utils import init_package
+from django.core.mail.backends.base import BaseEmailBackend
+
+
+class UnreachableEmailBackend(BaseEmailBackend):
+    """Backend email dont la connexion échoue toujours."""
+
+    def open(self):
+        raise ConnectionRefusedError("Connection refused")
+
+    def send_messages(self, email_messages):
+        self.open()
 
 
 class NotificationAPITestCase(TestCase):
@@ -151,6 +178,31 @@ class NotificationAPITestCase(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertGreaterEqual(len(response.data), 2)  # deux notifications non lues
 
+    def test_get_internal_notifications_cursor(self):
+        from unittest import mock
+        from ecouture.pagination import KeysetPagination
+
+        expected = list(InternalNotification.objects.filter(
+            user=self.user_worker1, is_read=False
+        ).order_by('-createdAt', 'id').values_list('pk', flat=True))
+        self.assertGreater(len(expected), 2)
+
+        seen = []
+        url = reverse('notifications-internal-get') + '?pagination=cursor'
+        with mock.patch.object(KeysetPagination, 'page_size', 2):
+            while url:
+                with CaptureQueriesContext(connection) as ctx:
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('count', response.data)
+                self.assertFalse(any('COUNT(' in q['sql'] for q in ctx.captured_queries))
+                seen += [n['id'] for n in response.data['results']]
+                url = response.data['next']
+        self.assertEqual(seen, expected)
+
+        response = self.client.get(reverse('notifications-internal-get'), {'cursor': 'invalide'})
+        self.assertEqual(response.status_code, 404)
+
     def test_patch_internal_notification(self):
         url = reverse('notifications-internal-update',
                       kwargs={'notification_id': self.internal1.pk})
@@ -165,4 +217,401 @@ class NotificationAPITestCase(TestCase):
         url = reverse('notifications-external', kwargs={'workshop_pk': self.workshop.pk})
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
-        self.assertGreaterEqual(len(response.data), 1)
+        self.assertGreaterEqual(len(response.data["results"]), 1)
+
+    def test_fan_out_notifications(self):
+        # un seul INSERT de notifications, quel que soit le nombre de tailleurs
+        for i in range(5):
+            user = User.objects.create_user(
+                email=f"fan{i}@example.com", phone=f"070000000{i}", password="password123",
+                first_name="Fan", last_name="Out")
+            Worker.objects.create(user=user, workshop=self.workshop)
+
+        with CaptureQueriesContext(connection) as ctx:
+            customer = CustomerWorkshop.objects.create(
+                last_name="Kone", first_name="Awa", nickname="AwaKone", genre="WOMAN",
+                phone="0700000099", workshop=self.workshop)
+        inserts = [q['sql'] for q in ctx.captured_queries
+                   if q['sql'].startswith('INSERT INTO "notifications_internalnotification"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(InternalNotification.objects.filter(
+            category='CUSTOMER_CREATION', object_pk=str(customer.pk)).count(), 7)
+
+        # autorisations : seuls les tailleurs ajoutés / retirés sont notifiés
+        self.workshop.settings.worker_authorization_is_fitting.remove(self.worker2)
+        self.assertTrue(InternalNotification.objects.filter(
+            user=self.user_worker2, category='AUTHORISATION_REJECT',
+            title="Retrait de l'autorisation d'essayage").exists())
+        self.assertEqual(InternalNotification.objects.filter(
+            category='AUTHORISATION_ACCEPT').values('user').distinct().count(), 1)
+
+    @override_settings(OUTBOX_EAGER=False, OUTBOX_MAX_ATTEMPTS=2)
+    def test_outbox_worker(self):
+        # sans mode eager, la création n'écrit qu'un message d'outbox
+        customer = CustomerWorkshop.objects.create(
+            last_name="Kone", first_name="Awa", nickname="AwaKone", genre="WOMAN",
+            phone="0700000099", workshop=self.workshop)
+        notifications = InternalNotification.objects.filter(
+            category='CUSTOMER_CREATION', object_pk=str(customer.pk))
+        self.assertFalse(notifications.exists())
+        self.assertEqual(OutboxMessage.objects.filter(topic="notifications.customer_created").count(), 1)
+
+        out = StringIO()
+        call_command("run_outbox_worker", "--once", stdout=out)
+        self.assertEqual(notifications.count(), 2)
+        self.assertFalse(OutboxMessage.objects.exists())
+        self.assertIn("0 message(s) en attente", out.getvalue())
+
+        # échec : replanifié avec un délai, puis abandonné après OUTBOX_MAX_ATTEMPTS
+        def failing(payload):
+            raise ValueError("boom")
+        outbox.HANDLERS["tests.failing"] = failing
+        self.addCleanup(outbox.HANDLERS.pop, "tests.failing")
+
+        message = outbox.enqueue("tests.failing", {})
+        self.assertEqual(outbox.run_batch(), (0, 1))
+        message.refresh_from_db()
+        self.assertEqual(message.attempts, 1)
+        self.assertGreater(message.available_at, timezone.now())
+        self.assertIn("boom", message.last_error)
+        self.assertEqual(outbox.run_batch(), (0, 0))  # pas encore dû
+
+        OutboxMessage.objects.filter(pk=message.pk).update(available_at=timezone.now())
+        self.assertEqual(outbox.run_batch(), (0, 1))
+        message.refresh_from_db()
+        self.assertEqual(message.status, OutboxMessage.Status.DEAD)
+        self.assertEqual(outbox.stats()["dead"], 1)
+
+    def test_dispatch_external_notifications(self):
+        ExternalNotification.objects.all().delete()
+        due = [
+            ExternalNotification.objects.create(
+                customer=self.customer1, type='email', title=f'Due {i}', message='Message')
+            for i in range(3)
+        ]
+        later = ExternalNotification.objects.create(
+            customer=self.customer1, type='email', title='Later', message='Message',
+            scheduled_for=timezone.localdate() + timezone.timedelta(days=2))
+        self.customer2.email = None
+        self.customer2.save()
+        no_email = ExternalNotification.objects.create(
+            customer=self.customer2, type='email', title='No email', message='Message')
+
+        with CaptureQueriesContext(connection) as ctx:
+            call_command("dispatch_external_notifications", "--once", "--per-minute", "0",
+                         stdout=StringIO())
+        self.assertEqual(sorted(m.subject for m in mail.outbox), ['Due 0', 'Due 1', 'Due 2'])
+        # les envoyées sont marquées en une requête
+        marks = [q['sql'] for q in ctx.captured_queries
+                 if q['sql'].startswith('UPDATE "notifications_externalnotification" SET "is_sent"')]
+        self.assertEqual(len(marks), 1)
+        for notification in due:
+            notification.refresh_from_db()
+            self.assertTrue(notification.is_sent)
+            self.assertIsNotNone(notification.sent_at)
+
+        later.refresh_from_db()
+        self.assertFalse(later.is_sent)
+        # échec : replanifié, non renvoyé avant le délai
+        no_email.refresh_from_db()
+        self.assertFalse(no_email.is_sent)
+        self.assertEqual(no_email.attempts, 1)
+        self.assertGreater(no_email.next_attempt_at, timezone.now())
+        call_command("dispatch_external_notifications", "--once", stdout=StringIO())
+        no_email.refresh_from_db()
+        self.assertEqual(no_email.attempts, 1)
+
+    @override_settings(EMAIL_BACKEND="notifications.tests.UnreachableEmailBackend")
+    def test_dispatch_external_notifications_smtp_down(self):
+        ExternalNotification.objects.all().delete()
+        pending = [
+            ExternalNotification.objects.create(
+                customer=self.customer1, type='email', title=f'Due {i}', message='Message')
+            for i in range(3)
+        ]
+        out = StringIO()
+        call_command("dispatch_external_notifications", "--once", "--batch-size", "2",
+                     "--per-minute", "0", stdout=out)
+        self.assertIn("0 notification(s) envoyée(s), 2 échec(s).", out.getvalue())
+        # le lot réclamé est replanifié, le suivant reste dû
+        for notification in pending:
+            notification.refresh_from_db()
+            self.assertFalse(notification.is_sent)
+        self.assertEqual([n.attempts for n in pending], [1, 1, 0])
+        self.assertGreater(pending[0].next_attempt_at, timezone.now())
+        self.assertIn("Connection refused", pending[0].last_error)
+
+    def test_dispatch_throttle(self):
+        now = [0.0]
+
+        def sleep(seconds):
+            now[0] += seconds
+
+        throttle = Throttle(2, clock=lambda: now[0], sleep=sleep)
+        throttle.record(2)
+        self.assertEqual(throttle.available(), 0)
+        throttle.wait()
+        self.assertEqual(now[0], 60)
+        self.assertEqual(throttle.available(), 2)
+
+    @override_settings(NOTIFICATION_STREAM_HEARTBEAT_SECONDS=0.05)
+    async def test_internal_notification_stream(self):
+        url = "/api/notification/internal/stream/"
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 401)
+
+        token = str(RefreshToken.for_user(self.user_worker1).access_token)
+        with override_settings(NOTIFICATION_STREAM_MAX_CONNECTIONS=0):
+            response = await self.async_client.get(url, {"token": token})
+        self.assertEqual(response.status_code, 503)
+
+        # reprise après Last-Event-ID
+        response = await self.async_client.get(
+            url, {"token": token}, headers={"Last-Event-ID": str(self.internal1.pk)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        # place réservée dès la réponse, avant la lecture du flux
+        self.assertEqual(slots.active, 1)
+        with override_settings(NOTIFICATION_STREAM_MAX_CONNECTIONS=1):
+            self.assertEqual((await self.async_client.get(url, {"token": token})).status_code, 503)
+        events = response.streaming_content
+
+        async def next_event():
+            return (await anext(events)).decode()
+
+        self.assertTrue((await next_event()).startswith("retry:"))
+        self.assertIn(f"id: {self.internal2.pk}\n", await next_event())
+        self.assertEqual(await next_event(), ": heartbeat\n\n")
+        self.assertEqual(slots.active, 1)
+
+        # nouvelle notification : le flux est réveillé par le broker
+        notification = await sync_to_async(InternalNotification.objects.create)(
+            user=self.user_worker1, type='info', title='Live', message='Message live')
+        get_broker().publish([self.user_worker1.pk])
+        event = await next_event()
+        self.assertIn(f"id: {notification.pk}\n", event)
+        self.assertIn('"title": "Live"', event)
+
+        # notification regroupée : renvoyée sans id, le broker est notifié au commit
+        def occur(title):
+            with self.captureOnCommitCallbacks(execute=True):
+                return fan_out(notify(
+                    [self.user_worker1.pk], category='ORDER_UPDATE', object_content='Order',
+                    object_pk=str(self.order.pk), type='info', title=title, message='Message'))
+
+        await sync_to_async(occur)('Commande 1')
+        self.assertIn('"title": "Commande 1"', await next_event())
+        self.assertEqual(await sync_to_async(occur)('Commande 2'), [])
+        event = await next_event()
+        self.assertFalse(event.startswith("id:"))
+        self.assertIn('"title": "Commande 2"', event)
+        self.assertIn('"occurrences": 2', event)
+
+        # déconnexion du client : le handler ASGI annule l'envoi en cours
+        pending = asyncio.ensure_future(next_event())
+        await asyncio.sleep(0.01)
+        pending.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await pending
+        self.assertEqual(slots.active, 0)
+
+        # réponse fermée sans avoir été lue : la place est rendue
+        response = await self.async_client.get(url, {"token": token})
+        self.assertEqual(slots.active, 1)
+        response.close()
+        self.assertEqual(slots.active, 0)
+
+    def test_internal_unread_count(self):
+        url = reverse("notifications-internal-unread-count")
+        unread = InternalNotification.objects.filter(user=self.user_worker1, is_read=False).count()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"unread": unread})
+        self.assertEqual(len([q for q in ctx.captured_queries
+                              if 'unreadnotificationcounter' in q['sql']]), 1)
+
+        # lecture, retour à non lue, suppression
+        response = self.client.patch(
+            reverse("notifications-internal-update", args=[self.internal1.pk]),
+            {"is_read": True}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(url).data["unread"], unread - 1)
+        self.internal1.is_read = False
+        self.internal1.save()
+        self.internal2.delete()
+        self.assertEqual(self.client.get(url).data["unread"], unread - 1)
+
+        # la route de modification n'accepte que des ids
+        self.assertEqual(self.client.patch(
+            "/api/notification/internal/unread-count/", {"is_read": True}).status_code, 405)
+
+        # réconciliation après une écriture qui contourne les signaux
+        InternalNotification.objects.filter(user=self.user_worker1).update(is_read=True)
+        out = StringIO()
+        call_command("reconcile_unread_notifications", "--dry-run", stdout=out)
+        self.assertIn(f"utilisateur {self.user_worker1.pk}: stocké={unread - 1} réel=0", out.getvalue())
+        call_command("reconcile_unread_notifications", stdout=StringIO())
+        self.assertEqual(UnreadNotificationCounter.objects.get(pk=self.user_worker1.pk).count, 0)
+        self.assertEqual(self.client.get(url).data["unread"], 0)
+
+    def test_internal_bulk_mark_read_and_archive(self):
+        other = InternalNotification.objects.create(
+            user=self.user_worker2, type='info', title='Other', message='Message')
+        mark_read = reverse("notifications-internal-mark-read")
+        unread_count = reverse("notifications-internal-unread-count")
+        unread = self.client.get(unread_count).data["unread"]
+
+        self.assertEqual(self.client.post(mark_read, {}, format="json").status_code, 400)
+        self.assertEqual(self.client.post(
+            mark_read, {"ids": [1], "all": True}, format="json").status_code, 400)
+
+        # une seule requête UPDATE, limitée à l'utilisateur
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                mark_read, {"ids": [self.internal1.pk, other.pk]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"count": 1})
+        updates = [q['sql'] for q in ctx.captured_queries
+                   if q['sql'].startswith('UPDATE "notifications_internalnotification"')]
+        self.assertEqual(len(updates), 1)
+        other.refresh_from_db()
+        self.assertFalse(other.is_read)
+        self.internal1.refresh_from_db()
+        self.assertIsNotNone(self.internal1.read_at)
+        self.assertEqual(self.client.get(unread_count).data["unread"], unread - 1)
+
+        response = self.client.post(mark_read, {"all": True}, format="json")
+        self.assertEqual(response.data, {"count": unread - 1})
+        self.assertEqual(self.client.get(unread_count).data["unread"], 0)
+
+        # archive : sorties de la table active, id conservé
+        before = (timezone.now() + timezone.timedelta(seconds=1)).isoformat()
+        total = InternalNotification.objects.filter(user=self.user_worker1).count()
+        response = self.client.post(
+            reverse("notifications-internal-archive"), {"before": before}, format="json")
+        self.assertEqual(response.data, {"count": total})
+        self.assertFalse(InternalNotification.objects.filter(user=self.user_worker1).exists())
+        self.assertTrue(InternalNotificationArchive.objects.filter(
+            pk=self.internal2.pk, user=self.user_worker1, title='Warning 1').exists())
+        self.assertTrue(InternalNotification.objects.filter(pk=other.pk).exists())
+
+    def test_prune_internal_notifications(self):
+        now = timezone.now()
+        read_old = InternalNotification.objects.create(
+            user=self.user_worker1, type='info', title='Read old', message='Message', is_read=True)
+        unread_old = InternalNotification.objects.create(
+            user=self.user_worker1, type='info', title='Unread old', message='Message')
+        unread_recent = InternalNotification.objects.create(
+            user=self.user_worker1, type='info', title='Unread recent', message='Message')
+        InternalNotification.objects.filter(pk=read_old.pk).update(createdAt=now - timezone.timedelta(days=40))
+        InternalNotification.objects.filter(pk=unread_old.pk).update(createdAt=now - timezone.timedelta(days=100))
+        InternalNotification.objects.filter(pk=unread_recent.pk).update(createdAt=now - timezone.timedelta(days=40))
+        unread = UnreadNotificationCounter.objects.get(pk=self.user_worker1.pk).count
+
+        out = StringIO()
+        call_command("prune_internal_notifications", "--dry-run", stdout=out)
+        self.assertIn("1 lue(s), 1 non lue(s)", out.getvalue())
+        self.assertTrue(InternalNotification.objects.filter(pk=read_old.pk).exists())
+
+        out = StringIO()
+        call_command("prune_internal_notifications", "--batch-size", "1", stdout=out)
+        self.assertIn("Archivées : 1 lue(s), 1 non lue(s)", out.getvalue())
+        self.assertEqual(set(InternalNotificationArchive.objects.values_list("pk", "is_read")),
+                         {(read_old.pk, True), (unread_old.pk, False)})
+        self.assertTrue(InternalNotification.objects.filter(pk=unread_recent.pk).exists())
+        self.assertEqual(UnreadNotificationCounter.objects.get(pk=self.user_worker1.pk).count, unread - 1)
+
+        InternalNotificationArchive.objects.filter(pk=read_old.pk).update(
+            archivedAt=now - timezone.timedelta(days=400))
+        out = StringIO()
+        call_command("prune_internal_notifications", stdout=out)
+        self.assertIn("archives supprimées : 1", out.getvalue())
+        self.assertEqual(list(InternalNotificationArchive.objects.values_list("pk", flat=True)),
+                         [unread_old.pk])
+
+    def test_order_update_notifications_coalesce(self):
+        updates = InternalNotification.objects.filter(
+            category='ORDER_UPDATE', object_pk=str(self.order.pk), user=self.user_worker1)
+
+        self.order.status = OrderWorkshop.OrderStatus.IN_PROGRESS
+        self.order.save()
+        self.assertEqual(updates.count(), 1)
+
+        # sauvegardes sans transition : rien de nouveau
+        for _ in range(3):
+            self.order.description_of_model = "Modèle modifié"
+            self.order.save()
+        self.assertEqual(updates.get().occurrences, 1)
+
+        # transition suivante dans la fenêtre : même ligne, nouveau contenu
+        created_at = updates.get().createdAt
+        self.order.status = OrderWorkshop.OrderStatus.COMPLETED
+        self.order.save()
+        notification = updates.get()
+        self.assertEqual(notification.occurrences, 2)
+        self.assertEqual(notification.title, 'Commande terminée')
+        # la position dans le curseur (-createdAt, id) ne change pas
+        self.assertEqual(notification.createdAt, created_at)
+        self.assertGreaterEqual(notification.lastOccurrenceAt, created_at)
+
+        # une fois lue, la notification n'est plus regroupée
+        notification.is_read = True
+        notification.save()
+        self.order.status = OrderWorkshop.OrderStatus.IN_PROGRESS
+        self.order.save()
+        self.assertEqual(updates.count(), 2)
+
+        with override_settings(NOTIFICATION_COALESCE_SECONDS=0):
+            self.order.status = OrderWorkshop.OrderStatus.COMPLETED
+            self.order.save()
+        self.assertEqual(updates.count(), 3)
+
+    def test_external_notifications_filters_and_cursor(self):
+        ExternalNotification.objects.all().delete()
+        today = timezone.localdate()
+        for i in range(5):
+            ExternalNotification.objects.create(
+                customer=self.customer1, type='email', title=f'Email {i}', message='Message',
+                scheduled_for=today + timezone.timedelta(days=i), is_sent=i % 2 == 0)
+        sms = ExternalNotification.objects.create(
+            customer=self.customer2, type='sms', title='Sms', message='Message')
+        self.assertEqual(sms.workshop_id, self.workshop.pk)
+
+        url = reverse('notifications-external', kwargs={'workshop_pk': self.workshop.pk})
+        response = self.client.get(url, {"limit": 4})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("count", response.data)
+        first = [row["id"] for row in response.data["results"]]
+        self.assertEqual(first[0], sms.pk)
+        response = self.client.get(response.data["next"])
+        second = [row["id"] for row in response.data["results"]]
+        self.assertIsNone(response.data["next"])
+        self.assertEqual(len(first) + len(second), 6)
+        self.assertFalse(set(first) & set(second))
+
+        response = self.client.get(url, {"type": "email", "is_sent": "false"})
+        self.assertEqual([row["title"] for row in response.data["results"]], ['Email 3', 'Email 1'])
+        response = self.client.get(url, {
+            "scheduled_after": str(today + timezone.timedelta(days=1)),
+            "scheduled_before": str(today + timezone.timedelta(days=2))})
+        self.assertEqual({row["title"] for row in response.data["results"]}, {'Email 1', 'Email 2'})
+        # bornes incluses : un même jour en début et en fin de période
+        day = str(today + timezone.timedelta(days=3))
+        response = self.client.get(url, {"scheduled_after": day, "scheduled_before": day})
+        self.assertEqual([row["title"] for row in response.data["results"]], ['Email 3'])
+        response = self.client.get(url, {"scheduled_after": str(today + timezone.timedelta(days=4))})
+        self.assertEqual([row["title"] for row in response.data["results"]], ['Email 4'])
+        response = self.client.get(url, {"scheduled_before": str(today)})
+        self.assertEqual([row["title"] for row in response.data["results"]], ['Email 0'])
+
+        # filtre sur la colonne dénormalisée, sans jointure sur le client
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        listing = [q['sql'] for q in ctx.captured_queries
+                   if 'FROM "notifications_externalnotification"' in q['sql']]
+        self.assertEqual(len(listing), 1)
+        self.assertNotIn("JOIN", listing[0])
+
+        self.assertEqual(self.client.get(
+            reverse('notifications-external', kwargs={'workshop_pk': 'unknown'})).status_code, 404)
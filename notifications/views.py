@@ -3,6 +3,7 @@ from notifications.mixins import (
     ExternalNotificationMixin
 )
 from rest_framework.viewsets import GenericViewSet
+from ecouture.pagination import KeysetPaginationMixin
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 
@@ -10,6 +11,7 @@ from django.utils.decorators import method_decorator
 class NotificationViewSet(
     InternaNotificationMixin,
     ExternalNotificationMixin,
+    KeysetPaginationMixin,
     GenericViewSet
 ):
     """
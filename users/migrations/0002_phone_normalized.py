@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='phone_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20, null=True),
+        ),
+    ]
@@ -1,7 +1,6 @@
 from datetime import timedelta
 from django.utils import timezone
 import secrets
-from django.core.mail import send_mail
 from rest_framework.permissions import AllowAny
 from django.db import transaction
 from rest_framework import status
@@ -19,6 +18,8 @@ from users.serializers import (
     
 )
 from users.models import GROUPS
+from users.utils import normalize_phone
+from notifications import outbox
 from ecouture.serializers import ExistsResponseSerializer, VerifyFieldSerializer
 from workshop.serializers.read import WorkerReadSerializer
 
@@ -82,7 +83,14 @@ class UserMixin:
         """
         verify_phone = request.data.get('verify')
         exclude_phone = request.data.get('exclude')
-        return self._verify_field('phone', verify_phone, exclude_phone)
+        if not verify_phone:
+            return Response({"detail": "phone is required"}, status=status.HTTP_400_BAD_REQUEST)
+        # comparaison sur la forme E.164 : "+225 07 01..." et "0701..." sont le même numéro
+        phone_normalized = normalize_phone(verify_phone)
+        if phone_normalized is None:
+            return Response({"detail": "phone is not a valid phone number"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return self._verify_field('phone_normalized', phone_normalized, normalize_phone(exclude_phone))
 
     @extend_schema(
         summary="metre a jour un utilisateur",
@@ -210,7 +218,9 @@ class UserPasswordMixin:
         # Envoyer le mail
         subject = "Réinitialisation de votre mot de passe"
         message = f"Bonjour,\n\nPour réinitialiser votre mot de passe, cliquez sur ce lien :\n{reset_link}\n\nCordialement,\nL’équipe."
-        send_mail(subject, message, None, [user.email], fail_silently=False)
+        outbox.enqueue("notifications.send_mail", {
+            "subject": subject, "message": message, "recipients": [user.email],
+        })
 
         return Response({"detail": "If this email exists, a reset link has been sent."})
 
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin, Permission, Group
 from django.db import models
 
+from users.utils import normalize_phone
+
 GROUPS = {
     "WORKERS": "WORKERS",
     "TAILORS": "TAILORS",
@@ -40,6 +42,9 @@ class User(AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(unique=True)
     password = models.CharField(max_length=128)
     phone = models.CharField(max_length=20, unique=True)
+    # forme E.164 de `phone` (users.utils.normalize_phone), pour les vérifications d'unicité
+    phone_normalized = models.CharField(
+        max_length=20, null=True, blank=True, editable=False, db_index=True)
     photo = models.ImageField(upload_to='users/photos/', null=True, blank=True)
     last_login = models.DateTimeField(null=True, blank=True)
     is_staff = models.BooleanField(default=False)
@@ -54,6 +59,13 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['phone', 'first_name', 'last_name']
 
+    def save(self, *args, **kwargs):
+        self.phone_normalized = normalize_phone(self.phone)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "phone" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "phone_normalized"}
+        super().save(*args, **kwargs)
+
 
 class UserPasswordReset(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
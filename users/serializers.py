@@ -2,6 +2,7 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group, Permission
 from rest_framework import serializers
 from users.models import User as UserType
+from users.utils import normalize_phone
 
 User = get_user_model()
 
@@ -86,9 +87,17 @@ class UserWriteSerializer(serializers.ModelSerializer):
         ]
 
     def validate(self, attrs):
-        for field in ['email', 'phone']:
-            if field in attrs:
-                attrs[field] = validate_unique_field(self, field, attrs[field])
+        if 'email' in attrs:
+            attrs['email'] = validate_unique_field(self, 'email', attrs['email'])
+        if 'phone' in attrs:
+            # unicité sur la forme E.164 : "+225 07 01..." et "0701..." sont le même numéro
+            phone_normalized = normalize_phone(attrs['phone'])
+            qs = User.objects.filter(phone_normalized=phone_normalized) if phone_normalized \
+                else User.objects.filter(phone=attrs['phone'])
+            if self.instance:
+                qs = qs.exclude(pk=self.instance.pk)
+            if qs.exists():
+                raise serializers.ValidationError("phone must be unique")
         return attrs
 
     def create(self, validated_data) -> UserType:
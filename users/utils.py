@@ -1,5 +1,14 @@
+import re
+
+from django.conf import settings
 from django.contrib.auth.models import Group
 
+_NON_DIGIT = re.compile(r"\D+")
+_PHONE_LIKE = re.compile(r"^\s*(\+|00)?[\d\s().-]*\d[\d\s().-]*$")
+
+# longueur d'un numéro national ivoirien (0X XX XX XX XX)
+NATIONAL_NUMBER_LENGTH = 10
+
 
 def get_or_create_group(name: str) -> Group:
     """
@@ -16,3 +25,41 @@ def get_or_create_group(name: str) -> Group:
         name=name
     )
     return group
+
+
+def looks_like_phone(value) -> bool:
+    """Vrai si `value` ne contient que des chiffres et des séparateurs de numéro."""
+    return bool(value) and bool(_PHONE_LIKE.match(str(value)))
+
+
+def normalize_phone(phone, country_code: str = None):
+    """
+    Forme canonique (E.164) d'un numéro de téléphone, ou None s'il est vide.
+
+    "+225 07 01 02 03 04", "00225 0701020304", "225 07-01-02-03-04" et
+    "0701020304" donnent tous "+2250701020304". Un numéro sans indicatif
+    reçoit `country_code` (par défaut PHONE_DEFAULT_COUNTRY_CODE).
+
+    Args:
+        phone (str): numéro tel que saisi.
+        country_code (str): indicatif pays à appliquer aux numéros nationaux.
+
+    Returns:
+        str | None: "+<indicatif><numéro>".
+    """
+    if not phone:
+        return None
+    phone = str(phone).strip()
+    number = _NON_DIGIT.sub("", phone)
+    if not number:
+        return None
+    if country_code is None:
+        country_code = getattr(settings, "PHONE_DEFAULT_COUNTRY_CODE", "225")
+
+    if phone.startswith("+"):
+        return f"+{number}"
+    if number.startswith("00"):
+        return f"+{number[2:]}"
+    if number.startswith(country_code) and len(number) > NATIONAL_NUMBER_LENGTH:
+        return f"+{number}"
+    return f"+{country_code}{number}"
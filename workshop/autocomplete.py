@@ -0,0 +1,128 @@
+"""
+Autocomplétion des clients par préfixe, servie depuis la mémoire du process.
+
+Un trie par atelier est construit à la première demande (clients actifs :
+mots normalisés du surnom, prénom, nom, chiffres du téléphone brut et de sa
+forme E.164). Les ateliers sont gardés dans un LRU borné
+(AUTOCOMPLETE_MAX_WORKSHOPS).
+
+Invalidation : les signaux client incrémentent une version par atelier
+stockée dans le cache Django (workshop/cache.py) ; un trie construit sur une
+ancienne version est reconstruit à la demande suivante. Les tries des autres
+process ne voient ce changement qu'avec un cache partagé (Redis ou base de
+données, voir CACHES) ; avec LocMemCache, seul le process de l'écriture est
+invalidé.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from workshop.cache import bump_version, get_version
+from workshop.search import digits, expand_query, fold
+
+VERSION_SCOPE = "workshop-autocomplete"
+FIELDS = ("id", "nickname", "first_name", "last_name", "phone", "phone_normalized")
+
+
+class _Node:
+    __slots__ = ("children", "ids")
+
+    def __init__(self):
+        self.children = {}
+        self.ids = set()
+
+
+class PrefixIndex:
+    """Trie dont chaque nœud connaît les clients ayant une clé de ce préfixe."""
+
+    def __init__(self, customers, version):
+        self.version = version
+        self.root = _Node()
+        self.entries = {}
+        self.sort_keys = {}
+        for customer in customers:
+            self.entries[customer["id"]] = customer
+            self.sort_keys[customer["id"]] = (
+                fold(customer["last_name"]), fold(customer["first_name"]), customer["id"])
+            for key in self.keys(customer):
+                self._insert(key, customer["id"])
+
+    @staticmethod
+    def keys(customer):
+        keys = set()
+        for field in ("nickname", "first_name", "last_name"):
+            keys.update(fold(customer[field]).split())
+        for field in ("phone", "phone_normalized"):
+            phone = digits(customer[field])
+            if phone:
+                keys.add(phone)
+        return keys
+
+    def _insert(self, key, pk):
+        node = self.root
+        for char in key:
+            node = node.children.setdefault(char, _Node())
+            node.ids.add(pk)
+
+    def _lookup(self, prefix):
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        return node.ids
+
+    def _match(self, tokens):
+        # chaque mot saisi doit préfixer une clé du client
+        ids = None
+        for token in sorted(tokens, key=len, reverse=True):
+            matches = self._lookup(token)
+            ids = set(matches) if ids is None else ids & matches
+            if not ids:
+                return set()
+        return ids or set()
+
+    def complete(self, query, limit):
+        ids = set()
+        for expanded in expand_query(query):
+            ids |= self._match(fold(expanded).split())
+        return [self.entries[pk] for pk in sorted(ids, key=self.sort_keys.__getitem__)[:limit]]
+
+
+_lock = threading.Lock()
+_indexes = OrderedDict()
+
+
+def _max_workshops():
+    return getattr(settings, "AUTOCOMPLETE_MAX_WORKSHOPS", 64)
+
+
+def get_cached_index(slug):
+    """Trie de l'atelier s'il est en mémoire et à jour, sinon None (sans requête SQL)."""
+    version = get_version(slug, VERSION_SCOPE)
+    with _lock:
+        index = _indexes.get(slug)
+        if index is not None and index.version == version:
+            _indexes.move_to_end(slug)
+            return index
+    return None
+
+
+def build_index(workshop) -> PrefixIndex:
+    # version lue avant les clients : une écriture concurrente invalidera ce trie
+    version = get_version(workshop.pk, VERSION_SCOPE)
+    customers = list(workshop.customers.filter(is_active=True).values(*FIELDS))
+    index = PrefixIndex(customers, version)
+    with _lock:
+        _indexes[workshop.pk] = index
+        _indexes.move_to_end(workshop.pk)
+        while len(_indexes) > _max_workshops():
+            _indexes.popitem(last=False)
+    return index
+
+
+def invalidate(slug):
+    with _lock:
+        _indexes.pop(slug, None)
+    bump_version(slug, VERSION_SCOPE)
@@ -0,0 +1,106 @@
+"""
+Cache des réponses par atelier, invalidé par un numéro de version.
+
+Chaque atelier a un compteur de version stocké dans le cache ; il est
+incrémenté par les signaux (workshop/signals.py) à chaque écriture sur ses
+données. La clé d'une réponse contient ce numéro : une écriture rend donc
+toutes les réponses en cache de l'atelier obsolètes sans les parcourir.
+
+Réponses et versions vivent dans le cache Django (CACHES) : l'invalidation
+ne s'étend aux autres process que si ce cache est partagé (Redis ou base de
+données en production). Avec LocMemCache (développement, tests), chaque
+process a ses propres versions.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+VERSION_KEY = "{scope}:{slug}:version"
+RESPONSE_KEY = "workshop-cache:{slug}:{version}:{name}:{path}"
+HITS_KEY = "workshop-cache:hits"
+MISSES_KEY = "workshop-cache:misses"
+
+
+def _timeout():
+    return getattr(settings, "WORKSHOP_CACHE_TIMEOUT", 300)
+
+
+def _incr(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # clé absente (premier appel ou éviction)
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key)
+
+
+def get_version(slug: str, scope: str = "workshop-cache") -> int:
+    key = VERSION_KEY.format(scope=scope, slug=slug)
+    version = cache.get(key)
+    if version is None:
+        # initialisé à l'horloge : une version évincée ne peut pas
+        # retomber sur un numéro déjà utilisé par des réponses en cache
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(slug: str, scope: str):
+    key = VERSION_KEY.format(scope=scope, slug=slug)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+
+
+def bump_version(slug: str, scope: str = "workshop-cache"):
+    """
+    Invalide les réponses en cache de l'atelier. Incrémente tout de suite,
+    puis de nouveau au commit pour écarter une réponse calculée entre les deux
+    avec des données pas encore validées.
+    """
+    if not slug:
+        return
+    _bump(slug, scope)
+    transaction.on_commit(lambda: _bump(slug, scope))
+
+
+def get_stats() -> dict:
+    return {
+        "hits": cache.get(HITS_KEY, 0),
+        "misses": cache.get(MISSES_KEY, 0),
+    }
+
+
+def cached_workshop_response(view_func):
+    """
+    Décorateur pour les actions `detail=True` du WorkshopViewSet : sert la
+    réponse depuis le cache tant que la version de l'atelier n'a pas changé.
+    Seules les réponses 200 sont mises en cache.
+    """
+    @wraps(view_func)
+    def wrapper(self, request, pk=None, *args, **kwargs):
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        key = RESPONSE_KEY.format(
+            slug=pk, version=get_version(pk), name=view_func.__name__, path=path)
+
+        data = cache.get(key)
+        if data is not None:
+            _incr(HITS_KEY)
+            response = Response(data)
+            response["X-Cache"] = "HIT"
+            return response
+
+        _incr(MISSES_KEY)
+        response = view_func(self, request, pk, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, _timeout())
+        response["X-Cache"] = "MISS"
+        return response
+    return wrapper
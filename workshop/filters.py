@@ -1,9 +1,9 @@
 import django_filters
 from django_filters import rest_framework as filters
-from django.db.models import Q
 from workshop.models import (
     Worker, CustomerWorkshop, OrderWorkshop,
 )
+from workshop.search import customer_index, order_index
 
 
 class WorkerFilterSet(filters.FilterSet):
@@ -20,19 +20,45 @@ class CustomerWorkshopFilterSet(django_filters.FilterSet):
     name = NameInFilter(method="search", label="Recherche globale (multi)")
     is_active = django_filters.BooleanFilter()
 
+    # Filtres sur les compteurs annotés (CustomerWorkshop.objects.with_order_counters())
+    min_total_orders = django_filters.NumberFilter(
+        field_name="total_orders_count", lookup_expr="gte")
+    max_total_orders = django_filters.NumberFilter(
+        field_name="total_orders_count", lookup_expr="lte")
+    min_ongoing_orders = django_filters.NumberFilter(
+        field_name="ongoing_orders_count", lookup_expr="gte")
+    min_urgent_orders = django_filters.NumberFilter(
+        field_name="urgent_orders_count", lookup_expr="gte")
+
+    ordering = django_filters.OrderingFilter(
+        fields=(
+            ("total_orders_count", "total_orders"),
+            ("ongoing_orders_count", "ongoing_orders"),
+            ("urgent_orders_count", "urgent_orders"),
+            ("createdAt", "createdAt"),
+            ("last_name", "last_name"),
+        )
+    )
+
+    COUNTER_PARAMS = (
+        "min_total_orders", "max_total_orders",
+        "min_ongoing_orders", "min_urgent_orders", "ordering",
+    )
+
     class Meta:
         model = CustomerWorkshop
         fields = ["name", "genre", "is_active"]
 
+    def filter_queryset(self, queryset):
+        # les compteurs ne sont disponibles que si le queryset est annoté
+        needs_counters = any(self.data.get(p) for p in self.COUNTER_PARAMS)
+        if needs_counters and "total_orders_count" not in queryset.query.annotations:
+            queryset = queryset.with_order_counters()
+        return super().filter_queryset(queryset)
+
     def search(self, queryset, name, values):
-        q_objects = Q()
-        for value in values:
-            q_objects |= (
-                Q(last_name__icontains=value) |
-                Q(first_name__icontains=value) |
-                Q(nickname__icontains=value)
-            )
-        return queryset.filter(q_objects)
+        # index plein texte (sans accents, préfixes), trié par pertinence
+        return customer_index.search(queryset, *values)
 
 
 class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
@@ -73,11 +99,9 @@ class OrderWorkshopFilterSet(filters.FilterSet):
     q = filters.CharFilter(method="global_search")
 
     def global_search(self, queryset, name, value):
-        return queryset.filter(
-            Q(description__icontains=value)
-            | Q(description_of_model__icontains=value)
-            | Q(description_of_fabric__icontains=value)
-        )
+        # numéro, modèle, descriptions, tissu, noms et téléphone du client ;
+        # trié par pertinence
+        return order_index.search(queryset, value)
 
     class Meta:
         model = OrderWorkshop
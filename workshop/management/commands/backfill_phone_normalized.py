@@ -0,0 +1,68 @@
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users.utils import normalize_phone
+from workshop.models import CustomerWorkshop
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Remplit phone_normalized (forme E.164) des utilisateurs et des clients, "
+        "signale les doublons, puis reconstruit les index de recherche."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Nombre de lignes mises à jour par requête.",
+        )
+
+    def handle(self, *args, batch_size=500, **options):
+        with transaction.atomic():
+            self._backfill(
+                "utilisateur(s)",
+                User.objects.only("pk", "phone", "phone_normalized").order_by("pk"),
+                key=lambda user, phone: phone,
+                batch_size=batch_size,
+            )
+            # la contrainte (workshop, phone_normalized) refuse les doublons d'un atelier
+            self._backfill(
+                "client(s)",
+                CustomerWorkshop.objects.only(
+                    "pk", "workshop_id", "phone", "phone_normalized").order_by("pk"),
+                key=lambda customer, phone: (customer.workshop_id, phone),
+                batch_size=batch_size,
+            )
+        call_command("rebuild_search_index", stdout=self.stdout)
+
+    def _backfill(self, label, queryset, key, batch_size):
+        model = queryset.model
+        seen = set()
+        changed = []
+        for instance in queryset.iterator(chunk_size=batch_size):
+            phone = normalize_phone(instance.phone)
+            if phone is not None:
+                if key(instance, phone) in seen:
+                    self.stdout.write(self.style.WARNING(
+                        f"{model._meta.model_name} {instance.pk}: {instance.phone!r} "
+                        f"doublon de {phone}, laissé vide."))
+                    phone = None
+                else:
+                    seen.add(key(instance, phone))
+            if instance.phone_normalized != phone:
+                instance.phone_normalized = phone
+                changed.append(instance)
+
+        # d'abord vider, puis remplir : évite les collisions temporaires sur la contrainte
+        for start in range(0, len(changed), batch_size):
+            model.objects.filter(
+                pk__in=[instance.pk for instance in changed[start:start + batch_size]]
+            ).update(phone_normalized=None)
+        model.objects.bulk_update(
+            [instance for instance in changed if instance.phone_normalized],
+            ["phone_normalized"], batch_size=batch_size)
+        self.stdout.write(f"{len(changed)} {label} mis à jour.")
@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from notifications.dispatch import due_notifications
+from notifications.models import (
+    ExternalNotification, InternalNotification, UnreadNotificationCounter,
+)
+from workshop.models import (
+    CustomerWorkshop, Fitting, OrderDailyStat, OrderWorkshop, OrderWorkshopGroup,
+)
+
+# marqueurs d'un accès par index dans la sortie d'EXPLAIN, par moteur
+INDEX_MARKERS = {
+    "sqlite": ("USING INDEX", "USING COVERING INDEX", "USING INTEGER PRIMARY KEY"),
+    "postgresql": ("Index Scan", "Index Only Scan", "Bitmap Index Scan"),
+    "mysql": ("ref", "range", "index_merge"),
+}
+
+
+def endpoint_queries(workshop="explain", worker=0, customer=0, user=0):
+    """
+    Requêtes principales des listes et statistiques de l'API, telles que les
+    construisent les mixins (workshop/mixins.py, notifications/mixins.py).
+    """
+    now = timezone.now()
+    return {
+        "workshops/orders (liste)": OrderWorkshop.objects.filter(
+            workshop_id=workshop, is_deleted=False
+        ).order_by("promised_delivery_date", "id"),
+        "workshops/stats/orders": OrderWorkshop.objects.filter(
+            workshop_id=workshop, createdAt__range=(now - timedelta(days=30), now)),
+        "workshops/stats/orders (agrégats)": OrderDailyStat.objects.filter(
+            workshop_id=workshop, day__range=((now - timedelta(days=30)).date(), now.date())),
+        "commandes en cours d'un tailleur": OrderWorkshop.objects.filter(
+            worker_id=worker, status__in=OrderWorkshop.ONGOING_STATUSES),
+        "commandes en cours d'un client": OrderWorkshop.objects.filter(
+            customer_id=customer, status__in=OrderWorkshop.ONGOING_STATUSES),
+        "workshops/customers (liste)": CustomerWorkshop.objects.filter(
+            workshop_id=workshop, is_active=True
+        ).order_by("-createdAt", "id"),
+        "workshops/orders/groups (liste)": OrderWorkshopGroup.objects.filter(
+            workshop_id=workshop).order_by("-createdAt"),
+        "essayages d'un atelier": Fitting.objects.filter(workshop_id=workshop),
+        "notifications/internal (non lues)": InternalNotification.objects.filter(
+            user_id=user, is_read=False
+        ).order_by("-createdAt", "id"),
+        "notifications/internal/unread-count": UnreadNotificationCounter.objects.filter(
+            pk=user),
+        "notifications/external (liste)": ExternalNotification.objects.filter(
+            workshop_id=workshop).order_by("-id"),
+        "notifications externes à envoyer": due_notifications(now),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Exécute EXPLAIN sur les requêtes des listes et statistiques de l'API "
+        "et échoue si l'une d'elles n'utilise aucun index."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verbose-plans", action="store_true",
+            help="Affiche le plan complet de chaque requête.",
+        )
+
+    def handle(self, *args, verbose_plans=False, **options):
+        markers = INDEX_MARKERS.get(connection.vendor)
+        if markers is None:
+            raise CommandError(f"Moteur non pris en charge : {connection.vendor}.")
+
+        failures = []
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                # sur des tables presque vides, le planificateur préfère le parcours
+                # séquentiel : on vérifie qu'un index est utilisable, pas qu'il est choisi
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            for name, queryset in endpoint_queries().items():
+                plan = queryset.explain()
+                uses_index = any(marker in plan for marker in markers)
+                status = self.style.SUCCESS("index") if uses_index else self.style.ERROR("SCAN")
+                self.stdout.write(f"[{status}] {name}")
+                if verbose_plans or not uses_index:
+                    self.stdout.write("    " + plan.replace("\n", "\n    "))
+                if not uses_index:
+                    failures.append(name)
+
+        if failures:
+            raise CommandError(f"{len(failures)} requête(s) sans index : {', '.join(failures)}.")
+        self.stdout.write(self.style.SUCCESS("Toutes les requêtes utilisent un index."))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from workshop.models import CustomerWorkshop, OrderWorkshop
+from workshop.search import customer_index, order_index
+
+
+class Command(BaseCommand):
+    help = "Recalcule les documents de recherche et reconstruit les index plein texte."
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        customers = list(CustomerWorkshop.objects.only(
+            "pk", "phone_normalized", *CustomerWorkshop.SEARCH_FIELDS))
+        for customer in customers:
+            customer.search_document = customer.build_search_document()
+        CustomerWorkshop.objects.bulk_update(
+            customers, ["search_document"], batch_size=500)
+        customer_index.rebuild(CustomerWorkshop.objects.all())
+        self.stdout.write(f"{len(customers)} client(s) indexé(s).")
+
+        orders = list(OrderWorkshop.objects.select_related("customer"))
+        for order in orders:
+            order.search_document = order.build_search_document()
+        OrderWorkshop.objects.bulk_update(orders, ["search_document"], batch_size=500)
+        order_index.rebuild(OrderWorkshop.objects.all())
+        self.stdout.write(f"{len(orders)} commande(s) indexée(s).")
+
+        self.stdout.write(self.style.SUCCESS("Index de recherche reconstruits."))
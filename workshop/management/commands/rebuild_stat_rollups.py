@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from workshop import rollups
+from workshop.cache import bump_version
+from workshop.models import Workshop
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les agrégats journaliers des statistiques (commandes et clients)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workshop",
+            action="append",
+            dest="workshops",
+            help="Slug de l'atelier à reconstruire (répétable). Par défaut : tous.",
+        )
+
+    def handle(self, *args, workshops=None, **options):
+        created = rollups.rebuild(workshops)
+        # les stats en cache ont pu être calculées sur des agrégats faux
+        for slug in workshops or Workshop.objects.values_list("pk", flat=True):
+            bump_version(slug)
+        for table, count in created.items():
+            self.stdout.write(f"{table}: {count} ligne(s)")
+        self.stdout.write(self.style.SUCCESS("Agrégats reconstruits."))
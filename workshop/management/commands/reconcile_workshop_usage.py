@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from workshop import usage
+
+
+class Command(BaseCommand):
+    help = "Recalcule les compteurs d'utilisation des ateliers et signale les écarts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workshop",
+            action="append",
+            dest="workshops",
+            help="Slug de l'atelier à vérifier (répétable). Par défaut : tous.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Signale les écarts sans corriger les compteurs.",
+        )
+
+    def handle(self, *args, workshops=None, dry_run=False, **options):
+        drifts = usage.reconcile(workshops, fix=not dry_run)
+        for drift in drifts:
+            self.stdout.write(
+                "{workshop}.{field}: stocké={stored} réel={actual}".format(**drift))
+        if not drifts:
+            self.stdout.write(self.style.SUCCESS("Aucun écart."))
+        elif dry_run:
+            self.stdout.write(self.style.WARNING(f"{len(drifts)} écart(s) non corrigé(s)."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{len(drifts)} écart(s) corrigé(s)."))
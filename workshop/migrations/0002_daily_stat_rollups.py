@@ -0,0 +1,58 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workshop', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('genre', models.CharField(choices=[('MAN', 'Homme'), ('WOMAN', 'Femme'), ('CHILDREN', 'Enfant')], max_length=8)),
+                ('is_active', models.BooleanField()),
+                ('customers_count', models.IntegerField(default=0)),
+                ('workshop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='customer_daily_stats', to='workshop.workshop')),
+            ],
+            options={
+                'unique_together': {('workshop', 'day', 'genre', 'is_active')},
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderCustomerDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('orders_count', models.IntegerField(default=0)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_daily_stats', to='workshop.customerworkshop')),
+                ('workshop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_customer_daily_stats', to='workshop.workshop')),
+            ],
+            options={
+                'unique_together': {('workshop', 'day', 'customer')},
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('gender', models.CharField(choices=[('MAN', 'Man'), ('WOMAN', 'Woman'), ('CHILDREN', 'Children')], max_length=8)),
+                ('type_of_clothing', models.CharField(choices=[('SHIRT', 'Shirt'), ('PANTS', 'Pants'), ('DRESS', 'Dress')], max_length=20)),
+                ('status', models.CharField(choices=[('NEW', 'New'), ('IN_PROGRESS', 'In Progress'), ('COMPLETED', 'Completed'), ('CANCELLED', 'Cancelled'), ('DELETED', 'Deleted')], max_length=15)),
+                ('payment_status', models.CharField(choices=[('PENDING', 'Pending'), ('PARTIAL', 'Partial'), ('PAID', 'Paid')], max_length=10)),
+                ('orders_count', models.IntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('workshop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_daily_stats', to='workshop.workshop')),
+            ],
+            options={
+                'unique_together': {('workshop', 'day', 'gender', 'type_of_clothing', 'status', 'payment_status')},
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workshop', '0002_daily_stat_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkshopUsage',
+            fields=[
+                ('workshop', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='usage', serialize=False, to='workshop.workshop')),
+                ('workers_count', models.IntegerField(default=0)),
+                ('customers_count', models.IntegerField(default=0)),
+                ('orders_count', models.IntegerField(default=0)),
+                ('fittings_count', models.IntegerField(default=0)),
+                ('order_groups_count', models.IntegerField(default=0)),
+                ('updatedAt', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workshop', '0003_workshop_usage'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customerworkshop',
+            index=models.Index(fields=['workshop', 'is_active', '-createdAt', 'id'], name='workshop_cu_worksho_759074_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderworkshop',
+            index=models.Index(fields=['is_deleted', 'promised_delivery_date', 'id'], name='workshop_or_is_dele_782011_idx'),
+        ),
+    ]
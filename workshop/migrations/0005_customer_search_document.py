@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:22
+
+from django.db import migrations, models
+
+from workshop.search import build_document, customer_index
+
+SEARCH_FIELDS = ("last_name", "first_name", "nickname")
+
+
+def create_index(apps, schema_editor):
+    CustomerWorkshop = apps.get_model("workshop", "CustomerWorkshop")
+    customer_index.create(schema_editor, CustomerWorkshop)
+
+    customers = list(CustomerWorkshop.objects.only("pk", *SEARCH_FIELDS))
+    for customer in customers:
+        customer.search_document = build_document(
+            *(getattr(customer, field) for field in SEARCH_FIELDS))
+    CustomerWorkshop.objects.bulk_update(customers, ["search_document"], batch_size=500)
+    customer_index.rebuild(CustomerWorkshop.objects.all())
+
+
+def drop_index(apps, schema_editor):
+    customer_index.drop(schema_editor, apps.get_model("workshop", "CustomerWorkshop"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workshop', '0004_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customerworkshop',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
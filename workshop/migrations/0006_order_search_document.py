@@ -0,0 +1,42 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:26
+
+from django.db import migrations, models
+
+from workshop.search import build_document, digits, order_index
+
+
+def create_index(apps, schema_editor):
+    OrderWorkshop = apps.get_model("workshop", "OrderWorkshop")
+    order_index.create(schema_editor, OrderWorkshop)
+
+    orders = list(OrderWorkshop.objects.select_related("customer"))
+    for order in orders:
+        customer = order.customer
+        order.search_document = build_document(
+            order.number, order.clothing_model, order.description,
+            order.description_of_model, order.description_of_fabric,
+            customer.last_name, customer.first_name, customer.nickname,
+            digits(customer.phone),
+        )
+    OrderWorkshop.objects.bulk_update(orders, ["search_document"], batch_size=500)
+    order_index.rebuild(OrderWorkshop.objects.all())
+
+
+def drop_index(apps, schema_editor):
+    order_index.drop(schema_editor, apps.get_model("workshop", "OrderWorkshop"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workshop', '0005_customer_search_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderworkshop',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workshop', '0006_order_search_document'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='customerworkshop',
+            unique_together={('nickname', 'last_name', 'first_name')},
+        ),
+        migrations.AddField(
+            model_name='customerworkshop',
+            name='phone_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=20, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='customerworkshop',
+            constraint=models.UniqueConstraint(fields=('workshop', 'phone_normalized'), name='unique_customer_phone_per_workshop'),
+        ),
+    ]
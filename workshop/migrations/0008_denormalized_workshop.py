@@ -0,0 +1,76 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_workshop(apps, schema_editor):
+    CustomerWorkshop = apps.get_model("workshop", "CustomerWorkshop")
+    OrderWorkshop = apps.get_model("workshop", "OrderWorkshop")
+    OrderWorkshopGroup = apps.get_model("workshop", "OrderWorkshopGroup")
+    Fitting = apps.get_model("workshop", "Fitting")
+
+    OrderWorkshop.objects.update(workshop_id=Subquery(
+        CustomerWorkshop.objects.filter(pk=OuterRef("customer_id")).values("workshop_id")[:1]))
+    Fitting.objects.update(workshop_id=Subquery(
+        OrderWorkshop.objects.filter(pk=OuterRef("order_id")).values("workshop_id")[:1]))
+    # un groupement appartient à l'atelier de sa première commande
+    OrderWorkshopGroup.objects.update(workshop_id=Subquery(
+        OrderWorkshop.objects.filter(groups=OuterRef("pk")).order_by("pk").values("workshop_id")[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workshop', '0007_phone_normalized'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='orderworkshop',
+            name='workshop_or_is_dele_782011_idx',
+        ),
+        migrations.AddField(
+            model_name='fitting',
+            name='workshop',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='fittings', to='workshop.workshop'),
+        ),
+        migrations.AddField(
+            model_name='orderworkshop',
+            name='workshop',
+            field=models.ForeignKey(db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='workshop.workshop'),
+        ),
+        migrations.AddField(
+            model_name='orderworkshopgroup',
+            name='workshop',
+            field=models.ForeignKey(db_index=False, blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='order_groups', to='workshop.workshop'),
+        ),
+        migrations.RunPython(backfill_workshop, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='fitting',
+            name='workshop',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='fittings', to='workshop.workshop'),
+        ),
+        migrations.AlterField(
+            model_name='orderworkshop',
+            name='workshop',
+            field=models.ForeignKey(db_index=False, editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='workshop.workshop'),
+        ),
+        migrations.AddIndex(
+            model_name='fitting',
+            index=models.Index(fields=['workshop', 'scheduled_date'], name='workshop_fi_worksho_7b317e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderworkshop',
+            index=models.Index(fields=['workshop', 'is_deleted', 'promised_delivery_date', 'id'], name='workshop_or_worksho_b586a7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderworkshop',
+            index=models.Index(fields=['workshop', 'createdAt'], name='workshop_or_worksho_64bc33_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderworkshopgroup',
+            index=models.Index(fields=['workshop', '-createdAt'], name='workshop_or_worksho_30dacb_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-17 19:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workshop', '0008_denormalized_workshop'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orderworkshop',
+            index=models.Index(fields=['worker', 'status'], name='workshop_or_worker__d6aa6f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderworkshop',
+            index=models.Index(fields=['customer', 'status'], name='workshop_or_custome_8b45e7_idx'),
+        ),
+    ]
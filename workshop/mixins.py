@@ -1,7 +1,7 @@
 from ecouture.serializers import (
     NotFound404ResponseSerializer, ValidationError400Serializer,
     ValidationError400Serializer, VerifyFieldSerializer, ExistsResponseSerializer,
-    WorkerAuthorisationSerializer
+    WorkerAuthorisationSerializer, QuotaExceeded403Serializer
 )
 
 from django.db.models import Sum
@@ -18,14 +18,16 @@ from rest_framework import serializers
 from workshop.models import (
     Worker, CustomerWorkshop, OrderWorkshop, Workshop,
     OrderWorkshopGroup, OrderWorkshopGroup, Fitting, Setting,
-    PackageHistory
+    PackageHistory, OrderDailyStat, OrderCustomerDailyStat, CustomerDailyStat,
+    WorkshopUsage
 )
 
 from workshop.serializers.read import (
     PackageReadSerializer, PackageHistoryReadSerializer,
     WorkerReadSerializer, CustomerWorkshopReadSerializer, FittingReadSerializer,
     OrderWorkshopReadSerializer, OrderWorkshopGroupReadSerializer, SettingReadSerializer,
-    StatOrdersWorkshopSerializer, StatCustomersWorkshopSerializer
+    StatOrdersWorkshopSerializer, StatCustomersWorkshopSerializer, QuotaSnapshotSerializer,
+    CustomerAutocompleteSerializer
 )
 
 from workshop.serializers.write import (
@@ -34,16 +36,26 @@ from workshop.serializers.write import (
     OrderWorkshopGroupWriteSerializer, SettingWriteSerializer, PackageHistoryWriteSerializer
 )
 
+import hashlib
+import json
 from datetime import datetime, timedelta
-from django.db.models import Count, Sum
-from collections import defaultdict
+from django.db.models import Count, Sum, Min, Q
+from django.db.models.functions import TruncDate, Coalesce
 from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiTypes
+from workshop import autocomplete
+from workshop.cache import cached_workshop_response
+from workshop.usage import get_usage
+from workshop.quotas import QuotaExceeded, QUOTAS
+from users.utils import normalize_phone
 from workshop.filters import WorkerFilterSet, CustomerWorkshopFilterSet, OrderWorkshopFilterSet
 
 from django.contrib.auth import get_user_model
 User = get_user_model()
 
+AUTOCOMPLETE_MAX_LIMIT = 50
+
 
 class WorkerMixin:
     """
@@ -93,6 +105,7 @@ class WorkerMixin:
         responses={
             201: WorkerReadSerializer,
             400: ValidationError400Serializer,
+            403: QuotaExceeded403Serializer,
             404: NotFound404ResponseSerializer
         },
     )
@@ -107,7 +120,7 @@ class WorkerMixin:
         workshop = self.get_object()
 
         if request.method == 'GET':
-            queryset = workshop.workers.all().order_by(
+            queryset = workshop.workers.for_read().order_by(
                 'user__last_name', 'user__first_name')
             filtered_qs = WorkerFilterSet(request.GET, queryset=queryset).qs
 
@@ -183,6 +196,8 @@ class WorkerMixin:
             _worker
             _worker.save(update_fields=['is_active'])
             return Response(status=status.HTTP_204_NO_CONTENT)
+        except QuotaExceeded:
+            raise
         except Exception as e:
             print(e)
             return Response({"detail": f"Worker not found {e}"},
@@ -214,6 +229,17 @@ class CustomerWorkshopMixin:
                 type=int,
                 description="Nombre de résultats par page"
             ),
+            OpenApiParameter(
+                name="pagination",
+                type=str,
+                enum=["cursor"],
+                description="'cursor' : pagination par curseur, sans total (count)"
+            ),
+            OpenApiParameter(
+                name="cursor",
+                type=str,
+                description="Curseur opaque renvoyé dans 'next' (pagination par curseur)"
+            ),
             # paramètres du FilterSet
             OpenApiParameter(
                 name="name",
@@ -234,6 +260,35 @@ class CustomerWorkshopMixin:
                 type=bool,
                 description="Filtrer si le client est actif ou non"
             ),
+            # compteurs de commandes
+            OpenApiParameter(
+                name="min_total_orders",
+                type=int,
+                description="Clients ayant au moins ce nombre de commandes"
+            ),
+            OpenApiParameter(
+                name="max_total_orders",
+                type=int,
+                description="Clients ayant au plus ce nombre de commandes"
+            ),
+            OpenApiParameter(
+                name="min_ongoing_orders",
+                type=int,
+                description="Clients ayant au moins ce nombre de commandes en cours"
+            ),
+            OpenApiParameter(
+                name="min_urgent_orders",
+                type=int,
+                description="Clients ayant au moins ce nombre de commandes urgentes"
+            ),
+            OpenApiParameter(
+                name="ordering",
+                type=str,
+                description=(
+                    "Tri (préfixe '-' pour décroissant) : total_orders, ongoing_orders, "
+                    "urgent_orders, createdAt, last_name. Exemple : ?ordering=-urgent_orders"
+                )
+            ),
         ]
     )
     @extend_schema(
@@ -244,6 +299,7 @@ class CustomerWorkshopMixin:
         responses={
             200: CustomerWorkshopReadSerializer,
             400: ValidationError400Serializer,
+            403: QuotaExceeded403Serializer,
             404: NotFound404ResponseSerializer
         }
 
@@ -261,11 +317,13 @@ class CustomerWorkshopMixin:
         from django.utils import timezone
 
         if request.method == 'GET':
-            queryset = workshop.customers.filter(
+            queryset = workshop.customers.with_order_counters().filter(
                 is_active=True).order_by('-createdAt')
             filtered_qs = CustomerWorkshopFilterSet(
                 request.GET, queryset=queryset).qs
 
+            # en mode curseur, l'ordre est imposé par la clé de pagination
+            self.use_keyset_pagination(request, ('-createdAt', 'id'))
             page = self.paginate_queryset(filtered_qs)
             serializer = CustomerWorkshopReadSerializer(page, many=True)
             return self.get_paginated_response(serializer.data)
@@ -278,6 +336,8 @@ class CustomerWorkshopMixin:
                 customer = serializer.save(workshop=workshop)
         except ValidationError as e:
             return Response({"errors": e.detail}, status=status.HTTP_400_BAD_REQUEST)
+        except QuotaExceeded:
+            raise
         except Exception as e:
             return Response({"errors": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         return Response(
@@ -326,9 +386,11 @@ class CustomerWorkshopMixin:
     def customer_workshop_detail(self, request: Request, pk=None, customer_pk=None):
         workshop = self.get_object()
 
+        queryset = workshop.customers.all()
+        if request.method == 'GET':
+            queryset = queryset.with_order_counters()
         try:
-            _customer: CustomerWorkshop = workshop.customers.get(
-                pk=customer_pk)
+            _customer: CustomerWorkshop = queryset.get(pk=customer_pk)
         except:
             return Response({"detail": "CustomerWorkshop not found"},
                             status=status.HTTP_404_NOT_FOUND)
@@ -351,6 +413,44 @@ class CustomerWorkshopMixin:
         _customer.save(update_fields=['is_active'])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @extend_schema(
+        methods=['get'],
+        summary="Autocomplétion des clients",
+        description=(
+            "Clients actifs dont chaque mot saisi préfixe le surnom, le prénom, "
+            "le nom ou le téléphone (sans accents ni casse). Servi depuis un index en mémoire."
+        ),
+        parameters=[
+            OpenApiParameter(name="q", type=str, required=True,
+                             description="Début du nom, surnom ou téléphone"),
+            OpenApiParameter(name="limit", type=int,
+                             description=f"Nombre de suggestions (max {AUTOCOMPLETE_MAX_LIMIT})"),
+        ],
+        responses={
+            200: CustomerAutocompleteSerializer(many=True),
+            404: NotFound404ResponseSerializer
+        }
+    )
+    @action(
+        detail=True,
+        methods=['get'],
+        url_path='customers/autocomplete',
+        url_name='customers-autocomplete',
+        permission_classes=[IsAuthenticated]
+    )
+    def customer_workshop_autocomplete(self, request: Request, pk=None):
+        # contrôle d'accès avant toute lecture de l'index en cache
+        workshop = self.get_object()
+        try:
+            limit = max(1, min(int(request.query_params.get("limit", 10)), AUTOCOMPLETE_MAX_LIMIT))
+        except ValueError:
+            limit = 10
+        # index à jour en mémoire : seule la lecture de l'atelier touche la base
+        index = autocomplete.get_cached_index(workshop.pk)
+        if index is None:
+            index = autocomplete.build_index(workshop)
+        return Response(index.complete(request.query_params.get("q", ""), limit))
+
     @extend_schema(
         methods=['post'],
         summary="verifier le numero de telephone d'un client existe ou non",
@@ -376,11 +476,18 @@ class CustomerWorkshopMixin:
         if not verify_phone:
             return Response({"detail": f"{verify_phone} is required"}, status=status.HTTP_400_BAD_REQUEST)
 
+        # comparaison sur la forme E.164 : une sonde de l'index (workshop, phone_normalized)
+        phone_normalized = normalize_phone(verify_phone)
+        if phone_normalized is None:
+            # sans chiffre, le filtre deviendrait "phone_normalized IS NULL"
+            return Response({"detail": f"{verify_phone} is not a valid phone number"},
+                            status=status.HTTP_400_BAD_REQUEST)
         customer_qs = workshop.customers.all()
-        if exclude_phone:
-            customer_qs = customer_qs.exclude(phone=exclude_phone)
+        exclude_normalized = normalize_phone(exclude_phone)
+        if exclude_normalized is not None:
+            customer_qs = customer_qs.exclude(phone_normalized=exclude_normalized)
 
-        exists = customer_qs.filter(phone=verify_phone).exists()
+        exists = customer_qs.filter(phone_normalized=phone_normalized).exists()
         return Response({"exists": exists})
 
 
@@ -411,6 +518,17 @@ class OrderWorkshopMixin:
                 type=int,
                 description="Nombre de résultats par page"
             ),
+            OpenApiParameter(
+                name="pagination",
+                type=str,
+                enum=["cursor"],
+                description="'cursor' : pagination par curseur, sans total (count)"
+            ),
+            OpenApiParameter(
+                name="cursor",
+                type=str,
+                description="Curseur opaque renvoyé dans 'next' (pagination par curseur)"
+            ),
 
             # Filtres par choix
             OpenApiParameter(
@@ -517,6 +635,7 @@ class OrderWorkshopMixin:
         responses={
             201: OrderWorkshopReadSerializer,
             400: ValidationError400Serializer,
+            403: QuotaExceeded403Serializer,
             404: NotFound404ResponseSerializer
         }
     )
@@ -530,12 +649,13 @@ class OrderWorkshopMixin:
     def order_workshop(self, request: Request, pk=None):
         workshop = self.get_object()
         if request.method == 'GET':
-            queryset = OrderWorkshop.objects.filter(customer__workshop=workshop, is_deleted=False).order_by(
-                'promised_delivery_date')
+            queryset = OrderWorkshop.objects.for_read().filter(
+                workshop=workshop, is_deleted=False).order_by('promised_delivery_date')
          
             filtered_qs = OrderWorkshopFilterSet(
                 request.GET, queryset=queryset).qs
 
+            self.use_keyset_pagination(request, ('promised_delivery_date', 'id'))
             page = self.paginate_queryset(filtered_qs)
             serializer = OrderWorkshopReadSerializer(page, many=True)
             return self.get_paginated_response(serializer.data)
@@ -587,8 +707,11 @@ class OrderWorkshopMixin:
     def order_workshop_detail(self, request: Request, pk=None, order_pk=None):
         workshop = self.get_object()
 
+        queryset = OrderWorkshop.objects.filter(workshop=workshop)
+        if request.method == 'GET':
+            queryset = queryset.for_read()
         try:
-            order = OrderWorkshop.objects.get(pk=order_pk)
+            order = queryset.get(pk=order_pk)
         except OrderWorkshop.DoesNotExist:
             return Response({"detail": "Order not found for this customer in this workshop."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -630,6 +753,7 @@ class OrderWorkshopGroupMixin:
         responses={
             201: OrderWorkshopGroupReadSerializer,
             400: ValidationError400Serializer,
+            403: QuotaExceeded403Serializer,
             404: NotFound404ResponseSerializer
         }
     )
@@ -643,9 +767,8 @@ class OrderWorkshopGroupMixin:
         workshop = self.get_object()
 
         if request.method == "GET":
-            queryset = OrderWorkshopGroup.objects.filter(
-                orders__customer__workshop=workshop
-            ).distinct().order_by('-createdAt')
+            queryset = OrderWorkshopGroup.objects.for_read().filter(
+                workshop=workshop).order_by('-createdAt')
 
             page = self.paginate_queryset(queryset)
             serializer = OrderWorkshopGroupReadSerializer(
@@ -657,7 +780,7 @@ class OrderWorkshopGroupMixin:
             data=request.data)
         serializer.is_valid(raise_exception=True)
         with transaction.atomic():
-            order_group = serializer.save()
+            order_group = serializer.save(workshop=workshop)
         return Response(OrderWorkshopGroupReadSerializer(order_group).data, status=status.HTTP_201_CREATED)
 
     @extend_schema(
@@ -700,8 +823,11 @@ class OrderWorkshopGroupMixin:
     def order_workshop_group_detail(self, request: Request, pk=None, order_group_pk=None):
         workshop = self.get_object()
 
+        queryset = OrderWorkshopGroup.objects.filter(workshop=workshop)
+        if request.method == 'GET':
+            queryset = queryset.for_read()
         try:
-            order_group = OrderWorkshopGroup.objects.get(pk=order_group_pk)
+            order_group = queryset.get(pk=order_group_pk)
         except OrderWorkshopGroup.DoesNotExist:
             return Response({"detail": "Order group not found."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -730,6 +856,7 @@ class FittingMixin:
         responses={
             201: FittingReadSerializer,
             400: ValidationError400Serializer,
+            403: QuotaExceeded403Serializer,
             404: NotFound404ResponseSerializer
         }
     )
@@ -782,7 +909,7 @@ class FittingMixin:
         workshop = self.get_object()
 
         try:
-            _fitting = Fitting.objects.get(pk=fitting_pk)
+            _fitting = Fitting.objects.get(pk=fitting_pk, workshop=workshop)
         except Fitting.DoesNotExist:
             return Response({"detail": "Fittin group not found."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -834,6 +961,7 @@ class SettingMixin:
         methods=['get'],
         summary="Voir si il le quota de tralleurs est atteint",
         description="Voir si il le quota de tralleurs est atteint",
+        deprecated=True,
         responses={
             200: ExistsResponseSerializer,
             404: NotFound404ResponseSerializer
@@ -845,6 +973,7 @@ class SettingMixin:
         url_path='setting/workers/authorised',
         url_name='settings-worker-count-authorised',
         permission_classes=[IsAuthenticated])
+    @cached_workshop_response
     def worker_authorised_is_create(self, request: Request, pk=None):
         """
         Check if the number of workers in the workshop is less than the maximum allowed in the Setting.
@@ -852,13 +981,14 @@ class SettingMixin:
         """
         workshop = self.get_object()
         setting: Setting = workshop.settings
-        elt_count = workshop.workers.count()
+        elt_count = get_usage(workshop.pk).workers_count
         return Response({"exists": elt_count < setting.max_workers})
 
     @extend_schema(
         methods=['get'],
         summary="Voir si il le quota de clients est atteint",
         description="Voir si il le quota de clients est atteint",
+        deprecated=True,
         responses={
             200: ExistsResponseSerializer,
             404: NotFound404ResponseSerializer
@@ -870,6 +1000,7 @@ class SettingMixin:
         url_path='setting/customers/authorised',
         url_name='settings-customer-count-authorised',
         permission_classes=[IsAuthenticated])
+    @cached_workshop_response
     def customer_authorised_is_create(self, request: Request, pk=None):
         """
         Check if the number of customers in the workshop is less than the maximum allowed in the Setting.
@@ -878,13 +1009,14 @@ class SettingMixin:
 
         workshop = self.get_object()
         setting: Setting = workshop.settings
-        elt_count = workshop.customers.count()
+        elt_count = get_usage(workshop.pk).customers_count
         return Response({"exists": elt_count < setting.max_customers})
 
     @extend_schema(
         methods=['get'],
         summary="Voir si il le quota de commandes est atteint",
         description="Voir si il le quota de commandes est atteint",
+        deprecated=True,
         responses={
             200: ExistsResponseSerializer,
             404: NotFound404ResponseSerializer
@@ -896,17 +1028,18 @@ class SettingMixin:
         url_path='setting/orders/authorised',
         url_name='settings-order-count-authorised',
         permission_classes=[IsAuthenticated])
+    @cached_workshop_response
     def order_authorised_is_create(self, request: Request, pk=None):
         workshop: Workshop = self.get_object()
         setting: Setting = workshop.settings
-        elt_count = CustomerWorkshop.objects.filter(
-            workshop=workshop).count()
+        elt_count = get_usage(workshop.pk).orders_count
         return Response({"exists": elt_count < setting.max_orders})
 
     @extend_schema(
         methods=['get'],
         summary="Voir si il le quota de ajustements est atteint",
         description="Voir si il le quota de ajustements est atteint",
+        deprecated=True,
         responses={
             200: ExistsResponseSerializer,
             404: NotFound404ResponseSerializer
@@ -918,6 +1051,7 @@ class SettingMixin:
         url_path='setting/fittings/authorised',
         url_name='settings-fitting-count-authorised',
         permission_classes=[IsAuthenticated])
+    @cached_workshop_response
     def fitting_authorised_is_create(self, request: Request, pk=None):
         """
         Check if the number of fittings in the workshop is less than the maximum allowed in the Setting.
@@ -925,9 +1059,68 @@ class SettingMixin:
         """
         workshop: Workshop = self.get_object()
         setting: Setting = workshop.settings
-        elt_count = Fitting.objects.filter(
-            order__worker__workshop=workshop).count()
-        return Response({"exists": elt_count < setting.max_orders})
+        elt_count = get_usage(workshop.pk).fittings_count
+        return Response({"exists": elt_count < setting.max_fittings})
+
+    @extend_schema(
+        methods=['get'],
+        summary="Quotas du package de l'atelier",
+        description=(
+            "Utilisation, limite et reste pour chaque ressource, ainsi que les "
+            "commandes en cours par tailleur. Supporte If-None-Match (304)."
+        ),
+        responses={
+            200: QuotaSnapshotSerializer,
+            304: None,
+            404: NotFound404ResponseSerializer
+        }
+    )
+    @action(
+        detail=True,
+        methods=['get'],
+        url_path='setting/quotas',
+        url_name='settings-quotas',
+        permission_classes=[IsAuthenticated])
+    def quotas(self, request: Request, pk=None):
+        # 1 requête : paramètres + compteurs (la ligne atelier vient avec)
+        setting = Setting.objects.select_related(
+            "workshop", "workshop__usage").filter(workshop_id=pk).first()
+        if setting is None:
+            return Response({"detail": "Setting not found"}, status=status.HTTP_404_NOT_FOUND)
+        self.check_object_permissions(request, setting.workshop)
+        try:
+            usage = setting.workshop.usage
+        except WorkshopUsage.DoesNotExist:
+            usage = get_usage(pk)
+
+        # 1 requête : commandes en cours par tailleur
+        workers = Worker.objects.filter(workshop_id=pk).annotate(
+            ongoing=Count("orders", filter=Q(
+                orders__status__in=OrderWorkshop.ONGOING_STATUSES,
+                orders__is_deleted=False))
+        ).order_by("pk").values_list("pk", "ongoing")
+
+        def quota(used, limit):
+            return {"usage": used, "limit": limit, "remaining": max(limit - used, 0)}
+
+        snapshot = {
+            resource: quota(getattr(usage, counter), getattr(setting, limit_field))
+            for resource, (counter, limit_field) in QUOTAS.items()
+        }
+        snapshot["ongoing_orders_by_worker"] = [
+            dict(worker=worker_pk, **quota(ongoing, setting.max_order_ongoing_by_worker))
+            for worker_pk, ongoing in workers
+        ]
+
+        etag = quote_etag(hashlib.md5(
+            json.dumps(snapshot, sort_keys=True).encode()).hexdigest())
+        if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+        if etag in if_none_match or "*" in if_none_match:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(snapshot)
+        response["ETag"] = etag
+        return response
 
     @extend_schema(
         methods=['post'],
@@ -1112,26 +1305,50 @@ class PackageHistoryMixin:
 class StatMixin:
     """Mixin regroupant les statistiques liées aux ateliers (workshop)."""
 
+    # Filtres que les agrégats journaliers savent servir ; toute autre
+    # combinaison repasse par l'agrégation sur les lignes brutes.
+    ROLLUP_ORDER_PARAMS = {"created_after", "created_before", "page", "limit"}
+    ROLLUP_CUSTOMER_PARAMS = {
+        "created_after", "created_before", "genre", "is_active", "page", "limit"
+    }
+
+    def _served_by_rollups(self, request, allowed_params):
+        return set(request.query_params.keys()) <= allowed_params
+
     def _get_date_range(self, request):
-        """Récupère ou calcule la période de stats (par défaut : 7 derniers jours)."""
-        today = datetime.now()
+        """
+        Période de stats en jours entiers, heure locale (par défaut : les 7
+        derniers jours, aujourd'hui compris).
+
+        Retourne (minuit du premier jour, minuit du lendemain du dernier jour),
+        borne de fin exclue : les lignes brutes (createdAt) et les agrégats
+        journaliers (day) couvrent ainsi exactement la même période.
+        """
+        last_day = timezone.localdate()
+        first_day = last_day - timedelta(days=6)
 
         created_after = request.query_params.get("created_after")
         created_before = request.query_params.get("created_before")
 
         if created_after and created_before:
             try:
-                start_date = datetime.fromisoformat(created_after)
-                end_date = datetime.fromisoformat(created_before)
+                first_day = datetime.fromisoformat(created_after).date()
+                last_day = datetime.fromisoformat(created_before).date()
             except ValueError:
-                start_date = today - timedelta(days=6)
-                end_date = today
-        else:
-            start_date = today - timedelta(days=6)
-            end_date = today
+                pass
 
+        start_date = timezone.make_aware(datetime.combine(first_day, datetime.min.time()))
+        end_date = timezone.make_aware(
+            datetime.combine(last_day + timedelta(days=1), datetime.min.time()))
         return start_date, end_date
 
+    def _stats_filter_data(self, request):
+        """Paramètres passés au FilterSet : la période est déjà appliquée."""
+        data = request.GET.copy()
+        for param in ("created_after", "created_before"):
+            data.pop(param, None)
+        return data
+
     @extend_schema(
         methods=['get'],
         summary="Statistiques sur les commandes",
@@ -1231,59 +1448,123 @@ class StatMixin:
         methods=['get'],
         url_path='stats/orders',
         url_name='stats-orders')
+    @cached_workshop_response
     def stat_orders_workshop(self, request, pk=None):
         workshop = self.get_object()
         start_date, end_date = self._get_date_range(request)
 
+        if self._served_by_rollups(request, self.ROLLUP_ORDER_PARAMS):
+            return Response(self._rollup_order_stats(workshop, start_date, end_date))
+
         queryset = OrderWorkshop.objects.filter(
-            customer__workshop=workshop,
-            createdAt__range=(start_date, end_date)
+            workshop=workshop,
+            createdAt__gte=start_date,
+            createdAt__lt=end_date,
         ).order_by("createdAt")
 
-        filtered_qs = OrderWorkshopFilterSet(request.GET, queryset=queryset).qs
+        filtered_qs = OrderWorkshopFilterSet(
+            self._stats_filter_data(request), queryset=queryset).qs
+
+        return Response(self._aggregate_order_stats(filtered_qs))
+
+    def _aggregate_order_stats(self, filtered_qs):
+        """
+        Calcule le payload de stats/orders par agrégation groupée en base
+        (3 requêtes, sans instancier les commandes).
+        """
+        filtered_qs = filtered_qs.order_by()
 
         # Calculs globaux
-        total_orders = filtered_qs.count()
-        total_amount = filtered_qs.aggregate(total=Sum("amount"))["total"] or 0
-        total_paid = filtered_qs.filter(payment_status="PAID").count()
-        total_in_progress = filtered_qs.filter(status="IN_PROGRESS").count()
-
-        # Préparation données graphiques
-        bar_data = defaultdict(lambda: {"Clients": set(), "Commandes": 0})
-        line_data = defaultdict(lambda: {"orders": 0})
-        gender_data = defaultdict(int)
-
-        unique_clients = filtered_qs.values_list(
-            "customer_id", flat=True).distinct()
-        total_clients = unique_clients.count() or 1  # éviter division par 0
-        avg_orders_per_client = round(total_orders / total_clients, 2)
+        totals = filtered_qs.aggregate(
+            total_orders=Count("id"),
+            total_amount=Sum("amount"),
+            total_paid=Count("id", filter=Q(
+                payment_status=OrderWorkshop.PaymentStatus.PAID)),
+            total_in_progress=Count("id", filter=Q(
+                status=OrderWorkshop.OrderStatus.IN_PROGRESS)),
+            total_clients=Count("customer", distinct=True),
+        )
 
-        for order in filtered_qs:
-            date_str = order.createdAt.strftime("%d-%b").lower()
-            bar_data[date_str]["Clients"].add(order.customer_id)
-            bar_data[date_str]["Commandes"] += 1
-            line_data[date_str]["orders"] += 1
-            gender_data[getattr(order, "gender", "Inconnu")] += 1
-
-        # Transformation des sets → int
-        bar_chart = [
-            {"date": k, "Clients": len(
-                v["Clients"]), "Commandes": v["Commandes"]}
-            for k, v in sorted(bar_data.items())
+        # Données graphiques, par jour (ordre chronologique)
+        by_day = filtered_qs.annotate(day=TruncDate("createdAt")).values(
+            "day"
+        ).annotate(
+            clients=Count("customer", distinct=True),
+            orders=Count("id"),
+        ).order_by("day")
+
+        # Répartition par genre, dans l'ordre de première apparition
+        by_gender = filtered_qs.values("gender").annotate(
+            value=Count("id"),
+            first_seen=Min("createdAt"),
+        ).order_by("first_seen")
+
+        return self._order_stats_payload(totals, by_day, by_gender)
+
+    def _rollup_order_stats(self, workshop, start_date, end_date):
+        """
+        Même payload que _aggregate_order_stats, lu dans les agrégats
+        journaliers : le coût ne dépend plus du nombre de commandes.
+        """
+        days = dict(day__gte=start_date.date(), day__lt=end_date.date())
+        stats = OrderDailyStat.objects.filter(
+            workshop=workshop, orders_count__gt=0, **days)
+        customer_stats = OrderCustomerDailyStat.objects.filter(
+            workshop=workshop, orders_count__gt=0, **days)
+
+        totals = stats.aggregate(
+            total_orders=Coalesce(Sum("orders_count"), 0),
+            total_amount=Sum("total_amount"),
+            total_paid=Coalesce(Sum("orders_count", filter=Q(
+                payment_status=OrderWorkshop.PaymentStatus.PAID)), 0),
+            total_in_progress=Coalesce(Sum("orders_count", filter=Q(
+                status=OrderWorkshop.OrderStatus.IN_PROGRESS)), 0),
+        )
+        totals["total_clients"] = customer_stats.values(
+            "customer").distinct().count()
+
+        clients_by_day = dict(
+            customer_stats.values("day").annotate(
+                clients=Count("customer")).values_list("day", "clients")
+        )
+        by_day = [
+            {"day": row["day"], "orders": row["orders"],
+                "clients": clients_by_day.get(row["day"], 0)}
+            for row in stats.values("day").annotate(
+                orders=Sum("orders_count")).order_by("day")
         ]
-        line_chart = [{"date": k, **v} for k, v in sorted(line_data.items())]
-        pie_chart = [{"name": k, "value": v} for k, v in gender_data.items()]
+        by_gender = stats.values("gender").annotate(
+            value=Sum("orders_count"),
+            first_seen=Min("day"),
+        ).order_by("first_seen", "gender")
 
-        return Response({
+        return self._order_stats_payload(totals, by_day, by_gender)
+
+    def _order_stats_payload(self, totals, by_day, by_gender):
+        total_orders = totals["total_orders"]
+        total_clients = totals["total_clients"] or 1  # éviter division par 0
+        avg_orders_per_client = round(total_orders / total_clients, 2)
+
+        bar_chart = []
+        line_chart = []
+        for row in by_day:
+            date_str = row["day"].strftime("%d-%b").lower()
+            bar_chart.append(
+                {"date": date_str, "Clients": row["clients"], "Commandes": row["orders"]})
+            line_chart.append({"date": date_str, "orders": row["orders"]})
+        pie_chart = [{"name": row["gender"], "value": row["value"]}
+                     for row in by_gender]
+
+        return {
             "total_orders": total_orders,
-            "total_amount": total_amount,
-            "total_paid": total_paid,
-            "total_in_progress": total_in_progress,
+            "total_amount": totals["total_amount"] or 0,
+            "total_paid": totals["total_paid"],
+            "total_in_progress": totals["total_in_progress"],
             "avg_orders_per_client": avg_orders_per_client,
             "bar_chart": bar_chart,
             "line_chart": line_chart,
             "pie_chart": pie_chart,
-        })
+        }
 
     @extend_schema(
         methods=['get'],
@@ -1295,19 +1576,43 @@ class StatMixin:
         }
     )
     @action(detail=True, methods=['get'], url_path='stats/customers', url_name='stats-customers')
+    @cached_workshop_response
     def stat_customers_workshop(self, request, pk=None):
         workshop = self.get_object()
         start_date, end_date = self._get_date_range(request)
 
+        if self._served_by_rollups(request, self.ROLLUP_CUSTOMER_PARAMS):
+            return Response({
+                "total_customers": self._rollup_total_customers(
+                    request, workshop, start_date, end_date)
+            })
+
         queryset = CustomerWorkshop.objects.filter(
             workshop=workshop,
-            createdAt__range=(start_date, end_date)
+            createdAt__gte=start_date,
+            createdAt__lt=end_date,
         )
         filtered_qs = CustomerWorkshopFilterSet(
-            request.GET, queryset=queryset).qs
+            self._stats_filter_data(request), queryset=queryset).qs
 
         total_customers = filtered_qs.count()
 
         return Response({
             "total_customers": total_customers
         })
+
+    def _rollup_total_customers(self, request, workshop, start_date, end_date):
+        # le FilterSet sert uniquement à interpréter genre / is_active
+        filterset = CustomerWorkshopFilterSet(
+            request.GET, queryset=CustomerWorkshop.objects.none())
+        filterset.is_valid()
+        stats = CustomerDailyStat.objects.filter(
+            workshop=workshop,
+            day__gte=start_date.date(),
+            day__lt=end_date.date(),
+        )
+        for field in ("genre", "is_active"):
+            value = filterset.form.cleaned_data.get(field)
+            if value not in (None, ""):
+                stats = stats.filter(**{field: value})
+        return stats.aggregate(total=Coalesce(Sum("customers_count"), 0))["total"]
@@ -1,4 +1,4 @@
-from django.db.models import Max
+from django.db.models import Max, Count, Q, Prefetch
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.db import models
@@ -9,9 +9,84 @@ from django.contrib.contenttypes.models import ContentType
 from datetime import timedelta
 import time
 
+from users.utils import normalize_phone
+from workshop.search import build_document, digits
+from workshop import snapshots
+
 User = get_user_model()
 
 
+class WorkerQuerySet(models.QuerySet):
+
+    def for_read(self):
+        """
+        Précharge tout ce que parcourt WorkerReadSerializer (atelier, settings,
+        utilisateur, compteurs de commandes) : nombre de requêtes constant
+        quelle que soit la taille de la page.
+        """
+        ongoing_orders = OrderWorkshop.objects.filter(
+            status__in=OrderWorkshop.ONGOING_STATUSES
+        ).only("pk", "worker", "createdAt")
+        return self.select_related(
+            "user", "workshop__settings"
+        ).prefetch_related(
+            "workshop__settings__worker_authorization_is_order",
+            "workshop__settings__worker_authorization_is_fitting",
+            "workshop__settings__worker_authorization_is_customer",
+            "workshop__settings__worker_authorization_is_worker",
+            "workshop__settings__worker_authorization_is_setting",
+            "user__groups__permissions",
+            "user__user_permissions",
+            Prefetch("orders", queryset=ongoing_orders,
+                     to_attr="ongoing_orders_list"),
+        ).annotate(total_orders_count=Count("orders"))
+
+
+class CustomerWorkshopQuerySet(models.QuerySet):
+
+    def with_order_counters(self):
+        """
+        Annote total_orders_count, ongoing_orders_count et urgent_orders_count
+        en une seule agrégation conditionnelle.
+        """
+        today_plus_2 = timezone.now().date() + timedelta(days=2)
+        return self.annotate(
+            total_orders_count=Count("orders"),
+            ongoing_orders_count=Count(
+                "orders",
+                filter=Q(orders__status__in=OrderWorkshop.ONGOING_STATUSES)
+            ),
+            urgent_orders_count=Count(
+                "orders",
+                filter=Q(orders__promised_delivery_date__lte=today_plus_2) | Q(
+                    orders__is_urgent=True)
+            ),
+        )
+
+
+class OrderWorkshopQuerySet(models.QuerySet):
+
+    def for_read(self):
+        """
+        Précharge worker, client et essayages tels que les imbrique
+        OrderWorkshopReadSerializer.
+        """
+        return self.prefetch_related(
+            Prefetch("worker", queryset=Worker.objects.for_read()),
+            Prefetch("customer",
+                     queryset=CustomerWorkshop.objects.with_order_counters()),
+            "fittings",
+        )
+
+
+class OrderWorkshopGroupQuerySet(models.QuerySet):
+
+    def for_read(self):
+        return self.prefetch_related(
+            Prefetch("orders", queryset=OrderWorkshop.objects.for_read())
+        )
+
+
 class Package(models.Model):
 
     class PackageType(models.TextChoices):
@@ -134,6 +209,8 @@ class Worker(models.Model):
     createdAt = models.DateTimeField(auto_now_add=True)
     updatedAt = models.DateTimeField(auto_now=True)
 
+    objects = WorkerQuerySet.as_manager()
+
     def __str__(self):
         return f"Worker: {self.user} at {self.workshop}"
 
@@ -151,6 +228,9 @@ class CustomerWorkshop(models.Model):
     genre = models.CharField(max_length=8, choices=Gender.choices)
     email = models.EmailField(null=True, blank=True)
     phone = models.CharField(max_length=20, null=True, blank=True)
+    # forme E.164 de `phone` (users.utils.normalize_phone) : unicité et recherche
+    phone_normalized = models.CharField(
+        max_length=20, null=True, blank=True, editable=False)
     workshop = models.ForeignKey(
         "Workshop",
         on_delete=models.CASCADE,
@@ -163,18 +243,53 @@ class CustomerWorkshop(models.Model):
         help_text="Photo du client, optionnelle"
     )
     is_active = models.BooleanField(default=True)
+    # noms normalisés (sans accents, minuscules) pour la recherche (workshop/search.py)
+    search_document = models.TextField(blank=True, default="", editable=False)
     createdAt = models.DateTimeField(auto_now_add=True)
     updatedAt = models.DateTimeField(auto_now=True)
 
+    objects = CustomerWorkshopQuerySet.as_manager()
+
+    SEARCH_FIELDS = ("last_name", "first_name", "nickname", "phone")
+
     class Meta:
         unique_together = (
-            ("phone", "workshop"),
-            ("nickname", "last_name", "first_name")
+            ("nickname", "last_name", "first_name"),
         )
+        constraints = [
+            # un numéro par atelier, quelle que soit sa saisie ("+225 07..." = "07...")
+            models.UniqueConstraint(
+                fields=["workshop", "phone_normalized"],
+                name="unique_customer_phone_per_workshop",
+            ),
+        ]
+        indexes = [
+            # pagination par curseur de la liste des clients
+            models.Index(fields=["workshop", "is_active", "-createdAt", "id"]),
+        ]
 
     def __str__(self):
         return f"{self.nickname} ({self.last_name} {self.first_name})"
 
+    def build_search_document(self):
+        return build_document(
+            self.last_name, self.first_name, self.nickname,
+            digits(self.phone), digits(self.phone_normalized),
+        )
+
+    def save(self, *args, **kwargs):
+        self.phone_normalized = normalize_phone(self.phone)
+        self.search_document = self.build_search_document()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if "phone" in update_fields:
+                update_fields.add("phone_normalized")
+            if set(self.SEARCH_FIELDS) & update_fields:
+                update_fields.add("search_document")
+            kwargs["update_fields"] = update_fields
+        super().save(*args, **kwargs)
+
 
 class OrderWorkshop(models.Model):
     class Gender(models.TextChoices):
@@ -194,6 +309,9 @@ class OrderWorkshop(models.Model):
         CANCELLED = "CANCELLED", "Cancelled"
         DELETED = "DELETED", "Deleted"  # jamais supprimer réellement
 
+    # statuts comptés comme "en cours"
+    ONGOING_STATUSES = (OrderStatus.NEW, OrderStatus.IN_PROGRESS)
+
     class TypeOfClothing(models.TextChoices):
         SHIRT = "SHIRT", "Shirt"
         PANTS = "PANTS", "Pants"
@@ -205,6 +323,11 @@ class OrderWorkshop(models.Model):
         "CustomerWorkshop", on_delete=models.CASCADE, related_name="orders")
     worker = models.ForeignKey(
         "Worker", on_delete=models.CASCADE, related_name="orders")
+    # atelier du client, dénormalisé pour filtrer sans jointure
+    # (index : voir Meta.indexes, tous préfixés par workshop)
+    workshop = models.ForeignKey(
+        "Workshop", on_delete=models.CASCADE, related_name="orders", editable=False,
+        db_index=False)
     gender = models.CharField(max_length=8, choices=Gender.choices)
     type_of_clothing = models.CharField(
         max_length=20, choices=TypeOfClothing.choices)
@@ -229,9 +352,29 @@ class OrderWorkshop(models.Model):
     estimated_delivery_date = models.DateField()
     promised_delivery_date = models.DateField()
     actual_delivery_date = models.DateField(null=True, blank=True)
+    # textes normalisés de la commande et du client pour la recherche (workshop/search.py)
+    search_document = models.TextField(blank=True, default="", editable=False)
     createdAt = models.DateTimeField(auto_now_add=True)
     updatedAt = models.DateTimeField(auto_now=True)
 
+    objects = OrderWorkshopQuerySet.as_manager()
+
+    SEARCH_FIELDS = (
+        "number", "clothing_model", "description",
+        "description_of_model", "description_of_fabric", "customer",
+    )
+
+    class Meta:
+        indexes = [
+            # liste des commandes d'un atelier (et pagination par curseur)
+            models.Index(fields=["workshop", "is_deleted", "promised_delivery_date", "id"]),
+            # stats/orders d'un atelier sur une période
+            models.Index(fields=["workshop", "createdAt"]),
+            # commandes en cours d'un tailleur / d'un client (compteurs, quotas)
+            models.Index(fields=["worker", "status"]),
+            models.Index(fields=["customer", "status"]),
+        ]
+
     def clean(self):
         if self.down_payment > self.amount:
             raise ValidationError(
@@ -253,8 +396,9 @@ class OrderWorkshop(models.Model):
             self.assign_date = timezone.now().date()
             self.status = self.OrderStatus.NEW
         else:
-            old_worker_id = OrderWorkshop.objects.filter(
-                pk=self.pk).values_list("worker_id", flat=True).first()
+            # instantané partagé avec les receivers post_save (une requête)
+            previous = snapshots.take(self)
+            old_worker_id = previous["worker_id"] if previous else None
             if old_worker_id is not None and old_worker_id != self.worker_id:
                 self.assign_date = timezone.now().date()
 
@@ -264,6 +408,8 @@ class OrderWorkshop(models.Model):
             next_id = last_id + 1
             self.number = f"{str(int(time.time()*1000))[-10:]}"
 
+        self.workshop_id = self.customer.workshop_id
+
         # Met à jour le statut de paiement
         if self.down_payment == 0:
             self.payment_status = self.PaymentStatus.PENDING
@@ -272,12 +418,32 @@ class OrderWorkshop(models.Model):
         else:
             self.payment_status = self.PaymentStatus.PAID
 
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "customer" in update_fields:
+            update_fields = kwargs["update_fields"] = {*update_fields, "workshop"}
+        if update_fields is None or set(self.SEARCH_FIELDS) & set(update_fields):
+            self.search_document = self.build_search_document()
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "search_document"}
+
         super().save(*args, **kwargs)
 
+    def build_search_document(self):
+        customer = self.customer
+        return build_document(
+            self.number, self.clothing_model, self.description,
+            self.description_of_model, self.description_of_fabric,
+            customer.last_name, customer.first_name, customer.nickname,
+            digits(customer.phone), digits(customer.phone_normalized),
+        )
+
     def __str__(self):
         return f"Order {self.number} for {self.customer.nickname}"
 
 
+snapshots.register(OrderWorkshop, "worker_id")
+
+
 class OrderWorkshopGroup(models.Model):
     """
     Groupement de commandes (famille, mariage…) pour facturation groupée.
@@ -300,9 +466,27 @@ class OrderWorkshopGroup(models.Model):
         max_digits=12, decimal_places=2, default=0, blank=True
     )
 
+    # atelier de la première commande (attribué à l'ajout des commandes)
+    workshop = models.ForeignKey(
+        "Workshop",
+        on_delete=models.CASCADE,
+        related_name="order_groups",
+        db_index=False,  # couvert par l'index (workshop, -createdAt)
+        null=True,
+        blank=True,
+        editable=False,
+    )
+
     createdAt = models.DateTimeField(auto_now_add=True)
     updatedAt = models.DateTimeField(auto_now=True)
 
+    objects = OrderWorkshopGroupQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["workshop", "-createdAt"]),
+        ]
+
     def save(self, *args, **kwargs):
         # Génère un identifiant unique si absent
         if not self.number:
@@ -310,6 +494,9 @@ class OrderWorkshopGroup(models.Model):
             last_id = last_order.id if last_order else 0
             next_id = last_id + 1
             self.number = f"{str(int(time.time()*1000))[-10:]}"
+        if self.workshop_id is None and self.pk is not None:
+            self.workshop_id = self.orders.order_by("pk").values_list(
+                "workshop_id", flat=True).first()
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -333,6 +520,11 @@ class Fitting(models.Model):
         on_delete=models.CASCADE,
         related_name="fittings"
     )
+    # atelier de la commande, dénormalisé pour filtrer sans jointure
+    # (index : voir Meta.indexes)
+    workshop = models.ForeignKey(
+        "Workshop", on_delete=models.CASCADE, related_name="fittings", editable=False,
+        db_index=False)
 
     # Numéro du fitting pour la commande (auto-incrémenté)
     fitting_number = models.PositiveIntegerField(blank=True)
@@ -353,8 +545,15 @@ class Fitting(models.Model):
 
     class Meta:
         unique_together = ("order", "fitting_number")
+        indexes = [
+            models.Index(fields=["workshop", "scheduled_date"]),
+        ]
 
     def save(self, *args, **kwargs):
+        self.workshop_id = self.order.workshop_id
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "order" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "workshop"}
         # Attribue automatiquement le numéro du fitting si absent
         if not self.fitting_number:
             last_num = (
@@ -424,4 +623,112 @@ class Setting(models.Model):
             self.save()
 
 
-    
\ No newline at end of file
+    
+
+class OrderDailyStat(models.Model):
+    """
+    Agrégat journalier des commandes d'un atelier, par genre, type de
+    vêtement, statut et statut de paiement. Maintenu par les signaux
+    (workshop/signals.py) et reconstructible via `rebuild_stat_rollups`.
+    """
+
+    workshop = models.ForeignKey(
+        Workshop,
+        on_delete=models.CASCADE,
+        related_name="order_daily_stats"
+    )
+    day = models.DateField()
+    gender = models.CharField(
+        max_length=8, choices=OrderWorkshop.Gender.choices)
+    type_of_clothing = models.CharField(
+        max_length=20, choices=OrderWorkshop.TypeOfClothing.choices)
+    status = models.CharField(
+        max_length=15, choices=OrderWorkshop.OrderStatus.choices)
+    payment_status = models.CharField(
+        max_length=10, choices=OrderWorkshop.PaymentStatus.choices)
+    orders_count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = [
+            ("workshop", "day", "gender", "type_of_clothing", "status", "payment_status")
+        ]
+
+    def __str__(self):
+        return f"{self.workshop_id} {self.day}: {self.orders_count} commande(s)"
+
+
+class OrderCustomerDailyStat(models.Model):
+    """
+    Nombre de commandes par client et par jour : permet de compter les
+    clients distincts d'une période sans relire les commandes.
+    """
+
+    workshop = models.ForeignKey(
+        Workshop,
+        on_delete=models.CASCADE,
+        related_name="order_customer_daily_stats"
+    )
+    day = models.DateField()
+    customer = models.ForeignKey(
+        CustomerWorkshop,
+        on_delete=models.CASCADE,
+        related_name="order_daily_stats"
+    )
+    orders_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = [
+            ("workshop", "day", "customer")
+        ]
+
+
+class CustomerDailyStat(models.Model):
+    """
+    Agrégat journalier des clients créés dans un atelier, par genre et état.
+    """
+
+    workshop = models.ForeignKey(
+        Workshop,
+        on_delete=models.CASCADE,
+        related_name="customer_daily_stats"
+    )
+    day = models.DateField()
+    genre = models.CharField(
+        max_length=8, choices=CustomerWorkshop.Gender.choices)
+    is_active = models.BooleanField()
+    customers_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = [
+            ("workshop", "day", "genre", "is_active")
+        ]
+
+
+class WorkshopUsage(models.Model):
+    """
+    Compteurs d'utilisation d'un atelier, comparés aux limites du package
+    (Setting.max_*). Maintenus par incréments F() dans les signaux
+    (workshop/signals.py) ; `reconcile_workshop_usage` les recalcule.
+    """
+
+    workshop = models.OneToOneField(
+        Workshop,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="usage"
+    )
+    # tailleurs et clients actifs (is_active=True)
+    workers_count = models.IntegerField(default=0)
+    customers_count = models.IntegerField(default=0)
+    # commandes non supprimées (is_deleted=False)
+    orders_count = models.IntegerField(default=0)
+    fittings_count = models.IntegerField(default=0)
+    # groupements contenant au moins une commande de l'atelier
+    order_groups_count = models.IntegerField(default=0)
+
+    updatedAt = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Usage de {self.workshop_id}"
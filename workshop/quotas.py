@@ -0,0 +1,56 @@
+"""
+Application des quotas du package à la création (workers, clients,
+commandes, essayages, groupements).
+
+Le compteur WorkshopUsage de l'atelier est verrouillé (SELECT ... FOR UPDATE)
+jusqu'à la fin de la transaction de création : deux créations concurrentes
+ne peuvent pas dépasser la limite.
+"""
+from django.db import transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from workshop.models import Setting, WorkshopUsage
+from workshop.usage import get_usage
+
+# ressource -> (compteur WorkshopUsage, limite Setting)
+QUOTAS = {
+    "workers": ("workers_count", "max_workers"),
+    "customers": ("customers_count", "max_customers"),
+    "orders": ("orders_count", "max_orders"),
+    "fittings": ("fittings_count", "max_fittings"),
+    "order_groups": ("order_groups_count", "max_order_groups"),
+}
+
+
+class QuotaExceeded(APIException):
+    status_code = status.HTTP_403_FORBIDDEN
+    default_detail = "Quota du package atteint."
+    default_code = "quota_exceeded"
+
+    def __init__(self, resource: str, limit: int, usage: int):
+        super().__init__()
+        # dict brut : APIException convertirait les entiers en chaînes
+        self.detail = {
+            "detail": self.default_detail,
+            "code": self.default_code,
+            "resource": resource,
+            "limit": limit,
+            "usage": usage,
+        }
+
+
+def enforce_quota(slug, resource: str):
+    """
+    Lève QuotaExceeded si l'atelier `slug` a atteint sa limite pour `resource`.
+    Doit être appelé dans la transaction qui crée l'objet.
+    """
+    if not transaction.get_connection().in_atomic_block:
+        raise RuntimeError("enforce_quota doit être appelé dans une transaction.")
+    counter, limit_field = QUOTAS[resource]
+    get_usage(slug)  # crée la ligne si besoin, avant de la verrouiller
+    usage = WorkshopUsage.objects.select_for_update().get(pk=slug)
+    limit = Setting.objects.filter(workshop_id=slug).values_list(
+        limit_field, flat=True).first()
+    if limit is not None and getattr(usage, counter) >= limit:
+        raise QuotaExceeded(resource, limit, getattr(usage, counter))
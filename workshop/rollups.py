@@ -0,0 +1,183 @@
+"""
+Maintenance incrémentale des tables d'agrégats journaliers
+(OrderDailyStat, OrderCustomerDailyStat, CustomerDailyStat).
+
+Chaque écriture sur une commande ou un client retire sa contribution de
+l'ancien "bucket" et l'ajoute au nouveau ; `rebuild()` recalcule tout
+depuis les lignes brutes.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from workshop.models import (
+    CustomerWorkshop, OrderWorkshop, OrderDailyStat,
+    OrderCustomerDailyStat, CustomerDailyStat
+)
+
+ORDER_SNAPSHOT_FIELDS = (
+    "createdAt", "gender", "type_of_clothing", "status",
+    "payment_status", "amount", "customer_id", "workshop_id",
+)
+CUSTOMER_SNAPSHOT_FIELDS = ("createdAt", "genre", "is_active", "workshop_id")
+
+
+def _day(value):
+    return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+
+
+def _bump(model, keys: dict, **deltas):
+    """
+    Applique des deltas F() sur la ligne d'agrégat identifiée par `keys`.
+
+    Mise à jour d'abord ; si la ligne n'existe pas, insertion dans un
+    savepoint, et si une écriture concurrente l'a créée entre-temps
+    (contrainte d'unicité), nouvelle mise à jour.
+    """
+    updates = {field: F(field) + value for field, value in deltas.items()}
+    if model.objects.filter(**keys).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**keys, **deltas)
+    except IntegrityError:
+        model.objects.filter(**keys).update(**updates)
+
+
+def order_values(order: OrderWorkshop):
+    return {field: getattr(order, field) for field in ORDER_SNAPSHOT_FIELDS}
+
+
+def apply_order(values, sign: int, with_customer=True):
+    if not values or values["createdAt"] is None:
+        return
+    day = _day(values["createdAt"])
+    _bump(
+        OrderDailyStat,
+        dict(
+            workshop_id=values["workshop_id"],
+            day=day,
+            gender=values["gender"],
+            type_of_clothing=values["type_of_clothing"],
+            status=values["status"],
+            payment_status=values["payment_status"],
+        ),
+        orders_count=sign,
+        total_amount=sign * Decimal(values["amount"] or 0),
+    )
+    if not with_customer:
+        return
+    _bump(
+        OrderCustomerDailyStat,
+        dict(workshop_id=values["workshop_id"], day=day,
+             customer_id=values["customer_id"]),
+        orders_count=sign,
+    )
+
+
+def move_order(previous, current):
+    if previous == current:
+        return
+    with transaction.atomic():
+        apply_order(previous, -1)
+        apply_order(current, 1)
+
+
+def customer_values(customer: CustomerWorkshop):
+    return {field: getattr(customer, field) for field in CUSTOMER_SNAPSHOT_FIELDS}
+
+
+def apply_customer(values, sign: int):
+    if not values or values["createdAt"] is None:
+        return
+    _bump(
+        CustomerDailyStat,
+        dict(
+            workshop_id=values["workshop_id"],
+            day=_day(values["createdAt"]),
+            genre=values["genre"],
+            is_active=values["is_active"],
+        ),
+        customers_count=sign,
+    )
+
+
+def move_customer(previous, current):
+    if previous == current:
+        return
+    with transaction.atomic():
+        apply_customer(previous, -1)
+        apply_customer(current, 1)
+
+
+@transaction.atomic
+def rebuild(workshops=None):
+    """
+    Recalcule les agrégats depuis les commandes et clients.
+    `workshops` : liste de slugs ; None pour tous les ateliers.
+    Retourne le nombre de lignes créées par table.
+    """
+    orders = OrderWorkshop.objects.all()
+    customers = CustomerWorkshop.objects.all()
+    order_stats = OrderDailyStat.objects.all()
+    order_customer_stats = OrderCustomerDailyStat.objects.all()
+    customer_stats = CustomerDailyStat.objects.all()
+    if workshops is not None:
+        orders = orders.filter(workshop__in=workshops)
+        customers = customers.filter(workshop__in=workshops)
+        order_stats = order_stats.filter(workshop__in=workshops)
+        order_customer_stats = order_customer_stats.filter(
+            workshop__in=workshops)
+        customer_stats = customer_stats.filter(workshop__in=workshops)
+
+    order_stats.delete()
+    order_customer_stats.delete()
+    customer_stats.delete()
+
+    orders = orders.order_by().annotate(day=TruncDate("createdAt"))
+    created_order_stats = OrderDailyStat.objects.bulk_create([
+        OrderDailyStat(
+            workshop_id=row["workshop"],
+            day=row["day"],
+            gender=row["gender"],
+            type_of_clothing=row["type_of_clothing"],
+            status=row["status"],
+            payment_status=row["payment_status"],
+            orders_count=row["orders_count"],
+            total_amount=row["total_amount"] or 0,
+        )
+        for row in orders.values(
+            "workshop", "day", "gender", "type_of_clothing",
+            "status", "payment_status"
+        ).annotate(orders_count=Count("id"), total_amount=Sum("amount"))
+    ])
+    created_order_customer_stats = OrderCustomerDailyStat.objects.bulk_create([
+        OrderCustomerDailyStat(
+            workshop_id=row["workshop"],
+            day=row["day"],
+            customer_id=row["customer"],
+            orders_count=row["orders_count"],
+        )
+        for row in orders.values("workshop", "day", "customer").annotate(
+            orders_count=Count("id"))
+    ])
+    customers = customers.order_by().annotate(day=TruncDate("createdAt"))
+    created_customer_stats = CustomerDailyStat.objects.bulk_create([
+        CustomerDailyStat(
+            workshop_id=row["workshop"],
+            day=row["day"],
+            genre=row["genre"],
+            is_active=row["is_active"],
+            customers_count=row["customers_count"],
+        )
+        for row in customers.values("workshop", "day", "genre", "is_active").annotate(
+            customers_count=Count("id"))
+    ])
+    return {
+        "order_daily_stats": len(created_order_stats),
+        "order_customer_daily_stats": len(created_order_customer_stats),
+        "customer_daily_stats": len(created_customer_stats),
+    }
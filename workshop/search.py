@@ -0,0 +1,168 @@
+"""
+Recherche plein texte sur une colonne `search_document` (texte normalisé :
+minuscules, sans accents, mots séparés par des espaces).
+
+L'index dépend du moteur de base de données :
+- SQLite : table virtuelle FTS5 (rowid = pk de la ligne indexée), classement bm25 ;
+- PostgreSQL : index GIN trigrammes (pg_trgm) sur la colonne, classement par
+  similarité ;
+- autres moteurs : LIKE sur la colonne normalisée, sans classement.
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from users.utils import looks_like_phone, normalize_phone
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+_NON_DIGIT = re.compile(r"\D+")
+
+
+def fold(text) -> str:
+    """'Hélène  N'Guessan' -> 'helene n guessan'"""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def digits(text) -> str:
+    """'+225 07 00-00' -> '225070000'"""
+    return _NON_DIGIT.sub("", text or "")
+
+
+def build_document(*values) -> str:
+    return " ".join(filter(None, (fold(value) for value in values)))
+
+
+def expand_query(query) -> list:
+    """
+    Un numéro saisi ("+225 07 01", "0701…") est aussi cherché sous sa forme
+    E.164 en chiffres, indexée à côté des chiffres bruts du téléphone.
+    """
+    queries = [query]
+    if looks_like_phone(query):
+        queries.append(digits(normalize_phone(query)))
+    return queries
+
+
+class SearchIndex:
+    """
+    Index de recherche sur le champ `document_field` d'un modèle.
+    Sur SQLite, la table FTS5 `table` est synchronisée par `update()` / `delete()`.
+    """
+
+    def __init__(self, table: str, document_field: str = "search_document"):
+        self.table = table
+        self.document_field = document_field
+
+    # --- schéma (appelé depuis les migrations) ---
+
+    def create(self, schema_editor, model):
+        vendor = schema_editor.connection.vendor
+        if vendor == "sqlite":
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5(document)")
+        elif vendor == "postgresql":
+            schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_trgm ON {model._meta.db_table} "
+                f"USING gin ({self.document_field} gin_trgm_ops)")
+
+    def drop(self, schema_editor, model):
+        vendor = schema_editor.connection.vendor
+        if vendor == "sqlite":
+            schema_editor.execute(f"DROP TABLE IF EXISTS {self.table}")
+        elif vendor == "postgresql":
+            schema_editor.execute(f"DROP INDEX IF EXISTS {self.table}_trgm")
+
+    # --- synchronisation ---
+
+    def update(self, pk, document: str):
+        if connection.vendor != "sqlite":
+            return  # la colonne est indexée directement
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [pk])
+            if document:
+                cursor.execute(
+                    f"INSERT INTO {self.table}(rowid, document) VALUES (%s, %s)",
+                    [pk, document])
+
+    def update_many(self, rows):
+        """`rows` : couples (pk, document)."""
+        if connection.vendor != "sqlite":
+            return
+        rows = list(rows)
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table} WHERE rowid = %s",
+                               [(pk,) for pk, _ in rows])
+            cursor.executemany(
+                f"INSERT INTO {self.table}(rowid, document) VALUES (%s, %s)",
+                [(pk, document) for pk, document in rows if document])
+
+    def delete(self, pk):
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [pk])
+
+    def rebuild(self, queryset):
+        """Réindexe toutes les lignes de `queryset` (documents déjà calculés)."""
+        if connection.vendor != "sqlite":
+            return
+        rows = queryset.exclude(**{self.document_field: ""}).values_list(
+            "pk", self.document_field)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            cursor.executemany(
+                f"INSERT INTO {self.table}(rowid, document) VALUES (%s, %s)", list(rows))
+
+    # --- requêtes ---
+
+    def search(self, queryset, *queries):
+        """
+        Filtre `queryset` sur les lignes correspondant à l'une des `queries`
+        (chaque mot est un préfixe, tous les mots d'une requête sont requis)
+        et annote `search_rank` (plus petit = plus pertinent), puis trie dessus.
+        """
+        queries = [expanded for query in queries for expanded in expand_query(query)]
+        groups = [fold(query).split() for query in queries]
+        groups = [tokens for tokens in groups if tokens]
+        if not groups:
+            return queryset
+
+        vendor = connection.vendor
+        if vendor == "sqlite":
+            match = " OR ".join(
+                "(" + " ".join(f'"{token}"*' for token in tokens) + ")" for tokens in groups)
+            pk_column = f'"{queryset.model._meta.db_table}"."{queryset.model._meta.pk.column}"'
+            return queryset.filter(
+                pk__in=RawSQL(f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s", [match])
+            ).annotate(
+                search_rank=RawSQL(
+                    f"SELECT rank FROM {self.table} WHERE {self.table} MATCH %s "
+                    f"AND rowid = {pk_column}", [match], output_field=FloatField())
+            ).order_by("search_rank", "pk")
+
+        condition = Q()
+        for tokens in groups:
+            group = Q()
+            for token in tokens:
+                group &= Q(**{f"{self.document_field}__contains": token})
+            condition |= group
+        queryset = queryset.filter(condition)
+        if vendor == "postgresql":
+            from django.contrib.postgres.search import TrigramWordSimilarity
+
+            text = " ".join(" ".join(tokens) for tokens in groups)
+            return queryset.annotate(
+                search_rank=-TrigramWordSimilarity(text, self.document_field)
+            ).order_by("search_rank", "pk")
+        return queryset
+
+
+customer_index = SearchIndex("workshop_customerworkshop_fts")
+order_index = SearchIndex("workshop_orderworkshop_fts")
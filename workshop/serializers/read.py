@@ -120,22 +120,27 @@ class WorkerReadSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
     def get_total_orders(self, obj):
+        # annotation posée par Worker.objects.for_read()
+        if hasattr(obj, "total_orders_count"):
+            return obj.total_orders_count
         return obj.orders.count()
 
+    def _ongoing_orders(self, obj):
+        # commandes "IN_PROGRESS" ou "NEW", préchargées par for_read() si possible
+        if hasattr(obj, "ongoing_orders_list"):
+            return obj.ongoing_orders_list
+        return obj.orders.filter(status__in=OrderWorkshop.ONGOING_STATUSES)
+
     def get_ongoing_orders(self, obj):
-        # Compte les commandes dont le statut est "IN_PROGRESS" ou "NEW"
-        return obj.orders.filter(Q(status="IN_PROGRESS") | Q(status="NEW")).count()
+        if hasattr(obj, "ongoing_orders_list"):
+            return len(obj.ongoing_orders_list)
+        return self._ongoing_orders(obj).count()
 
     def get_ongoing_orders_by_days(self, obj):
-        orders = obj.orders.filter(Q(status="IN_PROGRESS") | Q(status="NEW"))
         ongoing_orders_by_days = {}
-        for order in orders:
-            if order.createdAt.date() in ongoing_orders_by_days:
-                ongoing_orders_by_days[order.createdAt.strftime(
-                    "%d-%b").lower()].append(order.pk)
-            else:
-                ongoing_orders_by_days[order.createdAt.strftime(
-                    "%d-%b").lower()] = [order.pk]
+        for order in self._ongoing_orders(obj):
+            ongoing_orders_by_days.setdefault(
+                order.createdAt.strftime("%d-%b").lower(), []).append(order.pk)
         return ongoing_orders_by_days
 
 
@@ -166,13 +171,19 @@ class CustomerWorkshopReadSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
     def get_total_orders(self, obj):
+        # annotations posées par CustomerWorkshop.objects.with_order_counters()
+        if hasattr(obj, "total_orders_count"):
+            return obj.total_orders_count
         return obj.orders.count()
 
     def get_ongoing_orders(self, obj):
-        # Compte les commandes dont le statut est "IN_PROGRESS" ou "NEW"
-        return obj.orders.filter(Q(status="IN_PROGRESS") | Q(status="NEW")).count()
+        if hasattr(obj, "ongoing_orders_count"):
+            return obj.ongoing_orders_count
+        return obj.orders.filter(status__in=OrderWorkshop.ONGOING_STATUSES).count()
 
     def get_urgent_orders(self, obj):
+        if hasattr(obj, "urgent_orders_count"):
+            return obj.urgent_orders_count
         from django.utils.timezone import now
         from datetime import timedelta
         today_plus_2 = now().date() + timedelta(days=2)
@@ -253,6 +264,14 @@ class OrderWorkshopGroupReadSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+class CustomerAutocompleteSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    nickname = serializers.CharField()
+    first_name = serializers.CharField()
+    last_name = serializers.CharField()
+    phone = serializers.CharField(allow_null=True)
+
+
 # --- Serializers pour stat_orders_workshop ---
 
 class BarChartItemSerializer(serializers.Serializer):
@@ -286,3 +305,24 @@ class StatOrdersWorkshopSerializer(serializers.Serializer):
 
 class StatCustomersWorkshopSerializer(serializers.Serializer):
     total_customers = serializers.IntegerField()
+
+
+# --- Serializers pour setting/quotas ---
+
+class QuotaSerializer(serializers.Serializer):
+    usage = serializers.IntegerField()
+    limit = serializers.IntegerField()
+    remaining = serializers.IntegerField()
+
+
+class WorkerQuotaSerializer(QuotaSerializer):
+    worker = serializers.IntegerField()
+
+
+class QuotaSnapshotSerializer(serializers.Serializer):
+    workers = QuotaSerializer()
+    customers = QuotaSerializer()
+    orders = QuotaSerializer()
+    fittings = QuotaSerializer()
+    order_groups = QuotaSerializer()
+    ongoing_orders_by_worker = WorkerQuotaSerializer(many=True)
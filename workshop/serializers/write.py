@@ -10,6 +10,7 @@ from django.db.models import Q
 from users.serializers import UserWriteSerializer
 from users.utils import get_or_create_group
 from users.models import GROUPS
+from workshop.quotas import enforce_quota
 
 
 class WorkshopWriteSerializer(serializers.ModelSerializer):
@@ -59,6 +60,7 @@ class WorkerWriteSerializer(serializers.ModelSerializer):
         user_serializer = UserWriteSerializer(data=user_data)
         user_serializer.is_valid(raise_exception=True)
         with transaction.atomic():
+            enforce_quota(validated_data["workshop"].pk, "workers")
             user = user_serializer.save()
             worker = Worker.objects.create(user=user, **validated_data)
         user.groups.add(get_or_create_group(GROUPS["WORKERS"]))
@@ -67,6 +69,9 @@ class WorkerWriteSerializer(serializers.ModelSerializer):
 
     @transaction.atomic
     def update(self, instance, validated_data):
+        if validated_data.get("is_active") and not instance.is_active:
+            # réactivation : le tailleur compte de nouveau dans le quota
+            enforce_quota(instance.workshop_id, "workers")
         user_data = validated_data.pop("user", None)
         if user_data:
             user_serializer = UserWriteSerializer(
@@ -139,6 +144,11 @@ class CustomerWorkshopWriteSerializer(serializers.ModelSerializer):
             "photo": {"required": False},
         }
 
+    @transaction.atomic
+    def create(self, validated_data):
+        enforce_quota(validated_data["workshop"].pk, "customers")
+        return super().create(validated_data)
+
 class OrderWorkshopWriteSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderWorkshop
@@ -182,7 +192,11 @@ class OrderWorkshopWriteSerializer(serializers.ModelSerializer):
             "is_urgent": {"required": False},
         }
 
+    @transaction.atomic
     def create(self, validated_data):
+        customer = validated_data.get("customer")
+        if customer is not None:
+            enforce_quota(customer.workshop_id, "orders")
         return OrderWorkshop.objects.create(**validated_data)
 
     def update(self, instance, validated_data):
@@ -215,7 +229,11 @@ class FittingWriteSerializer(serializers.ModelSerializer):
         }
         read_only_fields = ["fitting_number", "createdAt", "updatedAt"]
 
+    @transaction.atomic
     def create(self, validated_data):
+        order = validated_data.get("order")
+        if order is not None:
+            enforce_quota(order.workshop_id, "fittings")
         # fitting_number est automatiquement attribué dans le modèle
         return Fitting.objects.create(**validated_data)
 
@@ -244,14 +262,31 @@ class OrderWorkshopGroupWriteSerializer(serializers.ModelSerializer):
             "orders": {"required": False},
         }
 
+    @staticmethod
+    def _workshop_of(orders_data):
+        # le groupement compte pour l'atelier de sa première commande
+        return min(orders_data, key=lambda order: order.pk).workshop_id
+
+    @transaction.atomic
     def create(self, validated_data):
         orders_data = validated_data.pop("orders", [])
-        group = OrderWorkshopGroup.objects.create(**validated_data)
+        workshop = validated_data.pop("workshop", None)
+        if orders_data:
+            workshop_id = self._workshop_of(orders_data)
+        else:
+            workshop_id = workshop.pk if workshop is not None else None
+        if workshop_id is not None:
+            enforce_quota(workshop_id, "order_groups")
+        group = OrderWorkshopGroup.objects.create(workshop_id=workshop_id, **validated_data)
         group.orders.set(orders_data)
         return group
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         orders_data = validated_data.pop("orders", None)
+        if orders_data and instance.workshop_id is None:
+            # premier rattachement à un atelier (signal m2m) : compte dans le quota
+            enforce_quota(self._workshop_of(orders_data), "order_groups")
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
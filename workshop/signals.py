@@ -1,8 +1,14 @@
-from django.db.models.signals import post_save
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
 from django.dispatch import receiver
 from workshop.models import (
-    Setting, Workshop, Worker,  PackageHistory, Package
+    Setting, Workshop, Worker,  PackageHistory, Package,
+    OrderWorkshop, CustomerWorkshop, Fitting, OrderWorkshopGroup,
+    WorkshopUsage
 )
+from workshop import rollups, snapshots, usage, autocomplete
+from workshop.search import customer_index, order_index
+from workshop.cache import bump_version
 
 from users.models import GROUPS
 from users.utils import get_or_create_group
@@ -37,3 +43,225 @@ def create_worker(sender, instance: Worker, created, **kwargs):
     if created:
         group_worker = get_or_create_group(GROUPS["WORKERS"])
         instance.user.groups.add(group_worker)
+
+
+def _deleted_from(origin, model):
+    """Vrai si la suppression a été demandée sur `model` (et non en cascade)."""
+    if isinstance(origin, QuerySet):
+        return origin.model is model
+    return isinstance(origin, model)
+
+
+# Agrégats journaliers des statistiques (workshop/rollups.py)
+
+snapshots.register(OrderWorkshop, *rollups.ORDER_SNAPSHOT_FIELDS)
+snapshots.register(CustomerWorkshop, *rollups.CUSTOMER_SNAPSHOT_FIELDS)
+
+
+@receiver(post_save, sender=OrderWorkshop, dispatch_uid="order_workshop_rollup_update")
+def update_order_workshop_rollup(sender, instance: OrderWorkshop, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = snapshots.previous(instance, rollups.ORDER_SNAPSHOT_FIELDS)
+    rollups.move_order(previous, rollups.order_values(instance))
+
+
+@receiver(post_delete, sender=OrderWorkshop, dispatch_uid="order_workshop_rollup_delete")
+def delete_order_workshop_rollup(sender, instance: OrderWorkshop, origin=None, **kwargs):
+    if _deleted_from(origin, Workshop):
+        return
+    # si le client est supprimé, ses lignes par client partent en cascade
+    rollups.apply_order(
+        rollups.order_values(instance), -1,
+        with_customer=not _deleted_from(origin, CustomerWorkshop)
+    )
+
+
+@receiver(post_save, sender=CustomerWorkshop, dispatch_uid="customer_workshop_rollup_update")
+def update_customer_workshop_rollup(sender, instance: CustomerWorkshop, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = snapshots.previous(instance, rollups.CUSTOMER_SNAPSHOT_FIELDS)
+    rollups.move_customer(previous, rollups.customer_values(instance))
+
+
+@receiver(post_delete, sender=CustomerWorkshop, dispatch_uid="customer_workshop_rollup_delete")
+def delete_customer_workshop_rollup(sender, instance: CustomerWorkshop, origin=None, **kwargs):
+    if not _deleted_from(origin, Workshop):
+        rollups.apply_customer(rollups.customer_values(instance), -1)
+
+
+# Invalidation du cache des réponses par atelier (workshop/cache.py)
+
+def _workshop_slug(instance):
+    if isinstance(instance, Workshop):
+        return instance.pk
+    # commandes, essayages et groupements portent aussi workshop_id
+    return instance.workshop_id
+
+
+def bump_workshop_cache(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or (sender is not Workshop and _deleted_from(origin, Workshop)):
+        return
+    bump_version(_workshop_slug(instance))
+
+
+def bump_workshop_cache_m2m(sender, instance, action, **kwargs):
+    if action.startswith("post_"):
+        bump_version(_workshop_slug(instance))
+
+
+for model in (Workshop, Worker, CustomerWorkshop, OrderWorkshop, Fitting, Setting, PackageHistory):
+    post_save.connect(bump_workshop_cache, sender=model,
+                      dispatch_uid=f"{model.__name__.lower()}_cache_save")
+    post_delete.connect(bump_workshop_cache, sender=model,
+                        dispatch_uid=f"{model.__name__.lower()}_cache_delete")
+
+for field in (
+    "worker_authorization_is_order", "worker_authorization_is_fitting",
+    "worker_authorization_is_customer", "worker_authorization_is_worker",
+    "worker_authorization_is_setting",
+):
+    # l'instance est un Setting ou un Worker selon le côté de la relation
+    m2m_changed.connect(bump_workshop_cache_m2m, sender=getattr(Setting, field).through,
+                        dispatch_uid=f"setting_{field}_cache_m2m")
+
+
+# Compteurs d'utilisation pour les quotas (workshop/usage.py)
+
+@receiver(post_save, sender=Workshop, dispatch_uid="workshop_usage_create")
+def create_workshop_usage(sender, instance: Workshop, created, raw=False, **kwargs):
+    if created and not raw:
+        WorkshopUsage.objects.get_or_create(workshop=instance)
+
+
+USAGE_FIELDS = {
+    Worker: "workers_count",
+    CustomerWorkshop: "customers_count",
+    Fitting: "fittings_count",
+}
+
+
+# tailleurs et clients : seuls les actifs sont comptés (la suppression
+# depuis l'API est logique, is_active=False)
+SOFT_DELETED_MODELS = (Worker, CustomerWorkshop)
+
+
+def _is_counted(instance) -> bool:
+    return bool(instance.is_active) if isinstance(instance, SOFT_DELETED_MODELS) else True
+
+
+def count_created(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if sender in SOFT_DELETED_MODELS:
+        # création, suppression logique ou réactivation
+        previous = snapshots.previous(instance)
+        delta = int(_is_counted(instance)) - int(bool(previous and previous["is_active"]))
+    else:
+        delta = int(created)
+    usage.add(_workshop_slug(instance), USAGE_FIELDS[sender], delta)
+
+
+def count_deleted(sender, instance, origin=None, **kwargs):
+    if _is_counted(instance) and not _deleted_from(origin, Workshop):
+        usage.add(_workshop_slug(instance), USAGE_FIELDS[sender], -1)
+
+
+for model in USAGE_FIELDS:
+    post_save.connect(count_created, sender=model,
+                      dispatch_uid=f"{model.__name__.lower()}_usage_create")
+    post_delete.connect(count_deleted, sender=model,
+                        dispatch_uid=f"{model.__name__.lower()}_usage_delete")
+for model in SOFT_DELETED_MODELS:
+    snapshots.register(model, "is_active")
+snapshots.register(OrderWorkshop, "is_deleted")
+snapshots.register(OrderWorkshopGroup, "workshop_id")
+
+
+@receiver(post_save, sender=OrderWorkshop, dispatch_uid="order_workshop_usage_update")
+def update_order_workshop_usage(sender, instance: OrderWorkshop, raw=False, **kwargs):
+    if raw:
+        return
+    # création ou (dé)suppression logique
+    previous = snapshots.previous(instance)
+    delta = int(not instance.is_deleted) - int(previous is not None and previous["is_deleted"] is False)
+    usage.add(_workshop_slug(instance), "orders_count", delta)
+
+
+@receiver(post_delete, sender=OrderWorkshop, dispatch_uid="order_workshop_usage_delete")
+def delete_order_workshop_usage(sender, instance: OrderWorkshop, origin=None, **kwargs):
+    if not instance.is_deleted and not _deleted_from(origin, Workshop):
+        usage.add(_workshop_slug(instance), "orders_count", -1)
+
+
+@receiver(m2m_changed, sender=OrderWorkshopGroup.orders.through, dispatch_uid="order_workshop_group_assign_workshop")
+def assign_order_workshop_group_workshop(sender, instance, action, reverse, pk_set=None, **kwargs):
+    # un groupement créé sans commande prend l'atelier de la première ajoutée
+    if action != "post_add":
+        return
+    groups = OrderWorkshopGroup.objects.filter(pk__in=pk_set) if reverse else [instance]
+    for group in groups:
+        if group.workshop_id is None:
+            group.save(update_fields=["workshop"])
+
+
+@receiver(post_save, sender=OrderWorkshopGroup, dispatch_uid="order_workshop_group_usage_update")
+def update_order_workshop_group_usage(sender, instance: OrderWorkshopGroup, raw=False, **kwargs):
+    # un groupement compte pour son atelier dès qu'il en a un
+    previous = (snapshots.previous(instance) or {}).get("workshop_id")
+    if not raw and previous != instance.workshop_id:
+        usage.add(previous, "order_groups_count", -1)
+        usage.add(instance.workshop_id, "order_groups_count", 1)
+
+
+@receiver(post_delete, sender=OrderWorkshopGroup, dispatch_uid="order_workshop_group_usage_delete")
+def delete_order_workshop_group_usage(sender, instance: OrderWorkshopGroup, origin=None, **kwargs):
+    if not _deleted_from(origin, Workshop):
+        usage.add(instance.workshop_id, "order_groups_count", -1)
+
+
+# Index de recherche des clients (workshop/search.py)
+
+snapshots.register(CustomerWorkshop, "search_document", "phone")
+
+
+@receiver(post_save, sender=CustomerWorkshop, dispatch_uid="customer_workshop_search_index")
+def index_customer_workshop(sender, instance: CustomerWorkshop, created, raw=False, **kwargs):
+    if raw:
+        return
+    customer_index.update(instance.pk, instance.search_document)
+    previous = snapshots.previous(instance, ("search_document", "phone"))
+    if previous is not None and previous != {
+            "search_document": instance.search_document, "phone": instance.phone}:
+        # les documents des commandes reprennent les noms et le téléphone du client
+        orders = list(instance.orders.all())
+        for order in orders:
+            order.customer = instance
+            order.search_document = order.build_search_document()
+        OrderWorkshop.objects.bulk_update(orders, ["search_document"], batch_size=500)
+        order_index.update_many((order.pk, order.search_document) for order in orders)
+
+
+@receiver(post_delete, sender=CustomerWorkshop, dispatch_uid="customer_workshop_search_unindex")
+def unindex_customer_workshop(sender, instance: CustomerWorkshop, **kwargs):
+    customer_index.delete(instance.pk)
+
+
+@receiver(post_save, sender=OrderWorkshop, dispatch_uid="order_workshop_search_index")
+def index_order_workshop(sender, instance: OrderWorkshop, raw=False, update_fields=None, **kwargs):
+    if not raw and (update_fields is None or "search_document" in update_fields):
+        order_index.update(instance.pk, instance.search_document)
+
+
+@receiver(post_delete, sender=OrderWorkshop, dispatch_uid="order_workshop_search_unindex")
+def unindex_order_workshop(sender, instance: OrderWorkshop, **kwargs):
+    order_index.delete(instance.pk)
+
+
+# Autocomplétion des clients (workshop/autocomplete.py)
+
+@receiver(post_save, sender=CustomerWorkshop, dispatch_uid="customer_workshop_autocomplete_save")
+@receiver(post_delete, sender=CustomerWorkshop, dispatch_uid="customer_workshop_autocomplete_delete")
+def invalidate_customer_autocomplete(sender, instance: CustomerWorkshop, **kwargs):
+    autocomplete.invalidate(instance.workshop_id)
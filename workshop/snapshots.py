@@ -0,0 +1,53 @@
+"""
+Valeurs en base d'une ligne avant sa sauvegarde, lues en une seule requête
+et partagées par les receivers post_save (agrégats journaliers, compteurs
+d'utilisation, index de recherche, notifications).
+
+Chaque module déclare les champs dont il a besoin avec `register()` ; le
+receiver pre_save lit l'union de ces champs. `take()` permet à un
+`Model.save()` de lire l'instantané avant son propre pre_save, sans
+seconde requête.
+"""
+from collections import defaultdict
+
+from django.db.models.signals import pre_save
+
+FIELDS = defaultdict(set)
+
+
+def register(model, *fields):
+    """Ajoute `fields` à l'instantané pris avant chaque sauvegarde de `model`."""
+    FIELDS[model].update(fields)
+    pre_save.connect(_snapshot, sender=model,
+                     dispatch_uid=f"{model._meta.label_lower}_snapshot")
+
+
+def take(instance):
+    """Lit et retourne les valeurs en base de `instance` (None à la création)."""
+    model = type(instance)
+    values = None
+    if instance.pk is not None:
+        values = model.objects.filter(pk=instance.pk).values(
+            *sorted(FIELDS[model])).first()
+    instance._snapshot = values
+    instance._snapshot_taken = True
+    return values
+
+
+def _snapshot(sender, instance, raw=False, **kwargs):
+    if raw:
+        instance._snapshot = None
+    elif not getattr(instance, "_snapshot_taken", False):
+        take(instance)
+    instance._snapshot_taken = False
+
+
+def previous(instance, fields=None):
+    """
+    Valeurs en base de `instance` avant la sauvegarde en cours, limitées à
+    `fields` si donné ; None à la création.
+    """
+    values = getattr(instance, "_snapshot", None)
+    if values is None or fields is None:
+        return values
+    return {field: values[field] for field in fields}
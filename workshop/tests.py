@@ -14,7 +14,13 @@ from io import BytesIO
 from django.core.files.uploadedfile import SimpleUploadedFile
 from PIL import Image
 from django.utils import timezone
+from datetime import timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from io import StringIO
 from workshop.utils import init_package
+from workshop.serializers.read import OrderWorkshopReadSerializer
 
 
 
@@ -257,6 +263,18 @@ class WorkshopViewSetTestCase(TestCase):
         response = self.client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
+    def test_worker_reactivation_quota_exceeded(self):
+        url = reverse('workshops-workers-detail',
+                      kwargs={'pk': self.workshop.pk, 'worker_pk': self.worker2.pk})
+        self.client.delete(url)
+        self.workshop.settings.max_workers = 1
+        self.workshop.settings.save()
+        response = self.client.patch(url, {'is_active': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.data['resource'], 'workers')
+        self.worker2.refresh_from_db()
+        self.assertFalse(self.worker2.is_active)
+
     # # Tests CustomerWorkshopMixin
     def test_customer_list(self):
         url = reverse('workshops-customers-list',
@@ -266,6 +284,175 @@ class WorkshopViewSetTestCase(TestCase):
         self.assertIsInstance(response.data, dict)
         self.assertIsInstance(response.data['results'], list)
 
+    def test_customer_list_limit_and_count_free_mode(self):
+        url = reverse('workshops-customers-list',
+                      kwargs={'pk': self.workshop.pk})
+        response = self.client.get(url, {'limit': 1})
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(len(response.data['results']), 1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {'limit': 1, 'count': 'false'})
+        self.assertNotIn('count', response.data)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNotNone(response.data['next'])
+        self.assertIsNone(response.data['previous'])
+        self.assertFalse(any('COUNT(*)' in q['sql'] for q in ctx.captured_queries))
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+        self.assertIsNotNone(response.data['previous'])
+
+    def test_customer_list_counters_sort_and_filter(self):
+        url = reverse('workshops-customers-list',
+                      kwargs={'pk': self.workshop.pk})
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {'ordering': '-total_orders'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([c['id'] for c in results],
+                         [self.customer1.pk, self.customer2.pk])
+        self.assertEqual(results[0]['total_orders'], 1)
+        self.assertEqual(results[0]['urgent_orders'], 1)
+        self.assertEqual(results[1]['total_orders'], 0)
+        # aucune requête COUNT par client
+        self.assertLessEqual(len(ctx.captured_queries), 4)
+
+        response = self.client.get(url, {'min_total_orders': 1})
+        self.assertEqual([c['id'] for c in response.data['results']],
+                         [self.customer1.pk])
+
+    def test_customer_list_name_search(self):
+        helene = CustomerWorkshop.objects.create(
+            last_name="Kouassi",
+            first_name="Hélène",
+            nickname="Lène",
+            genre="WOMAN",
+            phone="0700000001",
+            workshop=self.workshop,
+        )
+        url = reverse('workshops-customers-list',
+                      kwargs={'pk': self.workshop.pk})
+
+        # sans accents, insensible à la casse, par préfixe
+        for query in ['helene', 'HÉLÈ', 'kouassi hel']:
+            response = self.client.get(url, {'name': query})
+            self.assertEqual([c['id'] for c in response.data['results']],
+                             [helene.pk], query)
+
+        # plusieurs valeurs : OU
+        response = self.client.get(url, {'name': 'helene,smith'})
+        self.assertEqual({c['id'] for c in response.data['results']},
+                         {helene.pk, self.customer1.pk})
+
+        # l'index suit les modifications
+        helene.first_name = "Adjoua"
+        helene.save(update_fields=['first_name'])
+        self.assertEqual(self.client.get(url, {'name': 'helene'}).data['results'], [])
+        response = self.client.get(url, {'name': 'adjoua'})
+        self.assertEqual([c['id'] for c in response.data['results']], [helene.pk])
+
+        # pertinence : le nom complet passe avant une correspondance partielle
+        CustomerWorkshop.objects.create(
+            last_name="Adjoua", first_name="Adjoua", nickname="Adjoua2",
+            genre="WOMAN", phone="0700000002", workshop=self.workshop)
+        response = self.client.get(url, {'name': 'adjoua'})
+        self.assertEqual(response.data['results'][0]['nickname'], "Adjoua2")
+
+    def test_customer_autocomplete(self):
+        from django.test import override_settings
+        from workshop import autocomplete
+
+        url = reverse('workshops-customers-autocomplete',
+                      kwargs={'pk': self.workshop.pk})
+        response = self.client.get(url, {'q': 'j'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # triés par nom
+        self.assertEqual([c['id'] for c in response.data],
+                         [self.customer2.pk, self.customer1.pk])
+
+        # index en mémoire : seules l'authentification et la lecture de l'atelier touchent la base
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'q': 'smi jo'})
+        self.assertEqual([c['id'] for c in response.data], [self.customer1.pk])
+        # limite négative ramenée à 1
+        self.assertEqual(len(self.client.get(url, {'q': 'j', 'limit': -5}).data), 1)
+        # atelier supprimé : 404 même si son index est encore en cache
+        gone = Workshop.objects.create(
+            name="Gone Workshop", description="Gone", phone="0102030406", country="CI")
+        autocomplete.build_index(gone)
+        gone_url = reverse('workshops-customers-autocomplete', kwargs={'pk': gone.pk})
+        gone.delete()
+        self.assertEqual(self.client.get(gone_url, {'q': 'j'}).status_code,
+                         status.HTTP_404_NOT_FOUND)
+        self.assertEqual(
+            [c['id'] for c in self.client.get(url, {'q': '1234567891'}).data],
+            [self.customer1.pk])
+
+        # invalidé par la sauvegarde d'un client
+        self.customer1.first_name = "Hélène"
+        self.customer1.save()
+        self.assertEqual([c['id'] for c in self.client.get(url, {'q': 'HELE'}).data],
+                         [self.customer1.pk])
+        self.customer1.is_active = False
+        self.customer1.save()
+        self.assertEqual(self.client.get(url, {'q': 'hele'}).data, [])
+
+        # éviction LRU entre ateliers
+        with override_settings(AUTOCOMPLETE_MAX_WORKSHOPS=1):
+            other = Workshop.objects.create(
+                name="Other Workshop", description="Other", phone="0102030405", country="CI")
+            autocomplete.build_index(other)
+            self.assertIsNone(autocomplete.get_cached_index(self.workshop.pk))
+            self.assertIsNotNone(autocomplete.get_cached_index(other.pk))
+
+    def test_customer_phone_normalized(self):
+        from django.db import IntegrityError, transaction
+
+        self.assertEqual(self.customer1.phone_normalized, "+2251234567891")
+
+        # la vérification compare les formes E.164
+        url = reverse('workshops-customer-workshop-verify-number',
+                      kwargs={'pk': self.workshop.pk})
+        response = self.client.post(url, {'verify_phone': '+225 12 34 56 78 91'})
+        self.assertTrue(response.data['exists'])
+        response = self.client.post(
+            url + '?phone=12-34-56-78-91', {'verify_phone': '002251234567891'})
+        self.assertFalse(response.data['exists'])
+
+        # numéro sans chiffre : refusé, et non comparé aux numéros vides
+        response = self.client.post(url, {'verify_phone': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url + '?phone=abc', {'verify_phone': '1234567891'})
+        self.assertTrue(response.data['exists'])
+
+        # même numéro sous une autre saisie : refusé par la contrainte
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CustomerWorkshop.objects.create(
+                last_name="Smith", first_name="Jim", nickname="JimSmith", genre="MAN",
+                phone="+225 12 34 56 78 91", workshop=self.workshop)
+
+        # recherche et autocomplétion acceptent le numéro formaté
+        search = self.client.get(reverse('workshops-customers-list', kwargs={'pk': self.workshop.pk}),
+                                 {'name': '+225 12 34 56 78 91'})
+        self.assertEqual([c['id'] for c in search.data['results']], [self.customer1.pk])
+        autocomplete = self.client.get(
+            reverse('workshops-customers-autocomplete', kwargs={'pk': self.workshop.pk}),
+            {'q': '+225 1234 5678 92'})
+        self.assertEqual([c['id'] for c in autocomplete.data], [self.customer2.pk])
+
+        # backfill des lignes antérieures à la colonne
+        CustomerWorkshop.objects.filter(pk=self.customer2.pk).update(phone_normalized=None)
+        call_command("backfill_phone_normalized", stdout=StringIO())
+        self.customer2.refresh_from_db()
+        self.assertEqual(self.customer2.phone_normalized, "+2251234567892")
+
+        # la reconstruction des index garde la forme E.164 dans le document
+        search = self.client.get(reverse('workshops-customers-list', kwargs={'pk': self.workshop.pk}),
+                                 {'name': '+225 1234567892'})
+        self.assertEqual([c['id'] for c in search.data['results']], [self.customer2.pk])
+
     def test_customer_create(self):
         data = {
             'last_name': 'Doe',
@@ -281,6 +468,26 @@ class WorkshopViewSetTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertGreaterEqual(CustomerWorkshop.objects.count(), 2)
 
+    def test_customer_create_quota_exceeded(self):
+        self.workshop.settings.max_customers = 2
+        self.workshop.settings.save()
+        data = {
+            'last_name': 'Doe',
+            'first_name': 'John',
+            'nickname': 'JohnDoe',
+            'genre': 'MAN',
+            'phone': '0000000001',
+        }
+        url = reverse('workshops-customers-list',
+                      kwargs={'pk': self.workshop.pk})
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.data['code'], 'quota_exceeded')
+        self.assertEqual(response.data['resource'], 'customers')
+        self.assertEqual(response.data['limit'], 2)
+        self.assertEqual(response.data['usage'], 2)
+        self.assertFalse(CustomerWorkshop.objects.filter(nickname='JohnDoe').exists())
+
     def test_customer_detail_retrieve(self):
         url = reverse('workshops-customers-detail',
                       kwargs={'pk': self.workshop.pk, 'customer_pk': self.customer1.pk})
@@ -312,6 +519,121 @@ class WorkshopViewSetTestCase(TestCase):
         self.assertIsInstance(response.data, dict)
         self.assertIsInstance(response.data['results'], list)
 
+    def test_order_list_query_count_is_constant(self):
+        url = reverse('workshops-orders-list',
+                      kwargs={'pk': self.workshop.pk})
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        baseline = len(ctx.captured_queries)
+
+        for worker, customer in [(self.worker1, self.customer2), (self.worker2, self.customer1),
+                                 (self.worker2, self.customer2)]:
+            order = OrderWorkshop.objects.create(
+                customer=customer,
+                worker=worker,
+                gender="WOMAN",
+                type_of_clothing="DRESS",
+                measurement={},
+                description_of_fabric="Wax",
+                clothing_model="Robe",
+                amount=100,
+                down_payment=0,
+                estimated_delivery_date="2023-01-02",
+                promised_delivery_date="2023-01-02",
+            )
+            Fitting.objects.create(order=order, scheduled_date=timezone.now())
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 4)
+        self.assertEqual(len(ctx.captured_queries), baseline)
+
+        # même rendu que sans préchargement
+        first = response.data['results'][0]
+        unplanned = OrderWorkshopReadSerializer(
+            OrderWorkshop.objects.get(pk=first['id'])).data
+        self.assertEqual(first['customer'], unplanned['customer'])
+        self.assertEqual(first['worker'], unplanned['worker'])
+        self.assertEqual(first['fittings'], unplanned['fittings'])
+
+    def test_order_list_search(self):
+        boubou = OrderWorkshop.objects.create(
+            customer=self.customer2,
+            worker=self.worker2,
+            gender="WOMAN",
+            type_of_clothing="DRESS",
+            measurement={},
+            description_of_fabric="Bazin riche",
+            clothing_model="Boubou brodé",
+            amount=100,
+            down_payment=0,
+            estimated_delivery_date="2023-01-02",
+            promised_delivery_date="2023-01-02",
+        )
+        url = reverse('workshops-orders-list',
+                      kwargs={'pk': self.workshop.pk})
+
+        def search(query):
+            return [o['id'] for o in self.client.get(url, {'q': query}).data['results']]
+
+        self.assertEqual(search('BRODE'), [boubou.pk])
+        self.assertEqual(search('bazin jane'), [boubou.pk])
+        self.assertEqual(search('smith'), [self.order.pk])
+        self.assertEqual(search(self.order.number), [self.order.pk])
+        self.assertEqual(search('1234567892'), [boubou.pk])
+
+        # les commandes suivent le renommage du client
+        self.customer2.last_name = "Adjoua"
+        self.customer2.save()
+        self.assertEqual(search('adjoua boubou'), [boubou.pk])
+        self.assertEqual(search('doe boubou'), [])
+
+    def test_order_list_cursor_pagination(self):
+        from unittest import mock
+        from ecouture.pagination import KeysetPagination
+
+        for day in ["2023-01-01", "2023-01-01", "2022-12-30", "2023-01-05"]:
+            OrderWorkshop.objects.create(
+                customer=self.customer2,
+                worker=self.worker2,
+                gender="WOMAN",
+                type_of_clothing="DRESS",
+                measurement={},
+                description_of_fabric="Wax",
+                clothing_model="Robe",
+                amount=100,
+                down_payment=0,
+                estimated_delivery_date=day,
+                promised_delivery_date=day,
+            )
+        expected = list(OrderWorkshop.objects.filter(is_deleted=False).order_by(
+            'promised_delivery_date', 'id').values_list('pk', flat=True))
+
+        seen = []
+        url = reverse('workshops-orders-list',
+                      kwargs={'pk': self.workshop.pk}) + '?pagination=cursor'
+        with mock.patch.object(KeysetPagination, 'page_size', 2):
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertNotIn('count', response.data)
+                seen += [o['id'] for o in response.data['results']]
+                url = response.data['next']
+        self.assertEqual(seen, expected)
+
+    def test_order_list_forged_cursor(self):
+        import base64
+        import json
+
+        url = reverse('workshops-orders-list', kwargs={'pk': self.workshop.pk})
+        for position in (["abc", 1], ["2024-01-01", "x"], [{"a": 1}, 1], [None, 1], "abc"):
+            cursor = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+            response = self.client.get(url, {"cursor": cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, position)
+        response = self.client.get(url, {"cursor": "%%%"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_order_create(self):
         data = {
             'customer': self.customer1.pk,
@@ -384,6 +706,21 @@ class WorkshopViewSetTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertGreaterEqual(OrderWorkshopGroup.objects.count(), 1)
 
+    def test_order_group_create_quota_exceeded(self):
+        # un groupement vide compte aussi pour l'atelier de l'URL
+        self.workshop.settings.max_order_groups = 2
+        self.workshop.settings.save()
+        url = reverse('workshops-order-groups-list',
+                      kwargs={'pk': self.workshop.pk})
+        response = self.client.post(url, {"description": "Vide", "orders": []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(OrderWorkshopGroup.objects.get(pk=response.data['id']).workshop_id,
+                         self.workshop.pk)
+        response = self.client.post(url, {"description": "Vide", "orders": []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.data['resource'], 'order_groups')
+        self.assertEqual(OrderWorkshopGroup.objects.count(), 2)
+
     def test_order_group_detail_retrieve(self):
         url = reverse('workshops-order-groups-detail',
                       kwargs={'pk': self.workshop.pk, 'order_group_pk': self.order_group.pk})
@@ -420,6 +757,20 @@ class WorkshopViewSetTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertGreaterEqual(Fitting.objects.count(), 1)
 
+    def test_fitting_create_quota_exceeded(self):
+        self.workshop.settings.max_fittings = 1
+        self.workshop.settings.save()
+        data = {
+            "order": self.order.pk,
+            "scheduled_date": "2022-12-31 16:00:00",
+        }
+        url = reverse('workshops-fittings-list',
+                      kwargs={'pk': self.workshop.pk})
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.data['resource'], 'fittings')
+        self.assertEqual(Fitting.objects.count(), 1)
+
     def test_fitting_detail_update(self):
         data = {
             "actual_date": "2022-12-31 16:00:00",
@@ -472,6 +823,32 @@ class WorkshopViewSetTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['exists'], True)
 
+    def test_quota_snapshot(self):
+        url = reverse('workshops-settings-quotas',
+                      kwargs={'pk': self.workshop.pk})
+        # authentification JWT + 2 requêtes
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['customers'],
+                         {'usage': 2, 'limit': 50, 'remaining': 48})
+        self.assertEqual(response.data['orders']['usage'], 1)
+        self.assertEqual(response.data['order_groups']['limit'], 10)
+        self.assertEqual(response.data['ongoing_orders_by_worker'], [
+            {'worker': self.worker1.pk, 'usage': 1, 'limit': 5, 'remaining': 4},
+            {'worker': self.worker2.pk, 'usage': 0, 'limit': 5, 'remaining': 5},
+        ])
+
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+        self.customer2.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
     def test_fitting_authorised_is_create(self):
         url = reverse('workshops-settings-fitting-count-authorised',
                       kwargs={'pk': self.workshop.pk})
@@ -479,6 +856,112 @@ class WorkshopViewSetTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['exists'], True)
 
+    def test_workshop_usage_counters(self):
+        from workshop.models import WorkshopUsage
+
+        usage = WorkshopUsage.objects.get(pk=self.workshop.pk)
+        self.assertEqual(
+            (usage.workers_count, usage.customers_count, usage.orders_count,
+             usage.fittings_count, usage.order_groups_count),
+            (2, 2, 1, 1, 1))
+
+        # suppression logique de la commande
+        url = reverse('workshops-orders-detail',
+                      kwargs={'pk': self.workshop.pk, 'order_pk': self.order.pk})
+        self.client.delete(url)
+        self.fitting.delete()
+        self.order_group.delete()
+        usage.refresh_from_db()
+        self.assertEqual(
+            (usage.orders_count, usage.fittings_count, usage.order_groups_count),
+            (0, 0, 0))
+
+        # la suppression d'un client emporte ses commandes
+        self.customer2.delete()
+        usage.refresh_from_db()
+        self.assertEqual(usage.customers_count, 1)
+
+        # suppression logique d'un client et d'un tailleur depuis l'API
+        response = self.client.delete(reverse(
+            'workshops-customers-detail',
+            kwargs={'pk': self.workshop.pk, 'customer_pk': self.customer1.pk}))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.worker2.is_active = False
+        self.worker2.save()
+        usage.refresh_from_db()
+        self.assertEqual((usage.customers_count, usage.workers_count), (0, 1))
+        out = StringIO()
+        call_command("reconcile_workshop_usage", "--dry-run", stdout=out)
+        self.assertIn("Aucun écart", out.getvalue())
+
+        # réactivation : de nouveau compté
+        self.customer1.refresh_from_db()
+        self.customer1.is_active = True
+        self.customer1.save()
+        usage.refresh_from_db()
+        self.assertEqual(usage.customers_count, 1)
+
+        # le quota d'essayages est comparé à max_fittings
+        self.workshop.settings.max_fittings = 0
+        self.workshop.settings.save()
+        url = reverse('workshops-settings-fitting-count-authorised',
+                      kwargs={'pk': self.workshop.pk})
+        self.assertFalse(self.client.get(url).data['exists'])
+
+    def test_order_save_reads_previous_row_once(self):
+        self.order.status = OrderWorkshop.OrderStatus.IN_PROGRESS
+        with CaptureQueriesContext(connection) as ctx:
+            self.order.save()
+        snapshots = [q['sql'] for q in ctx.captured_queries
+                     if q['sql'].startswith('SELECT') and 'FROM "workshop_orderworkshop"' in q['sql']
+                     and '"workshop_orderworkshop"."id" = ' in q['sql']]
+        self.assertEqual(len(snapshots), 1)
+
+    def test_denormalized_workshop_scoping(self):
+        # atelier recopié à la sauvegarde (groupement : à l'ajout de sa première commande)
+        self.assertEqual(self.order.workshop_id, self.workshop.pk)
+        self.assertEqual(self.fitting.workshop_id, self.workshop.pk)
+        self.order_group.refresh_from_db()
+        self.assertEqual(self.order_group.workshop_id, self.workshop.pk)
+
+        # liste des commandes : filtre sur la seule colonne workshop, sans jointure
+        url = reverse('workshops-orders-list', kwargs={'pk': self.workshop.pk})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        order_queries = [q['sql'] for q in queries if 'FROM "workshop_orderworkshop"' in q['sql']]
+        self.assertTrue(order_queries)
+        self.assertNotIn('JOIN', order_queries[-1])
+
+        # les routes de détail sont limitées à l'atelier
+        other = Workshop.objects.create(
+            name="Other Workshop", description="Other", phone="0102030405", country="CI")
+        url = reverse('workshops-orders-detail',
+                      kwargs={'pk': other.pk, 'order_pk': self.order.pk})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        url = reverse('workshops-order-groups-detail',
+                      kwargs={'pk': other.pk, 'order_group_pk': self.order_group.pk})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_explain_queries_use_indexes(self):
+        out = StringIO()
+        call_command("explain_queries", stdout=out)
+        self.assertIn("Toutes les requêtes utilisent un index.", out.getvalue())
+
+    def test_reconcile_workshop_usage_reports_drift(self):
+        from workshop.models import WorkshopUsage
+
+        WorkshopUsage.objects.filter(pk=self.workshop.pk).update(orders_count=7)
+        out = StringIO()
+        call_command("reconcile_workshop_usage", "--dry-run", stdout=out)
+        self.assertIn(f"{self.workshop.pk}.orders_count: stocké=7 réel=1", out.getvalue())
+        self.assertEqual(WorkshopUsage.objects.get(pk=self.workshop.pk).orders_count, 7)
+
+        call_command("reconcile_workshop_usage", stdout=StringIO())
+        self.assertEqual(WorkshopUsage.objects.get(pk=self.workshop.pk).orders_count, 1)
+        out = StringIO()
+        call_command("reconcile_workshop_usage", stdout=out)
+        self.assertIn("Aucun écart", out.getvalue())
+
     # verifiatiion des autoriration lier a chauqe worker de l'atelier
 
     def test_worker_is_authorisation_is_order(self):
@@ -532,5 +1015,195 @@ class WorkshopViewSetTestCase(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_stat_orders_workshop_payload(self):
+        two_days_ago = timezone.now() - timedelta(days=2)
+        for customer, gender in [(self.customer1, "MAN"), (self.customer2, "WOMAN")]:
+            order = OrderWorkshop.objects.create(
+                customer=customer,
+                worker=self.worker2,
+                gender=gender,
+                type_of_clothing="PANTS",
+                measurement={},
+                description_of_fabric="Bazin",
+                clothing_model="Pantalon",
+                amount=200,
+                down_payment=200,
+                estimated_delivery_date="2023-01-02",
+                promised_delivery_date="2023-01-02",
+            )
+            OrderWorkshop.objects.filter(pk=order.pk).update(createdAt=two_days_ago)
+        # update() ne déclenche pas les signaux : on reconstruit les agrégats
+        call_command("rebuild_stat_rollups", stdout=StringIO())
+
+        url = reverse('workshops-stats-orders',
+                      kwargs={'pk': self.workshop.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.data
+        self.assertEqual(data['total_orders'], 3)
+        self.assertEqual(data['total_amount'], 500)
+        self.assertEqual(data['total_paid'], 2)
+        self.assertEqual(data['avg_orders_per_client'], 1.5)
+
+        day_before = two_days_ago.strftime("%d-%b").lower()
+        today = timezone.now().strftime("%d-%b").lower()
+        # ordre chronologique
+        self.assertEqual(data['bar_chart'], [
+            {"date": day_before, "Clients": 2, "Commandes": 2},
+            {"date": today, "Clients": 1, "Commandes": 1},
+        ])
+        self.assertEqual(data['line_chart'], [
+            {"date": day_before, "orders": 2},
+            {"date": today, "orders": 1},
+        ])
+        self.assertEqual(sorted((p['name'], p['value']) for p in data['pie_chart']),
+                         [("MAN", 2), ("WOMAN", 1)])
+
+    def test_stat_orders_rollups_match_live_aggregation(self):
+        from workshop.mixins import StatMixin
+        from workshop.models import OrderDailyStat
+
+        self.order.status = OrderWorkshop.OrderStatus.IN_PROGRESS
+        self.order.down_payment = 100
+        self.order.save()
+        OrderWorkshop.objects.create(
+            customer=self.customer2,
+            worker=self.worker2,
+            gender="WOMAN",
+            type_of_clothing="DRESS",
+            measurement={},
+            description_of_fabric="Wax",
+            clothing_model="Robe",
+            amount=300,
+            down_payment=0,
+            estimated_delivery_date="2023-01-02",
+            promised_delivery_date="2023-01-02",
+        )
+
+        url = reverse('workshops-stats-orders',
+                      kwargs={'pk': self.workshop.pk})
+        from_rollups = self.client.get(url).data
+        live = StatMixin()._aggregate_order_stats(
+            OrderWorkshop.objects.filter(customer__workshop=self.workshop))
+        self.assertEqual(from_rollups, live)
+        self.assertEqual(from_rollups['total_in_progress'], 1)
+        self.assertEqual(from_rollups['total_paid'], 1)
+
+        # la reconstruction produit les mêmes agrégats
+        before = list(OrderDailyStat.objects.filter(orders_count__gt=0).values(
+            "day", "gender", "status", "payment_status", "orders_count", "total_amount"
+        ).order_by("gender"))
+        call_command("rebuild_stat_rollups", stdout=StringIO())
+        after = list(OrderDailyStat.objects.values(
+            "day", "gender", "status", "payment_status", "orders_count", "total_amount"
+        ).order_by("gender"))
+        self.assertEqual(before, after)
+
+    def test_stat_rollups_and_raw_path_share_the_window(self):
+        url = reverse('workshops-stats-orders', kwargs={'pk': self.workshop.pk})
+        customers_url = reverse('workshops-stats-customers', kwargs={'pk': self.workshop.pk})
+        today = str(timezone.localdate())
+        for window in ({}, {'created_after': today, 'created_before': today}):
+            # un paramètre inconnu des agrégats force le calcul sur les lignes brutes
+            from_rollups = self.client.get(url, window).data
+            raw = self.client.get(url, {**window, 'status': ''}).data
+            self.assertEqual(from_rollups, raw)
+            self.assertEqual(from_rollups['total_orders'], 1)
+            self.assertEqual(self.client.get(customers_url, window).data,
+                             self.client.get(customers_url, {**window, 'name': ''}).data)
+
+        yesterday = str(timezone.localdate() - timedelta(days=1))
+        window = {'created_after': yesterday, 'created_before': yesterday}
+        self.assertEqual(self.client.get(url, window).data['total_orders'], 0)
+        self.assertEqual(self.client.get(url, {**window, 'status': ''}).data['total_orders'], 0)
+
+    def test_rollup_bump_concurrent_first_write(self):
+        from datetime import date
+        from unittest import mock
+        from workshop import rollups
+        from workshop.models import CustomerDailyStat
+
+        keys = dict(workshop_id=self.workshop.pk, day=date(2020, 1, 1), genre="MAN", is_active=True)
+        rollups._bump(CustomerDailyStat, keys, customers_count=1)
+        rollups._bump(CustomerDailyStat, keys, customers_count=1)
+        self.assertEqual(CustomerDailyStat.objects.get(**keys).customers_count, 2)
+
+        # une autre transaction a inséré la ligne après la mise à jour (0 ligne) :
+        # l'insertion échoue sur la contrainte et la mise à jour est rejouée
+        from django.db.models import QuerySet
+
+        keys["day"] = date(2020, 1, 2)
+        CustomerDailyStat.objects.create(**keys, customers_count=1)
+        update = QuerySet.update
+        calls = []
+
+        def stale_update(queryset, **kwargs):
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, "update", stale_update):
+            rollups._bump(CustomerDailyStat, keys, customers_count=1)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(CustomerDailyStat.objects.get(**keys).customers_count, 2)
+
+    def test_stat_customers_workshop(self):
+        url = reverse('workshops-stats-customers',
+                      kwargs={'pk': self.workshop.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_customers'], 2)
+
+        self.customer2.is_active = False
+        self.customer2.save(update_fields=['is_active'])
+        response = self.client.get(url, {'is_active': True})
+        self.assertEqual(response.data['total_customers'], 1)
+        response = self.client.get(url, {'genre': 'WOMAN'})
+        self.assertEqual(response.data['total_customers'], 1)
+
+    def test_stat_orders_served_from_cache_until_write(self):
+        from workshop.cache import get_stats
+
+        url = reverse('workshops-stats-orders',
+                      kwargs={'pk': self.workshop.pk})
+        stats = get_stats()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['total_orders'], 1)
+
+        with self.assertNumQueries(1):  # authentification JWT uniquement
+            response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['total_orders'], 1)
+        self.assertEqual(get_stats()['hits'], stats['hits'] + 1)
+        self.assertEqual(get_stats()['misses'], stats['misses'] + 1)
+
+        # une écriture sur l'atelier invalide le cache
+        self.order.pk = None
+        self.order.number = ""
+        self.order.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['total_orders'], 2)
+
+    def test_authorised_cache_with_file_backend(self):
+        import tempfile
+        from django.test import override_settings
+
+        url = reverse('workshops-settings-customer-count-authorised',
+                      kwargs={'pk': self.workshop.pk})
+        with tempfile.TemporaryDirectory() as location, override_settings(CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": location,
+            }
+        }):
+            self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+            self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+            self.workshop.settings.max_customers = 2
+            self.workshop.settings.save()
+            response = self.client.get(url)
+            self.assertEqual(response['X-Cache'], 'MISS')
+            self.assertFalse(response.data['exists'])
+
     # def test_stat_customers_workshop(self):
     #     pass
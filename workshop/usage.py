@@ -0,0 +1,80 @@
+"""
+Compteurs d'utilisation par atelier (WorkshopUsage), utilisés pour les
+vérifications de quotas du package.
+
+Les signaux appliquent des incréments F() ; `reconcile()` recalcule les
+compteurs depuis les tables et retourne les écarts constatés.
+"""
+from django.db import transaction
+from django.db.models import F
+
+from workshop.models import (
+    Workshop, WorkshopUsage, Worker, CustomerWorkshop,
+    OrderWorkshop, OrderWorkshopGroup, Fitting
+)
+
+FIELDS = (
+    "workers_count", "customers_count", "orders_count",
+    "fittings_count", "order_groups_count",
+)
+
+
+def count_usage(slug) -> dict:
+    """Valeurs réelles des compteurs de l'atelier `slug`."""
+    return {
+        "workers_count": Worker.objects.filter(workshop_id=slug, is_active=True).count(),
+        "customers_count": CustomerWorkshop.objects.filter(
+            workshop_id=slug, is_active=True).count(),
+        "orders_count": OrderWorkshop.objects.filter(
+            workshop_id=slug, is_deleted=False).count(),
+        "fittings_count": Fitting.objects.filter(workshop_id=slug).count(),
+        "order_groups_count": OrderWorkshopGroup.objects.filter(workshop_id=slug).count(),
+    }
+
+
+def get_usage(slug) -> WorkshopUsage:
+    """Ligne de compteurs de l'atelier, calculée si elle n'existe pas encore."""
+    usage = WorkshopUsage.objects.filter(pk=slug).first()
+    if usage is None:
+        usage, _ = WorkshopUsage.objects.get_or_create(
+            workshop_id=slug, defaults=count_usage(slug))
+    return usage
+
+
+def add(slug, field: str, delta: int):
+    if not slug or not delta:
+        return
+    updated = WorkshopUsage.objects.filter(pk=slug).update(
+        **{field: F(field) + delta})
+    if not updated:
+        # atelier antérieur aux compteurs : le calcul inclut déjà ce changement
+        get_usage(slug)
+
+
+@transaction.atomic
+def reconcile(workshops=None, fix=True):
+    """
+    Compare les compteurs stockés aux valeurs réelles.
+    Retourne la liste des écarts {workshop, field, stored, actual} ;
+    les corrige si `fix`.
+    """
+    slugs = Workshop.objects.values_list("pk", flat=True)
+    if workshops is not None:
+        slugs = slugs.filter(pk__in=workshops)
+
+    stored = {
+        usage.pk: usage
+        for usage in WorkshopUsage.objects.select_for_update().filter(pk__in=slugs)
+    }
+    drifts = []
+    for slug in slugs:
+        actual = count_usage(slug)
+        usage = stored.get(slug)
+        for field, value in actual.items():
+            current = getattr(usage, field) if usage else None
+            if current != value:
+                drifts.append(dict(workshop=slug, field=field,
+                                   stored=current, actual=value))
+        if fix and (usage is None or any(d["workshop"] == slug for d in drifts)):
+            WorkshopUsage.objects.update_or_create(workshop_id=slug, defaults=actual)
+    return drifts
@@ -19,6 +19,7 @@ from rest_framework.decorators import action
 from drf_spectacular.utils import extend_schema, OpenApiResponse
 
 
+from ecouture.pagination import KeysetPaginationMixin
 from ecouture.serializers import (
     VerifyFieldSerializer,
     ExistsResponseSerializer,
@@ -36,6 +37,7 @@ class WorkshopViewSet(
         SettingMixin,
         StatMixin,
         PackageHistoryMixin,
+        KeysetPaginationMixin,
         ModelViewSet):
     """
     ViewSet for managing workshops.